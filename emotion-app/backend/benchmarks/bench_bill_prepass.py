@@ -0,0 +1,100 @@
+"""
+Benchmark the local billing-code pre-pass against the LLM bill analysis.
+
+  python benchmarks/bench_bill_prepass.py
+  python benchmarks/bench_bill_prepass.py --url http://localhost:8080 --pdf bill.pdf
+
+Without --url only the pre-pass is timed on a synthetic itemized bill.
+With --url, /analyze-bill?mode=local and ?mode=auto are compared against a
+running server (auto calls Gemini, so it spends quota).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bill_codes import analyze_bill_lines, build_digest  # noqa: E402
+
+
+def synthetic_bill(lines: int, seed: int = 7) -> str:
+  rng = random.Random(seed)
+  header = [
+      "St. Example Medical Center",
+      "500 Hospital Way, Springfield IL 62704",
+      "Patient: Jane Doe   Account: 00442211",
+  ]
+  codes = [f"{code}" for code in range(99201, 99499)] + ["J1100", "J3490", "36415", "REV 0450"]
+  items = []
+  for _ in range(lines):
+    day = rng.randint(1, 28)
+    code = rng.choice(codes)
+    amount = rng.randint(500, 250000) / 100
+    item = f"01/{day:02d}/2024 {code} Itemized service charge ${amount:,.2f}"
+    items.append(item)
+    if rng.random() < 0.02:
+      items.append(item)
+  return "\n".join(header + items + ["Total due 9,999.00"])
+
+
+def bench_local(lines: int, iterations: int):
+  text = synthetic_bill(lines)
+  timings = []
+  for _ in range(iterations):
+    started = time.perf_counter()
+    prepass = analyze_bill_lines(text)
+    digest = build_digest(prepass)
+    timings.append(time.perf_counter() - started)
+
+  median = statistics.median(timings)
+  print(f"pre-pass on {lines} lines ({len(text) / 1024:.1f} KiB):")
+  print(f"  median {median * 1000:.2f} ms, {len(text) / 1024 / 1024 / median:.1f} MB/s")
+  print(
+      f"  {len(prepass.duplicates)} duplicates, {len(prepass.near_duplicates)} near duplicates, "
+      f"digest {len(digest)} chars"
+  )
+
+
+def bench_server(url: str, pdf_path: str, iterations: int):
+  import httpx
+
+  with open(pdf_path, "rb") as f:
+    pdf = f.read()
+
+  with httpx.Client(timeout=300.0) as client:
+    for mode in ("local", "auto"):
+      timings = []
+      for _ in range(iterations):
+        started = time.perf_counter()
+        # A fresh filename does not bypass the result cache; vary the bytes
+        body = pdf + f"\n%{time.time_ns()}".encode()
+        response = client.post(
+            f"{url}/analyze-bill",
+            params={"mode": mode},
+            files={"file": ("bill.pdf", body, "application/pdf")},
+        )
+        response.raise_for_status()
+        timings.append(time.perf_counter() - started)
+      print(f"/analyze-bill?mode={mode}: median {statistics.median(timings) * 1000:.0f} ms")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--lines", type=int, default=2000)
+  parser.add_argument("--iterations", type=int, default=20)
+  parser.add_argument("--url")
+  parser.add_argument("--pdf")
+  args = parser.parse_args()
+
+  bench_local(args.lines, args.iterations)
+  if args.url:
+    if not args.pdf:
+      parser.error("--url needs --pdf")
+    bench_server(args.url, args.pdf, max(1, args.iterations // 10))
+
+
+if __name__ == "__main__":
+  main()
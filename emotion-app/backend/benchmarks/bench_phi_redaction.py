@@ -0,0 +1,88 @@
+"""
+Measure PHI redaction throughput in MB/s.
+
+  python benchmarks/bench_phi_redaction.py
+  python benchmarks/bench_phi_redaction.py --size-mb 8 --known-names
+
+Times PHIRedactor.redact() on one synthetic report and page by page, as
+bills are redacted, with and without the known-name index.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from phi_redaction import PHIRedactor, names_from  # noqa: E402
+
+PATIENT_INFO = {"name": "Jane Q. Doe", "address": "500 Hospital Way", "phone": "(217) 555-0142"}
+
+
+def synthetic_report(size_bytes: int, seed: int = 7) -> str:
+  rng = random.Random(seed)
+  header = (
+      "Patient: Jane Doe   MRN: A1234567   DOB: 03/14/1961\n"
+      "Account No: 00442211   Phone: (217) 555-0142\n"
+      "500 Hospital Way, Springfield IL 62704\n"
+  )
+  tests = ["Hemoglobin", "Glucose", "Creatinine", "LDL Cholesterol", "TSH", "Sodium"]
+  lines = [header]
+  size = len(header)
+  while size < size_bytes:
+    if rng.random() < 0.05:
+      line = f"Reviewed by Dr. Smith with Jane on 01/{rng.randint(1, 28):02d}/2024.\n"
+    else:
+      value = rng.randint(10, 2000) / 10
+      line = f"{rng.choice(tests)}: {value} (reference {value * 0.8:.1f}-{value * 1.2:.1f})\n"
+    lines.append(line)
+    size += len(line)
+  return "".join(lines)
+
+
+def pages_of(text: str, page_chars: int = 3000):
+  return [text[start:start + page_chars] for start in range(0, len(text), page_chars)]
+
+
+def measure(label: str, megabytes: float, iterations: int, run):
+  timings = []
+  for _ in range(iterations):
+    started = time.perf_counter()
+    counts = run()
+    timings.append(time.perf_counter() - started)
+  median = statistics.median(timings)
+  print(f"  {label:<8} median {median * 1000:8.1f} ms, {megabytes / median:6.1f} MB/s  {counts}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--size-mb", type=float, default=2.0)
+  parser.add_argument("--iterations", type=int, default=5)
+  parser.add_argument("--known-names", action="store_true")
+  args = parser.parse_args()
+
+  text = synthetic_report(int(args.size_mb * 1024 * 1024))
+  pages = pages_of(text)
+  megabytes = len(text.encode()) / 1024 / 1024
+  known = names_from(PATIENT_INFO) if args.known_names else ()
+
+  def run_whole():
+    redactor = PHIRedactor(known)
+    redactor.redact(text)
+    return redactor.counts
+
+  def run_pages():
+    redactor = PHIRedactor(known)
+    for page in pages:
+      redactor.redact(page)
+    return redactor.counts
+
+  print(f"redacting {megabytes:.1f} MB in {len(pages)} pages, known names: {list(known)}")
+  measure("redact", megabytes, args.iterations, run_whole)
+  measure("pages", megabytes, args.iterations, run_pages)
+
+
+if __name__ == "__main__":
+  main()
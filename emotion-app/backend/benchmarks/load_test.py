@@ -0,0 +1,294 @@
+"""
+Drive the backend with concurrent requests and report latency percentiles.
+
+  python benchmarks/standin_server.py --port 9000 &
+  GEMINI_API_BASE=http://localhost:9000 FISH_AUDIO_API_BASE=http://localhost:9000 \\
+  GEMINI_API_KEY=fake FISH_AUDIO_API_KEY=fake uvicorn main:app --port 8080 &
+
+  python benchmarks/load_test.py --requests 40 --concurrency 8 --save-baseline baseline.json
+  python benchmarks/load_test.py --requests 40 --concurrency 8 --compare baseline.json
+
+Scenarios: report (/analyze-report), bill (/analyze-bill), tts (/tts),
+call (/simulate-billing-call, streamed) and comfort (whole /comfort-stream
+WebSocket sessions). Uploads get a unique trailer so the result cache does
+not answer them. For each scenario it prints throughput, p50/p95/p99
+latency and time to first message (first audio byte, first call turn,
+first comfort message). --compare exits non-zero when a metric is worse
+than the baseline by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+import websockets
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from samples import sample_bill, sample_report  # noqa: E402
+
+
+SCENARIOS = ("report", "bill", "tts", "call", "comfort")
+# Higher is worse for every metric except throughput
+COMPARED = ("throughput", "p50", "p95", "p99", "ttfm_p50", "ttfm_p95")
+
+CALL_ISSUES = [{
+    "line_snippet": "01/05/2024 85025 CBC with differential $45.00",
+    "codes": ["85025"],
+    "issue_type": "duplicate",
+    "patient_impact": "Charged twice for the same test.",
+    "can_patient_dispute": True,
+    "dispute_rationale": "Identical charges on the same date.",
+}]
+
+
+def percentile(values: list[float], share: float) -> float | None:
+  if not values:
+    return None
+  values = sorted(values)
+  position = (len(values) - 1) * share
+  lower = int(position)
+  upper = min(lower + 1, len(values) - 1)
+  return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def unique_pdf(pdf: bytes, index: int) -> bytes:
+  return pdf + f"\n%load-test {time.time_ns()} {index}".encode()
+
+
+async def run_report(client: httpx.AsyncClient, index: int, context: dict):
+  response = await client.post(
+      "/analyze-report",
+      files={"file": ("report.pdf", unique_pdf(context["report"], index), "application/pdf")},
+  )
+  data = response.json()
+  if "summary" not in data:
+    raise RuntimeError(data.get("error", "no summary"))
+  return None
+
+
+async def run_bill(client: httpx.AsyncClient, index: int, context: dict):
+  response = await client.post(
+      "/analyze-bill",
+      params={"mode": context["bill_mode"]},
+      files={"file": ("bill.pdf", unique_pdf(context["bill"], index), "application/pdf")},
+  )
+  data = response.json()
+  if not data.get("structured"):
+    raise RuntimeError(data.get("error", "unstructured reply"))
+  return None
+
+
+async def run_tts(client: httpx.AsyncClient, index: int, context: dict):
+  started = time.perf_counter()
+  first = None
+  # Unique per run as well, or a second run is served from the TTS cache
+  text = f"Your results look reassuring overall, and we will go through them together. ({context['run']} {index})"
+  async with client.stream("POST", "/tts", json={"text": text, "mode": "COMFORT"}) as response:
+    if response.status_code != 200 or not response.headers.get("content-type", "").startswith("audio/"):
+      await response.aread()
+      raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    async for chunk in response.aiter_bytes():
+      if first is None and chunk:
+        first = time.perf_counter() - started
+  return first
+
+
+async def run_call(client: httpx.AsyncClient, index: int, context: dict):
+  started = time.perf_counter()
+  first = None
+  turns = 0
+  body = {"issues": CALL_ISSUES, "max_turns": 10 + index % 2, "stream": True}
+  async with client.stream("POST", "/simulate-billing-call", json=body) as response:
+    async for line in response.aiter_lines():
+      if not line.strip():
+        continue
+      data = json.loads(line)
+      if "error" in data:
+        raise RuntimeError(data["error"])
+      if "speaker" in data:
+        turns += 1
+        if first is None:
+          first = time.perf_counter() - started
+  if not turns:
+    raise RuntimeError("no turns")
+  return first
+
+
+async def run_comfort(client: httpx.AsyncClient, index: int, context: dict):
+  """
+  One full session: intro, every section, closing message.
+  """
+  url = context["ws_url"] + f"/comfort-stream?session_id=load-{time.time_ns()}-{index}"
+  first = None
+  async with websockets.connect(url, max_size=None) as websocket:
+    started = time.perf_counter()
+    await websocket.send(json.dumps({"action": "init", "summary": context["summary"], "emotion": "neutral"}))
+    while True:
+      data = json.loads(await websocket.recv())
+      if "error" in data:
+        raise RuntimeError(data["error"])
+      if data.get("type") == "message" and first is None:
+        first = time.perf_counter() - started
+      elif data.get("type") == "end":
+        await websocket.send(json.dumps({"action": "next", "emotion": "neutral"}))
+      elif data.get("type") == "complete":
+        return first
+
+
+RUNNERS = {
+    "report": run_report,
+    "bill": run_bill,
+    "tts": run_tts,
+    "call": run_call,
+    "comfort": run_comfort,
+}
+
+
+async def run_scenario(name: str, client: httpx.AsyncClient, context: dict, requests: int, concurrency: int) -> dict:
+  runner = RUNNERS[name]
+  semaphore = asyncio.Semaphore(concurrency)
+  latencies = []
+  firsts = []
+  errors = []
+
+  async def one(index: int):
+    async with semaphore:
+      started = time.perf_counter()
+      try:
+        first = await runner(client, index, context)
+      except Exception as e:
+        errors.append(str(e) or type(e).__name__)
+        return
+      latencies.append(time.perf_counter() - started)
+      if first is not None:
+        firsts.append(first)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(one(index) for index in range(requests)))
+  elapsed = time.perf_counter() - started
+
+  return {
+      "requests": requests,
+      "concurrency": concurrency,
+      "errors": len(errors),
+      "first_error": errors[0] if errors else None,
+      "throughput": len(latencies) / elapsed if elapsed else 0.0,
+      "p50": percentile(latencies, 0.50),
+      "p95": percentile(latencies, 0.95),
+      "p99": percentile(latencies, 0.99),
+      "ttfm_p50": percentile(firsts, 0.50),
+      "ttfm_p95": percentile(firsts, 0.95),
+  }
+
+
+def format_seconds(value: float | None) -> str:
+  return f"{value * 1000:8.0f}ms" if value is not None else "       -  "
+
+
+def print_results(results: dict):
+  print(f"{'scenario':<9} {'ok/err':>9} {'req/s':>7} {'p50':>10} {'p95':>10} {'p99':>10} {'ttfm p50':>10} {'ttfm p95':>10}")
+  for name, result in results.items():
+    ok = result["requests"] - result["errors"]
+    print(
+        f"{name:<9} {ok:>5}/{result['errors']:<3} {result['throughput']:7.2f} "
+        f"{format_seconds(result['p50'])} {format_seconds(result['p95'])} {format_seconds(result['p99'])} "
+        f"{format_seconds(result['ttfm_p50'])} {format_seconds(result['ttfm_p95'])}"
+    )
+    if result["first_error"]:
+      print(f"          first error: {result['first_error'][:120]}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+  regressions = []
+  for name, result in results.items():
+    before = baseline.get("scenarios", {}).get(name)
+    if before is None:
+      continue
+    for metric in COMPARED:
+      old, new = before.get(metric), result.get(metric)
+      if not old or new is None:
+        continue
+      change = (new - old) / old
+      worse = change < -tolerance if metric == "throughput" else change > tolerance
+      marker = "  REGRESSION" if worse else ""
+      print(f"  {name:<9} {metric:<10} {old:10.3f} -> {new:10.3f} ({change:+.1%}){marker}")
+      if worse:
+        regressions.append(f"{name} {metric}")
+  return regressions
+
+
+async def prepare(args, client: httpx.AsyncClient, scenarios: list[str]) -> dict:
+  context = {
+      "report": sample_report(args.repeat),
+      "bill": sample_bill(args.repeat),
+      "bill_mode": args.bill_mode,
+      "run": time.time_ns(),
+      "ws_url": "ws" + args.url[len("http"):],
+  }
+  if "comfort" in scenarios:
+    response = await client.post(
+        "/analyze-report",
+        files={"file": ("report.pdf", unique_pdf(context["report"], -1), "application/pdf")},
+    )
+    context["summary"] = response.json().get("summary")
+    if not context["summary"]:
+      raise SystemExit(f"Could not get a summary for comfort sessions: {response.text[:200]}")
+  return context
+
+
+async def main_async(args) -> int:
+  scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+  unknown = set(scenarios) - set(SCENARIOS)
+  if unknown:
+    raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+  limits = httpx.Limits(max_connections=args.concurrency * 2)
+  async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+    context = await prepare(args, client, scenarios)
+    results = {}
+    for name in scenarios:
+      requests = args.sessions if name == "comfort" else args.requests
+      results[name] = await run_scenario(name, client, context, requests, args.concurrency)
+
+  print_results(results)
+
+  if args.save_baseline:
+    with open(args.save_baseline, "w") as f:
+      json.dump({"created": time.time(), "args": vars(args), "scenarios": results}, f, indent=2)
+    print(f"baseline saved to {args.save_baseline}")
+
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    print(f"compared with {args.compare} (tolerance {args.tolerance:.0%}):")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+      print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+      return 1
+  return 0
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--url", default="http://localhost:8080")
+  parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+  parser.add_argument("--requests", type=int, default=40)
+  parser.add_argument("--sessions", type=int, default=10, help="comfort-stream sessions")
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--repeat", type=int, default=1, help="repeat sample PDF contents to make them longer")
+  parser.add_argument("--bill-mode", default="auto")
+  parser.add_argument("--timeout", type=float, default=300.0)
+  parser.add_argument("--save-baseline")
+  parser.add_argument("--compare")
+  parser.add_argument("--tolerance", type=float, default=0.15)
+  args = parser.parse_args()
+
+  sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+  main()
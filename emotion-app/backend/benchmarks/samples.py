@@ -0,0 +1,122 @@
+"""
+Sample report and bill PDFs for benchmarks, built in code so nothing
+binary lives in the repo.
+
+  python benchmarks/samples.py --out samples/   # write report.pdf and bill.pdf
+"""
+import argparse
+import os
+
+
+REPORT_LINES = [
+    "Springfield Clinical Laboratory",
+    "Patient: Jane Doe   MRN: A1234567   DOB: 03/14/1961",
+    "Collected: 01/05/2024   Ordering physician: Dr. Smith",
+    "",
+    "COMPLETE BLOOD COUNT",
+    "Hemoglobin              13.2   g/dL     12.0 - 16.0",
+    "White Blood Cell Count  7.1    K/uL     4.0 - 11.0",
+    "Platelet Count          250    K/uL     150 - 400",
+    "",
+    "COMPREHENSIVE METABOLIC PANEL",
+    "Glucose                 112    mg/dL    70 - 99      H",
+    "Creatinine              0.6    mg/dL    0.7 - 1.3    L",
+    "Sodium                  139    mmol/L   135 - 145",
+    "",
+    "LIPID PANEL",
+    "LDL Cholesterol         142    mg/dL    < 100        H",
+    "HDL Cholesterol         55     mg/dL    > 40",
+    "",
+    "HbA1c                   5.4    %        4.0 - 5.6",
+    "TSH                     2.1    mIU/L    0.4 - 4.0",
+]
+
+BILL_LINES = [
+    "Springfield Medical Center - Itemized Statement",
+    "500 Hospital Way, Springfield IL 62704   (217) 555-0100",
+    "Patient: Jane Doe   Account: 00442211",
+    "Statement date: 01/20/2024   Due: 02/20/2024",
+    "",
+    "01/05/2024 99214 Office visit, established patient $210.00",
+    "01/05/2024 85025 CBC with differential $45.00",
+    "01/05/2024 85025 CBC with differential $45.00",
+    "01/05/2024 80053 Comprehensive metabolic panel $88.00",
+    "01/05/2024 80061 Lipid panel $62.00",
+    "01/05/2024 83036 Hemoglobin A1c $39.00",
+    "01/05/2024 84443 TSH $54.00",
+    "01/05/2024 36415 Venipuncture $18.00",
+    "",
+    "Total charges $561.00",
+]
+
+
+def _escape(text: str) -> str:
+  return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(lines: list[str], lines_per_page: int = 45) -> bytes:
+  """
+  A minimal text-only PDF (Helvetica, one line per text row) that pypdf
+  extracts back line by line.
+  """
+  pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)] or [[]]
+  objects = []
+  page_ids = []
+  font_id = 3 + 2 * len(pages)
+
+  for index, page_lines in enumerate(pages):
+    page_id = 3 + 2 * index
+    content_id = page_id + 1
+    page_ids.append(page_id)
+    rows = "\n".join(f"({_escape(line)}) Tj T*" for line in page_lines)
+    stream = f"BT /F1 10 Tf 14 TL 50 780 Td\n{rows}\nET".encode("latin-1", "replace")
+    objects.append((page_id, (
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+        f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+    ).encode()))
+    objects.append((content_id, b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)))
+
+  kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+  objects = [
+      (1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+      (2, f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode()),
+      *objects,
+      (font_id, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+  ]
+
+  out = bytearray(b"%PDF-1.4\n")
+  offsets = {}
+  for object_id, body in objects:
+    offsets[object_id] = len(out)
+    out += b"%d 0 obj\n%s\nendobj\n" % (object_id, body)
+  xref = len(out)
+  out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+  for object_id in range(1, len(objects) + 1):
+    out += b"%010d 00000 n \n" % offsets[object_id]
+  out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+  return bytes(out)
+
+
+def sample_report(repeat: int = 1) -> bytes:
+  return make_pdf(REPORT_LINES * repeat)
+
+
+def sample_bill(repeat: int = 1) -> bytes:
+  return make_pdf(BILL_LINES[:5] + BILL_LINES[5:-2] * repeat + BILL_LINES[-2:])
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--out", default=".")
+  parser.add_argument("--repeat", type=int, default=1)
+  args = parser.parse_args()
+
+  os.makedirs(args.out, exist_ok=True)
+  for name, pdf in (("report.pdf", sample_report(args.repeat)), ("bill.pdf", sample_bill(args.repeat))):
+    with open(os.path.join(args.out, name), "wb") as f:
+      f.write(pdf)
+    print(f"wrote {name} ({len(pdf)} bytes)")
+
+
+if __name__ == "__main__":
+  main()
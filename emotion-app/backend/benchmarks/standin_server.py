@@ -0,0 +1,237 @@
+"""
+Local stand-in for the Gemini REST API and FishAudio, for load tests.
+
+  python benchmarks/standin_server.py --port 9000 --llm-latency lognormal:1.2:0.5 --error-rate 0.01
+
+Then start the backend against it (any non-empty keys work):
+
+  GEMINI_API_BASE=http://localhost:9000 FISH_AUDIO_API_BASE=http://localhost:9000 \\
+  GEMINI_API_KEY=fake FISH_AUDIO_API_KEY=fake uvicorn main:app --port 8080
+
+Latencies are `fixed:S`, `uniform:LOW:HIGH` or `lognormal:MEDIAN:SIGMA`, in
+seconds. Replies are canned but shaped like the real ones: report
+summaries with ###SECTION### blocks, schema-shaped JSON when a response
+schema is sent, and silent MP3 frames sized to the text for TTS.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+TESTS = [
+    ("Hemoglobin", "13.2", "g/dL", "12.0 - 16.0"),
+    ("Glucose", "112", "mg/dL", "70 - 99"),
+    ("LDL Cholesterol", "142", "mg/dL", "< 100"),
+    ("HbA1c", "5.4", "%", "4.0 - 5.6"),
+    ("TSH", "2.1", "mIU/L", "0.4 - 4.0"),
+    ("Creatinine", "0.6", "mg/dL", "0.7 - 1.3"),
+]
+
+# One silent MPEG-1 Layer III frame (128 kbit/s, 44.1 kHz)
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+class Latency:
+  def __init__(self, spec: str):
+    kind, *args = spec.split(":")
+    self.kind = kind
+    self.args = [float(arg) for arg in args]
+    if kind not in ("fixed", "uniform", "lognormal"):
+      raise ValueError(f"Unknown latency distribution: {spec}")
+
+  def sample(self) -> float:
+    if self.kind == "fixed":
+      return self.args[0]
+    if self.kind == "uniform":
+      return random.uniform(self.args[0], self.args[1])
+    return random.lognormvariate(math.log(self.args[0]), self.args[1])
+
+
+def report_summary() -> str:
+  sections = [
+      f"{name}: A routine blood test.\n"
+      f"Patient's Result: {value} {units}\n"
+      f"Reference Range: {reference} {units}\n"
+      f"Explanation: This result is compared with the usual range for adults."
+      for name, value, units, reference in TESTS
+  ]
+  return "###SECTION###\n" + "\n###SECTION###\n".join(sections)
+
+
+def explanation() -> str:
+  return (
+      "I can see why this result might catch your eye. Your value sits close to "
+      "the range we usually expect, and small differences like this are common. "
+      "It is a good idea to mention it at your next visit so your doctor can look "
+      "at it alongside your other results. You are doing the right thing by "
+      "learning about it."
+  )
+
+
+def bill_analysis() -> dict:
+  return {
+      "high_level_summary": "The bill lists routine lab work and one office visit; one charge looks duplicated.",
+      "patient_info": {
+          "name": "[NAME_1]", "address": None, "city_state_zip": None, "phone": None,
+          "email": None, "account_number": "[ACCOUNT_1]", "dob": None,
+      },
+      "provider_info": {
+          "name": "Stand-in Medical Center", "billing_dept": "Billing Department",
+          "address": None, "city_state_zip": None, "phone": None,
+      },
+      "bill_info": {"bill_date": "01/05/2024", "due_date": "02/05/2024", "total_amount": "1240.00"},
+      "potential_issues": [{
+          "line_snippet": "01/05/2024 85025 CBC with differential $45.00",
+          "codes": ["85025"],
+          "issue_type": "duplicate",
+          "patient_impact": "The same test appears twice, adding $45.00.",
+          "can_patient_dispute": True,
+          "dispute_rationale": "Identical charges on the same date are usually billed once.",
+      }],
+  }
+
+
+def call_script() -> dict:
+  lines = [
+      ("rep", "Thanks for calling the billing office, how can I help?"),
+      ("user", "Hi, I think a lab test on my bill was charged twice."),
+      ("rep", "I can look into that. Which line are you referring to?"),
+      ("user", "The CBC on January fifth appears two times."),
+      ("rep", "I see both charges. I will send this for review."),
+      ("user", "Thank you. I also have a written appeal letter if needed."),
+      ("rep", "That helps. You should hear back within thirty days."),
+      ("user", "Great, thanks for your help."),
+  ]
+  return {"turns": [{"speaker": speaker, "text": text} for speaker, text in lines]}
+
+
+def reply_for(body: dict) -> str:
+  config = body.get("generationConfig") or {}
+  prompt = "".join(
+      part.get("text", "")
+      for content in body.get("contents", [])
+      for part in content.get("parts", [])
+  )
+  properties = (config.get("responseSchema") or {}).get("properties") or {}
+  if "turns" in properties or '"turns"' in prompt:
+    return json.dumps(call_script())
+  if "dispute letter" in prompt:
+    return "\n\n".join(["Dear Billing Department,"] + [explanation()] * 4 + ["Sincerely,\n[Your Name]"])
+  if "potential_issues" in properties or "potential_issues" in prompt:
+    return json.dumps(bill_analysis())
+  if "###SECTION###" in prompt:
+    return report_summary()
+  return explanation()
+
+
+def create_app(args) -> FastAPI:
+  app = FastAPI()
+  llm_latency = Latency(args.llm_latency)
+  tts_latency = Latency(args.tts_latency)
+  stats = {"generate": 0, "stream": 0, "tts": 0, "errors": 0}
+
+  def maybe_fail():
+    if random.random() < args.error_rate:
+      stats["errors"] += 1
+      return JSONResponse({"error": {"code": 503, "message": "stand-in overloaded"}}, status_code=503)
+    return None
+
+  @app.get("/v1beta/models")
+  async def list_models():
+    return {"models": [{
+        "name": "models/gemini-2.5-flash",
+        "displayName": "Gemini 2.5 Flash (stand-in)",
+        "supportedGenerationMethods": ["generateContent", "streamGenerateContent"],
+    }]}
+
+  @app.get("/v1beta/models/{name}")
+  async def get_model(name: str):
+    return {"name": f"models/{name}", "displayName": name}
+
+  @app.post("/v1beta/models/{call}")
+  async def generate(call: str, request: Request):
+    body = await request.json()
+    failure = maybe_fail()
+    if failure is not None:
+      return failure
+    text = reply_for(body)
+
+    if call.endswith(":generateContent"):
+      stats["generate"] += 1
+      await asyncio.sleep(llm_latency.sample())
+      return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+    stats["stream"] += 1
+    # Whole-call latency is split into time to first chunk plus per-chunk gaps
+    chunks = re.findall(r"\S+\s*", text)
+    chunks = ["".join(chunks[i:i + args.words_per_chunk]) for i in range(0, len(chunks), args.words_per_chunk)]
+    total = llm_latency.sample()
+    first = total * args.first_chunk_share
+    gap = (total - first) / max(len(chunks) - 1, 1)
+
+    async def events():
+      await asyncio.sleep(first)
+      for index, chunk in enumerate(chunks):
+        if index:
+          await asyncio.sleep(gap)
+        data = {"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]}}]}
+        yield f"data: {json.dumps(data)}\r\n\r\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+  @app.post("/v1/tts")
+  async def tts(request: Request):
+    body = await request.json()
+    failure = maybe_fail()
+    if failure is not None:
+      return failure
+    stats["tts"] += 1
+    # Roughly one frame per spoken character keeps sizes realistic
+    frames = max(len(body.get("text", "")), 1)
+    delay = tts_latency.sample()
+
+    async def audio():
+      await asyncio.sleep(delay)
+      for start in range(0, frames, 32):
+        yield MP3_FRAME * min(32, frames - start)
+        await asyncio.sleep(0)
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+  @app.get("/wallet/self/api-credit")
+  async def api_credit():
+    return {"credit": "1000.00"}
+
+  @app.get("/stats")
+  async def get_stats():
+    return stats
+
+  return app
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=9000)
+  parser.add_argument("--llm-latency", default="lognormal:1.0:0.4")
+  parser.add_argument("--tts-latency", default="lognormal:0.3:0.3")
+  parser.add_argument("--first-chunk-share", type=float, default=0.3)
+  parser.add_argument("--words-per-chunk", type=int, default=6)
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  parser.add_argument("--seed", type=int)
+  args = parser.parse_args()
+
+  if args.seed is not None:
+    random.seed(args.seed)
+  uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,129 @@
+import json
+import os
+import re
+
+
+BILL_CHUNK_CHARS = int(os.environ.get("BILL_CHUNK_CHARS", "12000"))
+BILL_CHUNK_CONCURRENCY = int(os.environ.get("BILL_CHUNK_CONCURRENCY", "4"))
+# Fresh calls for a chunk whose reply still fails validation after repair
+BILL_CHUNK_RETRIES = int(os.environ.get("BILL_CHUNK_RETRIES", "1"))
+
+INFO_FIELDS = ("patient_info", "provider_info", "bill_info")
+
+
+def parse_model_json(raw: str) -> dict | None:
+  """
+  Parse a JSON object out of a model reply, tolerating prose or code fences
+  around it. Returns None when nothing parseable is found.
+  """
+  try:
+    return json.loads(raw)
+  except Exception:
+    match = re.search(r"{[\s\S]*}", raw)
+    if match:
+      try:
+        return json.loads(match.group(0))
+      except Exception:
+        return None
+  return None
+
+
+def chunk_pages(pages: list[str], max_chars: int = BILL_CHUNK_CHARS) -> list[str]:
+  """
+  Group page texts into chunks of at most `max_chars`, breaking on page
+  boundaries and, for oversized pages, on line boundaries. Nothing is dropped.
+  """
+  chunks = []
+  current = []
+  size = 0
+
+  def flush():
+    nonlocal current, size
+    if current:
+      chunks.append("\n".join(current))
+    current = []
+    size = 0
+
+  for page in pages:
+    pieces = [page] if len(page) <= max_chars else _split_lines(page, max_chars)
+    for piece in pieces:
+      if size and size + len(piece) + 1 > max_chars:
+        flush()
+      current.append(piece)
+      size += len(piece) + 1
+
+  flush()
+  return chunks
+
+
+def _split_lines(text: str, max_chars: int) -> list[str]:
+  pieces = []
+  current = []
+  size = 0
+  for line in text.split("\n"):
+    # Lines gathered so far go out before the pieces of a line too long to keep
+    if len(line) > max_chars and current:
+      pieces.append("\n".join(current))
+      current = []
+      size = 0
+    while len(line) > max_chars:
+      pieces.append(line[:max_chars])
+      line = line[max_chars:]
+    if size and size + len(line) + 1 > max_chars:
+      pieces.append("\n".join(current))
+      current = []
+      size = 0
+    current.append(line)
+    size += len(line) + 1
+  if current:
+    pieces.append("\n".join(current))
+  return pieces
+
+
+def _issue_key(issue: dict) -> tuple:
+  snippet = re.sub(r"\s+", " ", str(issue.get("line_snippet") or "")).strip().lower()
+  codes = tuple(sorted(str(code).strip().upper() for code in issue.get("codes") or []))
+  return snippet, codes, str(issue.get("issue_type") or "").lower()
+
+
+def merge_bill_analyses(analyses: list[dict]) -> dict:
+  """
+  Reduce per-chunk analyses into the single /analyze-bill response shape.
+
+  Contact and bill fields take the first non-null value in page order,
+  summaries are concatenated, and potential_issues are de-duplicated on
+  (snippet, codes, issue_type).
+  """
+  merged = {
+      "high_level_summary": "",
+      "patient_info": {},
+      "provider_info": {},
+      "bill_info": {},
+      "potential_issues": [],
+  }
+  summaries = []
+  seen = set()
+
+  for analysis in analyses:
+    summary = str(analysis.get("high_level_summary") or "").strip()
+    if summary and summary not in summaries:
+      summaries.append(summary)
+
+    for field in INFO_FIELDS:
+      for name, value in (analysis.get(field) or {}).items():
+        if value not in (None, "", "null") and merged[field].get(name) in (None, "", "null"):
+          merged[field][name] = value
+        else:
+          merged[field].setdefault(name, None)
+
+    for issue in analysis.get("potential_issues") or []:
+      if not isinstance(issue, dict):
+        continue
+      key = _issue_key(issue)
+      if key in seen:
+        continue
+      seen.add(key)
+      merged["potential_issues"].append(issue)
+
+  merged["high_level_summary"] = " ".join(summaries)
+  return merged
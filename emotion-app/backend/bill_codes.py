@@ -0,0 +1,264 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+
+# Every token the pre-pass cares about in one alternation, so each line is
+# scanned once. Dates and amounts come first so "2024" or "120.00" are
+# never read as codes; HCPCS (letter + 4 digits) is tried before ICD-10,
+# which would otherwise claim "J1100".
+_TOKEN_PATTERN = re.compile(
+    r"(?P<DATE>\b(?:\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2})\b)"
+    r"|(?<![\w.,])(?P<AMOUNT>\$?\s?(?:\d{1,3}(?:,\d{3})+|\d+)\.\d{2})\b"
+    r"|\b(?:"
+    r"(?P<HCPCS>[A-V]\d{4})"
+    r"|(?P<CPT>\d{4}[0-9FTU])"
+    r"|(?P<ICD10>[A-TV-Z]\d[0-9A-Z](?:\.[0-9A-Z]{1,4})?)"
+    r"|(?:REV(?:ENUE)?\s*(?:CODE)?\s*:?\s*)?(?P<REV>0[1-9]\d{2})"
+    r")\b"
+)
+# ZIP codes look like CPT codes; lines with "ST 12345" are addresses
+_ADDRESS_HINT = re.compile(r"\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b")
+
+
+@dataclass
+class BillLine:
+  index: int
+  text: str
+  codes: list[tuple[str, str]]
+  date: str | None
+  amount: float | None
+  description: str
+
+
+@dataclass
+class BillPrepass:
+  lines: list[BillLine]
+  codes: dict[str, list[str]] = field(default_factory=dict)
+  duplicates: list[dict] = field(default_factory=list)
+  near_duplicates: list[dict] = field(default_factory=list)
+  unresolved: list[str] = field(default_factory=list)
+
+  @property
+  def line_items(self) -> list[BillLine]:
+    return [line for line in self.lines if line.codes and line.amount is not None]
+
+  def total_billed(self) -> float:
+    return round(sum(line.amount for line in self.line_items), 2)
+
+
+def _parse_line(index: int, text: str) -> BillLine:
+  is_address = _ADDRESS_HINT.search(text) is not None
+  codes = []
+  date = None
+  amount = None
+  gaps = []
+  position = 0
+
+  for match in _TOKEN_PATTERN.finditer(text):
+    kind = match.lastgroup
+    if kind == "DATE":
+      date = date or match.group(kind)
+    elif kind == "AMOUNT":
+      amount = float(match.group(kind).lstrip("$ ").replace(",", ""))
+    elif is_address:
+      continue
+    else:
+      codes.append((kind, match.group(kind)))
+    gaps.append(text[position:match.start()])
+    position = match.end()
+  gaps.append(text[position:])
+
+  return BillLine(index, text, codes, date, amount, " ".join(" ".join(gaps).split()))
+
+
+def analyze_bill_lines(text: str) -> BillPrepass:
+  """
+  Deterministic pre-pass over bill text: extract billing codes per line and
+  flag duplicate charges.
+
+  Lines are indexed by (code, date, amount). The same key on two lines is an
+  exact duplicate. The same (code, date) billed at different amounts is a
+  near duplicate, kept apart because it is often a distinct service (two
+  drugs under one HCPCS code, say) rather than a billing error. Lines
+  carrying an amount but no recognisable code are returned as `unresolved`
+  for the LLM to look at.
+  """
+  lines = [
+      _parse_line(index, line.strip())
+      for index, line in enumerate(text.split("\n"))
+      if line.strip()
+  ]
+  prepass = BillPrepass(lines=lines)
+
+  seen_codes = defaultdict(dict)
+  exact = defaultdict(list)
+  by_code_date = defaultdict(list)
+
+  for line in lines:
+    for kind, code in line.codes:
+      seen_codes[kind][code] = None
+    if line.amount is None:
+      continue
+    if not line.codes:
+      prepass.unresolved.append(line.text)
+      continue
+    for kind, code in line.codes:
+      if kind in ("CPT", "HCPCS"):
+        exact[(code, line.date, line.amount)].append(line)
+        by_code_date[(code, line.date)].append(line)
+
+  for (code, date, amount), matches in exact.items():
+    if len(matches) > 1:
+      prepass.duplicates.append({
+          "code": code,
+          "date": date,
+          "amount": amount,
+          "lines": [line.text for line in matches],
+      })
+
+  for (code, date), matches in by_code_date.items():
+    amounts = sorted({line.amount for line in matches})
+    if len(amounts) > 1:
+      prepass.near_duplicates.append({
+          "code": code,
+          "date": date,
+          "amounts": amounts,
+          "lines": [line.text for line in matches],
+      })
+
+  prepass.codes = {kind: list(codes) for kind, codes in seen_codes.items()}
+  return prepass
+
+
+def duplicate_issues(prepass: BillPrepass) -> list[dict]:
+  """
+  Exact duplicates in the /analyze-bill `potential_issues` shape.
+  """
+  issues = []
+  for duplicate in prepass.duplicates:
+    when = f" on {duplicate['date']}" if duplicate["date"] else ""
+    issues.append({
+        "line_snippet": duplicate["lines"][0],
+        "codes": [duplicate["code"]],
+        "issue_type": "duplicate",
+        "patient_impact": (
+            f"Code {duplicate['code']} is billed {len(duplicate['lines'])} times"
+            f"{when} at ${duplicate['amount']:.2f} each."
+        ),
+        "can_patient_dispute": True,
+        "dispute_rationale": "Identical charges for the same service and date are usually billed once.",
+    })
+  return issues
+
+
+def review_issues(prepass: BillPrepass) -> list[dict]:
+  """
+  Near duplicates as non-disputable "other" `potential_issues`: worth
+  checking against an itemised bill, not disputing outright.
+  """
+  issues = []
+  for duplicate in prepass.near_duplicates:
+    when = f" on {duplicate['date']}" if duplicate["date"] else ""
+    amounts = ", ".join(f"${amount:.2f}" for amount in duplicate["amounts"])
+    issues.append({
+        "line_snippet": duplicate["lines"][0],
+        "codes": [duplicate["code"]],
+        "issue_type": "other",
+        "patient_impact": f"Code {duplicate['code']} appears{when} at different amounts ({amounts}).",
+        "can_patient_dispute": False,
+        "dispute_rationale": (
+            "These are often separate services under one code. If the descriptions "
+            "do not explain the difference, ask the provider for an itemised bill."
+        ),
+    })
+  return issues
+
+
+def build_digest(prepass: BillPrepass) -> str:
+  """
+  Compact text for the LLM: coded line items as one short row each
+  (identical rows collapsed with a count), the exact duplicates already
+  found, codes billed at several amounts on one day for the LLM to judge,
+  and every line the pre-pass could not explain.
+  """
+  counts = {}
+  for line in prepass.line_items:
+    row = (
+        f"{line.date or '-'} {' '.join(code for _, code in line.codes)} "
+        f"{line.amount:.2f} {line.description[:60]}"
+    )
+    counts[row] = counts.get(row, 0) + 1
+  rows = [row if count == 1 else f"{row} (x{count})" for row, count in counts.items()]
+  other_lines = [
+      line.text for line in prepass.lines
+      if not (line.codes and line.amount is not None)
+  ]
+
+  parts = [
+      "CODED LINE ITEMS (date codes amount description):",
+      *rows,
+      "",
+      f"TOTAL OF CODED LINE ITEMS: {prepass.total_billed():.2f}",
+  ]
+  if prepass.duplicates:
+    parts += ["", "DUPLICATES ALREADY DETECTED:"]
+    parts += [
+        f"- {duplicate['code']} on {duplicate['date'] or 'unknown date'} "
+        f"x{len(duplicate['lines'])} at {duplicate['amount']:.2f}"
+        for duplicate in prepass.duplicates
+    ]
+  if prepass.near_duplicates:
+    parts += ["", "SAME CODE AND DATE AT DIFFERENT AMOUNTS (often distinct services; "
+              "only report one if the descriptions suggest a double charge):"]
+    parts += [
+        f"- {duplicate['code']} on {duplicate['date'] or 'unknown date'}: "
+        + ", ".join(f"{amount:.2f}" for amount in duplicate["amounts"])
+        for duplicate in prepass.near_duplicates
+    ]
+  parts += ["", "OTHER LINES (headers, contact details, uncoded charges):", *other_lines]
+  return "\n".join(parts)
+
+
+def local_bill_analysis(prepass: BillPrepass) -> dict:
+  """
+  /analyze-bill response built from the pre-pass alone (no LLM).
+  """
+  code_counts = ", ".join(
+      f"{len(codes)} {kind}" for kind, codes in prepass.codes.items() if codes
+  ) or "no billing codes"
+  return {
+      "high_level_summary": (
+          f"Found {len(prepass.line_items)} coded line items ({code_counts}) totalling "
+          f"${prepass.total_billed():.2f}, with {len(prepass.duplicates)} likely "
+          f"duplicate charge(s) and {len(prepass.near_duplicates)} code(s) billed at "
+          f"different amounts on the same day to review. {len(prepass.unresolved)} "
+          f"charge line(s) had no recognisable code."
+      ),
+      "patient_info": {},
+      "provider_info": {},
+      "bill_info": {"total_amount": f"{prepass.total_billed():.2f}"},
+      "potential_issues": duplicate_issues(prepass) + review_issues(prepass),
+      "codes": prepass.codes,
+      "unresolved_lines": prepass.unresolved,
+  }
+
+
+def add_local_findings(analysis: dict, prepass: BillPrepass) -> dict:
+  """
+  Add exact pre-pass duplicates the LLM did not already report to
+  `analysis`. Near duplicates are left to the LLM, which saw them in the
+  digest along with the line descriptions.
+  """
+  issues = analysis.get("potential_issues") or []
+  reported = {
+      code
+      for issue in issues
+      if isinstance(issue, dict) and issue.get("issue_type") == "duplicate"
+      for code in issue.get("codes") or []
+  }
+  for issue in duplicate_issues(prepass):
+    if issue["codes"][0] not in reported:
+      issues.append(issue)
+  analysis["potential_issues"] = issues
+  return analysis
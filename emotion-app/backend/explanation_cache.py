@@ -0,0 +1,278 @@
+import os
+import re
+from dataclasses import dataclass
+
+from result_cache import ResultCache, cache_key
+
+
+# Set to 0 to always ask Gemini, e.g. where explanations must never be shared
+EXPLANATION_CACHE_ENABLED = os.environ.get("EXPLANATION_CACHE_ENABLED", "1") != "0"
+EXPLANATION_CACHE_MAX_ENTRIES = int(os.environ.get("EXPLANATION_CACHE_MAX_ENTRIES", "2048"))
+EXPLANATION_CACHE_TTL_SECONDS = float(os.environ.get("EXPLANATION_CACHE_TTL_SECONDS", str(7 * 86400)))
+# Set to share templates between workers and keep them across restarts
+EXPLANATION_CACHE_PATH = os.environ.get("EXPLANATION_CACHE_PATH")
+
+# 5, 5.4 or 150,000; never the middle of a longer number such as "1,2345"
+_NUMBER = r"(?<![\d.])(?<!\d,)(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?!\d|[.,]\d)"
+_RANGE_NUMBER_PATTERN = re.compile(_NUMBER)
+_WELL_FORMED_NUMBER = re.compile(r"(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?")
+_NUMBER_PATTERN = re.compile(r"(?<![\w.])\d+(?:[.,]\d+)*")
+_RESULT_PATTERN = re.compile(
+    rf"(?im)^\W*(?:patient['’]?s\s+)?result[\s*_]*:[\s*_]*(?P<value>[<>]?\s*{_NUMBER})[ \t]*(?P<units>[^\s(,;*]*)"
+)
+_RESULT_TEXT_PATTERN = re.compile(r"(?im)^\W*(?:patient['’]?s\s+)?result[\s*_]*:[\s*_]*(?P<value>.+)$")
+_RANGE_PATTERN = re.compile(r"(?im)^\W*reference\s+range[\s*_]*:[\s*_]*(?P<range>.+)$")
+_BETWEEN_PATTERN = re.compile(rf"(?P<low>{_NUMBER})\s*(?:-|–|to)\s*(?P<high>{_NUMBER})")
+_BOUND_PATTERN = re.compile(rf"(?P<op>[<>]=?|≤|≥)\s*(?P<bound>{_NUMBER})")
+_PLACEHOLDER_PATTERN = re.compile(r"\{(result|low|high)\}")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_PARENTHESES = re.compile(r"\(.*?\)")
+
+# Common spellings of the same test, after normalization
+TEST_ALIASES = {
+    "hba1c": "hemoglobin a1c",
+    "a1c": "hemoglobin a1c",
+    "glycated hemoglobin": "hemoglobin a1c",
+    "hgb": "hemoglobin",
+    "hb": "hemoglobin",
+    "wbc": "white blood cell count",
+    "white blood cells": "white blood cell count",
+    "rbc": "red blood cell count",
+    "red blood cells": "red blood cell count",
+    "plt": "platelet count",
+    "platelets": "platelet count",
+    "ldl": "ldl cholesterol",
+    "ldl c": "ldl cholesterol",
+    "hdl": "hdl cholesterol",
+    "hdl c": "hdl cholesterol",
+    "tsh": "thyroid stimulating hormone",
+    "bun": "blood urea nitrogen",
+    "fasting glucose": "glucose",
+    "blood glucose": "glucose",
+}
+
+
+@dataclass
+class LabResult:
+  test: str
+  units: str
+  band: str
+  value: str
+  low: str | None
+  high: str | None
+
+
+def _to_float(number: str) -> float:
+  return float(number.replace(",", ""))
+
+
+def normalize_test_name(title: str) -> str:
+  name = _PARENTHESES.sub(" ", title.lower())
+  name = _NON_WORD.sub(" ", name).strip()
+  return TEST_ALIASES.get(name, name)
+
+
+def parse_lab_result(section: dict) -> LabResult | None:
+  """
+  Pull the result and reference range out of a parsed report section.
+  Returns None unless the result can be placed in a low/normal/high band.
+  """
+  content = section.get("content", "")
+  result = _RESULT_PATTERN.search(content)
+  reference = _RANGE_PATTERN.search(content)
+  if result is None or reference is None or result.group("value")[0] in "<>":
+    return None
+
+  value = result.group("value")
+  low = high = None
+  between = _BETWEEN_PATTERN.search(reference.group("range"))
+  if between:
+    low, high = between.group("low"), between.group("high")
+  else:
+    bound = _BOUND_PATTERN.search(reference.group("range"))
+    if bound is None:
+      return None
+    if bound.group("op") in ("<", "<=", "≤"):
+      high = bound.group("bound")
+    else:
+      low = bound.group("bound")
+
+  number = _to_float(value)
+  if low is not None and number < _to_float(low):
+    band = "low"
+  elif high is not None and number > _to_float(high):
+    band = "high"
+  else:
+    band = "normal"
+
+  return LabResult(
+      test=normalize_test_name(section.get("title", "")),
+      units=result.group("units").lower(),
+      band=band,
+      value=value,
+      low=low,
+      high=high,
+  )
+
+
+def make_template(text: str, lab: LabResult) -> str | None:
+  """
+  Replace the patient's numbers in an explanation with placeholders.
+  Returns None if the text mentions the result nowhere, or mentions any
+  number that is not the result or a range bound (including ones that are
+  not plain numbers, such as "2.3.1"), since that could be specific to
+  this patient.
+  """
+  values = {"result": lab.value, "low": lab.low, "high": lab.high}
+  failed = False
+
+  def placeholder(match: re.Match) -> str:
+    nonlocal failed
+    if not _WELL_FORMED_NUMBER.fullmatch(match.group(0)):
+      failed = True
+      return match.group(0)
+    number = _to_float(match.group(0))
+    for name, value in values.items():
+      if value is not None and number == _to_float(value):
+        return "{" + name + "}"
+    failed = True
+    return match.group(0)
+
+  template = _NUMBER_PATTERN.sub(placeholder, text)
+  if failed or "{result}" not in template:
+    return None
+  return template
+
+
+def fill_template(template: str, lab: LabResult) -> str:
+  values = {"result": lab.value, "low": lab.low, "high": lab.high}
+  return _PLACEHOLDER_PATTERN.sub(lambda match: values[match.group(1)] or match.group(0), template)
+
+
+BAND_SENTENCES = {
+    "normal": "That is within the reference range, which is reassuring.",
+    "high": (
+        "That is above the reference range. One result on its own rarely tells "
+        "the whole story, so it is worth talking through with your doctor."
+    ),
+    "low": (
+        "That is below the reference range. One result on its own rarely tells "
+        "the whole story, so it is worth talking through with your doctor."
+    ),
+}
+
+
+def _field(match: re.Match | None, name: str) -> str:
+  return match.group(name).strip(" \t*_.") if match is not None else ""
+
+
+def _band_is_certain(lab: LabResult, value: str, reference: str) -> bool:
+  """
+  True if the band was read from the number the result line starts with
+  and from a range holding no numbers beyond its bounds (not, say, one
+  range for adults and another for children).
+  """
+  bounds = (lab.low is not None) + (lab.high is not None)
+  return (
+      value.startswith(lab.value)
+      and len(_RANGE_NUMBER_PATTERN.findall(reference)) == bounds
+  )
+
+
+def fallback_explanation(section: dict) -> str:
+  """
+  A short explanation rendered locally from the section's "Patient's
+  Result" and "Reference Range" lines, for when Gemini cannot answer in
+  time.
+  """
+  content = section.get("content", "")
+  title = section.get("title", "").strip(" \t*_") or "this test"
+  value = _field(_RESULT_TEXT_PATTERN.search(content), "value")
+  reference = _field(_RANGE_PATTERN.search(content), "range")
+
+  sentences = [f"Let's look at your {title} result."]
+  if value and reference:
+    sentences.append(f"Your result is {value}, and the reference range is {reference}.")
+  elif value:
+    sentences.append(f"Your result is {value}.")
+  else:
+    sentences.append("I can't walk you through the numbers for this one right now, but they are in your report.")
+
+  # A wrong "within the range" is worse than saying nothing about it
+  lab = parse_lab_result(section)
+  if lab is not None and _band_is_certain(lab, value, reference):
+    sentences.append(BAND_SENTENCES[lab.band])
+  elif value:
+    sentences.append("Your doctor can tell you what this means for you in particular.")
+  else:
+    sentences.append("Your doctor is the best person to go over it with you.")
+  return " ".join(sentences)
+
+
+class ExplanationCache:
+  """
+  Explanation templates for recurring lab tests, shared across patients.
+
+  Keyed by normalized test name, units, result band (low/normal/high
+  against the reference range), which bounds the range has and the exact
+  emotion, whose opener is part of the stored text; the patient's own
+  values are filled in locally. Entries are evicted least-recently-used
+  beyond `max_entries` and expire after `ttl` seconds.
+  """
+
+  def __init__(
+      self,
+      version: str,
+      enabled: bool = EXPLANATION_CACHE_ENABLED,
+      max_entries: int = EXPLANATION_CACHE_MAX_ENTRIES,
+      ttl: float = EXPLANATION_CACHE_TTL_SECONDS,
+      path: str | None = EXPLANATION_CACHE_PATH,
+  ):
+    self.version = version
+    self.enabled = enabled
+    self._templates = ResultCache(max_entries=max_entries, ttl=ttl, path=path) if enabled else None
+    self.stored = 0
+    self.uncacheable = 0
+
+  def _key(self, lab: LabResult, emotion: str) -> str:
+    # The range shape decides which of {low} / {high} a template may use
+    bounds = f"{lab.low is not None}:{lab.high is not None}"
+    emotion = (emotion or "neutral").lower()
+    return cache_key(lab.test.encode(), lab.units, lab.band, bounds, emotion, self.version)
+
+  def render(self, section: dict, emotion: str) -> str | None:
+    """
+    The cached explanation for this section with its values filled in, or
+    None on a miss.
+    """
+    if not self.enabled:
+      return None
+    lab = parse_lab_result(section)
+    if lab is None:
+      return None
+    template = self._templates.get(self._key(lab, emotion))
+    return fill_template(template, lab) if template is not None else None
+
+  def learn(self, section: dict, emotion: str, text: str):
+    """
+    Store a freshly generated explanation as the template for its key.
+    """
+    if not self.enabled:
+      return
+    lab = parse_lab_result(section)
+    template = make_template(text, lab) if lab is not None else None
+    if template is None:
+      self.uncacheable += 1
+      return
+    self._templates.set(self._key(lab, emotion), template)
+    self.stored += 1
+
+  def stats(self) -> dict:
+    if not self.enabled:
+      return {"enabled": False}
+    return {
+        "enabled": True,
+        **self._templates.stats(),
+        "stored": self.stored,
+        "uncacheable": self.uncacheable,
+    }
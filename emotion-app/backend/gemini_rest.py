@@ -0,0 +1,109 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+
+
+def _camel(name: str) -> str:
+  head, *rest = name.split("_")
+  return head + "".join(part.title() for part in rest)
+
+
+class GeminiResponse:
+  """
+  The slice of the SDK's GenerateContentResponse the backend reads.
+  """
+
+  def __init__(self, data: dict):
+    candidates = data.get("candidates") or [{}]
+    self.parts = (candidates[0].get("content") or {}).get("parts") or []
+    self.text = "".join(part.get("text", "") for part in self.parts)
+
+
+class _Stream:
+  def __init__(self, client: httpx.AsyncClient, request: httpx.Request):
+    self._client = client
+    self._request = request
+
+  async def __aiter__(self):
+    response = await self._client.send(self._request, stream=True)
+    try:
+      response.raise_for_status()
+      async for line in response.aiter_lines():
+        if line.startswith("data:"):
+          yield GeminiResponse(json.loads(line[5:]))
+    finally:
+      await response.aclose()
+
+
+class GeminiRESTModel:
+  """
+  Drop-in for `genai.GenerativeModel` that talks to a Gemini-compatible
+  REST endpoint at `base_url` (for instance benchmarks/standin_server.py),
+  so the backend can run against a local stand-in instead of Google.
+  Supports what LLMGateway uses: `generate_content_async`, optionally
+  streamed, with a `generation_config` dict.
+  """
+
+  def __init__(self, model_name: str, base_url: str, api_key: str | None = None, timeout: float = 120.0):
+    self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+    self.base_url = base_url.rstrip("/")
+    self._headers = {"x-goog-api-key": api_key or ""}
+    self._timeout = timeout
+    self._client = None
+
+  def _async_client(self) -> httpx.AsyncClient:
+    if self._client is None:
+      self._client = httpx.AsyncClient(
+          base_url=self.base_url, headers=self._headers, timeout=self._timeout
+      )
+    return self._client
+
+  def _body(self, prompt, generation_config: dict | None) -> dict:
+    body = {"contents": [{"role": "user", "parts": [{"text": str(prompt)}]}]}
+    if generation_config:
+      body["generationConfig"] = {
+          _camel(name): value for name, value in generation_config.items()
+      }
+    return body
+
+  async def generate_content_async(self, prompt, stream: bool = False, generation_config: dict | None = None):
+    client = self._async_client()
+    body = self._body(prompt, generation_config)
+    if stream:
+      request = client.build_request(
+          "POST", f"/v1beta/{self.model_name}:streamGenerateContent",
+          params={"alt": "sse"}, json=body,
+      )
+      return _Stream(client, request)
+
+    response = await client.post(f"/v1beta/{self.model_name}:generateContent", json=body)
+    response.raise_for_status()
+    return GeminiResponse(response.json())
+
+  def get_model(self) -> dict:
+    with httpx.Client(base_url=self.base_url, headers=self._headers, timeout=10.0) as client:
+      response = client.get(f"/v1beta/{self.model_name}")
+      response.raise_for_status()
+      return response.json()
+
+  def list_models(self) -> list:
+    """
+    Models in the shape `genai.list_models()` yields.
+    """
+    with httpx.Client(base_url=self.base_url, headers=self._headers, timeout=10.0) as client:
+      response = client.get("/v1beta/models")
+      response.raise_for_status()
+    return [
+        SimpleNamespace(
+            name=entry.get("name"),
+            display_name=entry.get("displayName"),
+            supported_generation_methods=entry.get("supportedGenerationMethods", []),
+        )
+        for entry in response.json().get("models", [])
+    ]
+
+  async def aclose(self):
+    if self._client is not None:
+      await self._client.aclose()
+      self._client = None
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+
+
+HEALTH_PROBE_INTERVAL_SECONDS = float(os.environ.get("HEALTH_PROBE_INTERVAL_SECONDS", "30"))
+HEALTH_PROBE_MAX_BACKOFF_SECONDS = float(os.environ.get("HEALTH_PROBE_MAX_BACKOFF_SECONDS", "300"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.environ.get("HEALTH_PROBE_TIMEOUT_SECONDS", "10"))
+MODELS_CACHE_TTL_SECONDS = float(os.environ.get("MODELS_CACHE_TTL_SECONDS", "600"))
+
+
+class HealthProber:
+  """
+  Background upstream checks so readiness requests never call upstream.
+
+  `checks` maps a name to `async check()`, which raises on failure. Each
+  check runs on its own loop every `interval` seconds; after consecutive
+  failures the delay doubles up to `max_backoff` so a dead upstream is not
+  hammered. `snapshot()` reports the last result of each check, its age and
+  how long the upstream took to answer. Checks named in `optional` are
+  reported but do not decide readiness.
+  """
+
+  def __init__(
+      self,
+      checks: dict,
+      interval: float = HEALTH_PROBE_INTERVAL_SECONDS,
+      max_backoff: float = HEALTH_PROBE_MAX_BACKOFF_SECONDS,
+      timeout: float = HEALTH_PROBE_TIMEOUT_SECONDS,
+      optional: tuple = (),
+  ):
+    self.checks = checks
+    self.optional = set(optional)
+    self.interval = interval
+    self.max_backoff = max_backoff
+    self.timeout = timeout
+    self._results = {}
+    self._tasks = []
+
+  def start(self):
+    if not self._tasks:
+      self._tasks = [
+          asyncio.create_task(self._run(name, check))
+          for name, check in self.checks.items()
+      ]
+
+  async def stop(self):
+    for task in self._tasks:
+      task.cancel()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
+    self._tasks = []
+
+  async def probe(self, name: str, check) -> bool:
+    started = time.perf_counter()
+    try:
+      await asyncio.wait_for(check(), self.timeout)
+      ok, error = True, None
+    except Exception as e:
+      ok, error = False, str(e) or type(e).__name__
+
+    previous = self._results.get(name, {})
+    self._results[name] = {
+        "ok": ok,
+        "error": error,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "checked_at": time.time(),
+        "failures": 0 if ok else previous.get("failures", 0) + 1,
+    }
+    return ok
+
+  async def _run(self, name: str, check):
+    while True:
+      await self.probe(name, check)
+      failures = self._results[name]["failures"]
+      await asyncio.sleep(min(self.interval * 2 ** failures, self.max_backoff))
+
+  def snapshot(self) -> dict:
+    now = time.time()
+    upstreams = {}
+    for name in self.checks:
+      result = self._results.get(name)
+      if result is None:
+        upstreams[name] = {"ok": False, "error": "not checked yet"}
+        continue
+      upstreams[name] = {
+          **result,
+          "age_seconds": round(now - result["checked_at"], 1),
+      }
+    required = [result for name, result in upstreams.items() if name not in self.optional]
+    return {
+        "ready": bool(required) and all(result["ok"] for result in required),
+        "upstreams": upstreams,
+    }
+
+
+class TTLCache:
+  """
+  Cache the result of a slow blocking call (e.g. `genai.list_models()`) for
+  `ttl` seconds. The call runs in a thread and concurrent misses share it.
+  """
+
+  def __init__(self, load, ttl: float = MODELS_CACHE_TTL_SECONDS):
+    self._load = load
+    self.ttl = ttl
+    self._value = None
+    self._loaded_at = 0.0
+    self._lock = asyncio.Lock()
+
+  async def get(self):
+    if self._value is not None and time.monotonic() - self._loaded_at < self.ttl:
+      return self._value
+    async with self._lock:
+      if self._value is None or time.monotonic() - self._loaded_at >= self.ttl:
+        self._value = await asyncio.to_thread(self._load)
+        self._loaded_at = time.monotonic()
+    return self._value
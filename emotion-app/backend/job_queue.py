@@ -0,0 +1,252 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+
+from observability import log
+
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "100"))
+JOB_TTL_SECONDS = float(os.environ.get("JOB_TTL_SECONDS", "86400"))
+# Set to keep finished jobs across restarts and share them between workers
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH")
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+FINISHED = ("done", "error")
+
+
+class QueueFull(Exception):
+  pass
+
+
+@dataclass
+class Job:
+  id: str
+  kind: str
+  filename: str
+  client_id: str
+  priority: str
+  options: dict
+  status: str = "queued"
+  result: dict | None = None
+  error: str | None = None
+  created: float = field(default_factory=time.time)
+  updated: float = field(default_factory=time.time)
+
+  def to_dict(self) -> dict:
+    data = asdict(self)
+    data["job_id"] = data.pop("id")
+    return data
+
+
+class JobStore:
+  """
+  Optional SQLite persistence for job records (results included).
+  """
+
+  def __init__(self, path: str):
+    self._lock = threading.Lock()
+    self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+    self._db.execute("PRAGMA journal_mode=WAL")
+    self._db.execute(
+        "CREATE TABLE IF NOT EXISTS jobs "
+        "(id TEXT PRIMARY KEY, record TEXT NOT NULL, updated REAL NOT NULL)"
+    )
+    self._db.commit()
+
+  def save(self, record: dict):
+    with self._lock:
+      self._db.execute(
+          "INSERT OR REPLACE INTO jobs (id, record, updated) VALUES (?, ?, ?)",
+          (record["job_id"], json.dumps(record), record["updated"]),
+      )
+      self._db.execute(
+          "DELETE FROM jobs WHERE updated < ?", (time.time() - JOB_TTL_SECONDS,)
+      )
+      self._db.commit()
+
+  def get(self, job_id: str) -> dict | None:
+    with self._lock:
+      row = self._db.execute(
+          "SELECT record FROM jobs WHERE id = ?", (job_id,)
+      ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+class JobQueue:
+  """
+  Bounded worker pool for PDF analysis jobs.
+
+  `handlers` maps a job kind to `async handler(data, job, on_stage) -> dict`;
+  `data` is whatever was submitted with the job and is held until it runs.
+  Jobs are served highest priority first; within a priority, clients take
+  turns so one client submitting fifty bills cannot starve everyone else.
+  """
+
+  def __init__(
+      self,
+      handlers: dict,
+      workers: int = JOB_WORKERS,
+      max_pending: int = JOB_MAX_PENDING,
+      store_path: str | None = JOB_STORE_PATH,
+  ):
+    self.handlers = handlers
+    self.workers = workers
+    self.max_pending = max_pending
+    self._store = JobStore(store_path) if store_path else None
+    self._jobs = {}
+    self._payloads = {}
+    # job id -> queues of listeners in `events`, until the job finishes
+    self._listeners = {}
+    self._waiting = {rank: OrderedDict() for rank in PRIORITIES.values()}
+    self._pending = 0
+    self._ready = asyncio.Condition()
+    self._tasks = []
+
+  def start(self):
+    if not self._tasks:
+      self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+  async def stop(self):
+    for task in self._tasks:
+      task.cancel()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
+    self._tasks = []
+
+  async def submit(
+      self,
+      kind: str,
+      filename: str,
+      data,
+      client_id: str,
+      priority: str = "normal",
+      options: dict | None = None,
+  ) -> Job:
+    if self._pending >= self.max_pending:
+      raise QueueFull("Too many jobs waiting, try again later")
+    self.start()
+
+    job = Job(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        filename=filename,
+        client_id=client_id,
+        priority=priority if priority in PRIORITIES else "normal",
+        options=options or {},
+    )
+    self._jobs[job.id] = job
+    self._payloads[job.id] = data
+    self._listeners[job.id] = set()
+    self._save(job)
+
+    clients = self._waiting[PRIORITIES[job.priority]]
+    clients.setdefault(client_id, deque()).append(job)
+    self._pending += 1
+    async with self._ready:
+      self._ready.notify()
+    return job
+
+  def get(self, job_id: str) -> dict | None:
+    job = self._jobs.get(job_id)
+    if job is not None:
+      return job.to_dict()
+    return self._store.get(job_id) if self._store else None
+
+  async def events(self, job_id: str):
+    """
+    Yield the job record every time it changes, ending with the finished
+    record. Every change is delivered, however slowly the caller consumes.
+    """
+    record = self.get(job_id)
+    if record is None:
+      return
+    listeners = self._listeners.get(job_id)
+    if listeners is None or record["status"] in FINISHED:
+      # Finished, or only known from the store
+      yield record
+      return
+
+    # Registered before the first yield, so no update can slip past
+    queue = asyncio.Queue()
+    listeners.add(queue)
+    try:
+      yield record
+      while record["status"] not in FINISHED:
+        record = await queue.get()
+        yield record
+    finally:
+      listeners.discard(queue)
+
+  def _next_job(self) -> Job | None:
+    for rank in sorted(self._waiting):
+      clients = self._waiting[rank]
+      if not clients:
+        continue
+      client_id, jobs = next(iter(clients.items()))
+      job = jobs.popleft()
+      del clients[client_id]
+      if jobs:
+        # Back of the line: the next job from this client waits its turn
+        clients[client_id] = jobs
+      self._pending -= 1
+      return job
+    return None
+
+  async def _work(self):
+    while True:
+      async with self._ready:
+        await self._ready.wait_for(lambda: self._pending > 0)
+        job = self._next_job()
+      await self._run(job)
+
+  async def _run(self, job: Job):
+    data = self._payloads.pop(job.id)
+    try:
+      result = await self.handlers[job.kind](
+          data, job, lambda stage: self._update(job, status=stage)
+      )
+      if "error" in result:
+        self._update(job, status="error", error=result["error"])
+      else:
+        self._update(job, status="done", result=result)
+    except Exception as e:
+      log("Job failed", job_id=job.id, error=str(e))
+      self._update(job, status="error", error=str(e))
+    finally:
+      self._forget_old()
+
+  def _update(self, job: Job, **changes):
+    for name, value in changes.items():
+      setattr(job, name, value)
+    job.updated = time.time()
+    self._save(job)
+
+    listeners = self._listeners.get(job.id)
+    if listeners:
+      record = job.to_dict()
+      for queue in listeners:
+        queue.put_nowait(record)
+    if job.status in FINISHED:
+      self._listeners.pop(job.id, None)
+
+  def _save(self, job: Job):
+    if self._store is not None:
+      self._store.save(job.to_dict())
+
+  def _forget_old(self):
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id, job in list(self._jobs.items()):
+      if job.status in FINISHED and job.updated < cutoff:
+        del self._jobs[job_id]
+
+  def stats(self) -> dict:
+    statuses = {}
+    for job in self._jobs.values():
+      statuses[job.status] = statuses.get(job.status, 0) + 1
+    return {"pending": self._pending, "workers": self.workers, "jobs": statuses}
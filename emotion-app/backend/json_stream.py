@@ -0,0 +1,68 @@
+import json
+
+
+class JSONObjectStream:
+  """
+  Pull JSON objects out of model output while it is still streaming.
+
+  `feed` scans only the new text, tracking strings and bracket nesting, and
+  returns every object nested inside the outermost container that closed
+  in it, innermost first; the outermost container itself is never parsed,
+  so only the text of open inner objects is kept. Text outside JSON (code
+  fences, stray prose) is skipped.
+  """
+
+  def __init__(self):
+    self._buffer = ""
+    self._stack = []
+    self._in_string = False
+    self._escaped = False
+
+  def feed(self, text: str) -> list[dict]:
+    scan_from = len(self._buffer)
+    self._buffer += text
+    buffer = self._buffer
+    found = []
+
+    for index in range(scan_from, len(buffer)):
+      char = buffer[index]
+      if self._in_string:
+        if self._escaped:
+          self._escaped = False
+        elif char == "\\":
+          self._escaped = True
+        elif char == '"':
+          self._in_string = False
+      elif char == '"':
+        self._in_string = True
+      elif char in "{[":
+        self._stack.append((char, index))
+      elif char in "}]" and self._stack:
+        opener, start = self._stack.pop()
+        if opener != "{" or char != "}" or start is None:
+          continue
+        try:
+          value = json.loads(buffer[start:index + 1])
+        except ValueError:
+          continue
+        if isinstance(value, dict):
+          found.append(value)
+
+    self._trim()
+    return found
+
+  def _trim(self):
+    # Keep text from the first object still open inside the outermost
+    # container; the outermost one itself is never needed whole
+    keep = len(self._buffer)
+    for depth, (opener, start) in enumerate(self._stack):
+      if depth and opener == "{" and start is not None:
+        keep = start
+        break
+    if keep == 0:
+      return
+    self._buffer = self._buffer[keep:]
+    self._stack = [
+        (opener, start - keep if start is not None and start >= keep else None)
+        for opener, start in self._stack
+    ]
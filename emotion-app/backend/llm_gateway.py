@@ -0,0 +1,176 @@
+import asyncio
+import os
+import time
+
+from fastapi import Request
+
+from observability import (
+    LLM_ERRORS,
+    LLM_FIRST_CHUNK_SECONDS,
+    LLM_PROMPT_CHARS,
+    LLM_RESPONSE_CHARS,
+    LLM_SECONDS,
+    endpoint,
+)
+from llm_scheduler import LLMScheduler, current_priority
+from single_flight import SingleFlight, flight_key
+
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "60"))
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class LLMTimeoutError(Exception):
+  pass
+
+
+class ClientDisconnected(Exception):
+  pass
+
+
+class LLMGateway:
+  """
+  Single entry point for every Gemini call made by the backend.
+
+  Calls go through the SDK's async API so they never block the event loop,
+  are admitted by an LLMScheduler (at most `max_concurrency` in flight per
+  worker, highest priority first, shed with LLMOverloaded when the wait
+  would be too long), every call gets a timeout, and HTTP callers can pass
+  their `Request` so the upstream call is cancelled as soon as the client
+  goes away. `priority` defaults to the one set with `use_priority`.
+
+  Identical concurrent `generate` calls (same prompt and options) share one
+  upstream call; pass `coalesce=False` when distinct samples are wanted.
+  """
+
+  def __init__(
+      self,
+      model,
+      max_concurrency: int = LLM_MAX_CONCURRENCY,
+      timeout: float = LLM_TIMEOUT_SECONDS,
+  ):
+    self.model = model
+    self.timeout = timeout
+    self.scheduler = LLMScheduler(max_concurrency)
+    self.flights = SingleFlight()
+
+  async def generate(
+      self,
+      prompt,
+      *,
+      request: Request | None = None,
+      timeout: float | None = None,
+      coalesce: bool = True,
+      priority: str | None = None,
+      **kwargs,
+  ) -> str:
+    timeout = timeout or self.timeout
+    priority = priority or current_priority.get()
+    if coalesce:
+      key = flight_key(
+          getattr(self.model, "model_name", None), prompt, sorted(kwargs.items())
+      )
+      call = self.flights.do(key, lambda: self._generate(prompt, timeout, priority, kwargs))
+    else:
+      call = self._generate(prompt, timeout, priority, kwargs)
+    if request is None:
+      return await call
+    return await cancel_on_disconnect(request, call)
+
+  async def _generate(self, prompt, timeout: float, priority: str, kwargs: dict) -> str:
+    name = endpoint.get()
+    async with self.scheduler.slot(priority):
+      started = time.perf_counter()
+      try:
+        response = await asyncio.wait_for(
+            self.model.generate_content_async(prompt, **kwargs), timeout
+        )
+      except asyncio.TimeoutError:
+        LLM_ERRORS.inc(name, "timeout")
+        raise LLMTimeoutError(f"Gemini call timed out after {timeout:g}s")
+      except Exception as e:
+        LLM_ERRORS.inc(name, type(e).__name__)
+        raise
+    text = response.text
+    LLM_SECONDS.observe(time.perf_counter() - started, name, "generate")
+    LLM_PROMPT_CHARS.observe(len(str(prompt)), name)
+    LLM_RESPONSE_CHARS.observe(len(text), name)
+    return text
+
+  async def stream(
+      self, prompt, *, timeout: float | None = None, priority: str | None = None, **kwargs
+  ):
+    """
+    Yield the response text chunk by chunk as Gemini produces it.
+
+    `timeout` bounds the wait for each chunk rather than the whole stream,
+    so long answers are fine as long as they keep moving. Use with
+    `contextlib.aclosing` so the concurrency slot is released promptly if
+    the consumer stops early.
+    """
+    timeout = timeout or self.timeout
+    priority = priority or current_priority.get()
+    name = endpoint.get()
+    async with self.scheduler.slot(priority):
+      started = time.perf_counter()
+      size = 0
+      try:
+        response = await asyncio.wait_for(
+            self.model.generate_content_async(prompt, stream=True, **kwargs),
+            timeout,
+        )
+        chunks = response.__aiter__()
+        while True:
+          try:
+            chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+          except StopAsyncIteration:
+            break
+          if chunk.parts and chunk.text:
+            if not size:
+              LLM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - started, name)
+            size += len(chunk.text)
+            yield chunk.text
+      except asyncio.TimeoutError:
+        LLM_ERRORS.inc(name, "timeout")
+        raise LLMTimeoutError(f"Gemini stream stalled for more than {timeout:g}s")
+      except Exception as e:
+        LLM_ERRORS.inc(name, type(e).__name__)
+        raise
+    LLM_SECONDS.observe(time.perf_counter() - started, name, "stream")
+    LLM_PROMPT_CHARS.observe(len(str(prompt)), name)
+    LLM_RESPONSE_CHARS.observe(size, name)
+
+
+async def _wait_for_disconnect(request: Request):
+  while not await request.is_disconnected():
+    await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def cancel_on_disconnect(request: Request, coro):
+  """
+  Await `coro`, cancelling it if the HTTP client disconnects first.
+  """
+  watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+  try:
+    return await cancel_when(watcher, coro)
+  finally:
+    watcher.cancel()
+
+
+async def cancel_when(signal: asyncio.Future, coro):
+  """
+  Await `coro`, cancelling it and raising ClientDisconnected if `signal`
+  (typically a task that finishes when the client goes away) completes first.
+  """
+  work = asyncio.ensure_future(coro)
+
+  try:
+    await asyncio.wait({work, signal}, return_when=asyncio.FIRST_COMPLETED)
+  finally:
+    if not work.done():
+      work.cancel()
+
+  if not work.done() or work.cancelled():
+    raise ClientDisconnected("Client disconnected before the response was ready")
+  return work.result()
@@ -0,0 +1,238 @@
+import asyncio
+import contextvars
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from observability import Counter, Histogram
+
+
+# Highest priority first. Interactive is a patient waiting on a
+# comfort_stream turn; background is work nobody is watching live.
+PRIORITY_CLASSES = ("interactive", "standard", "background")
+
+# Requests per minute allowed by the Gemini quota; 0 disables the limiter
+LLM_RATE_PER_MINUTE = float(os.environ.get("LLM_RATE_PER_MINUTE", "0"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "10"))
+# Concurrency slots only interactive calls may use, so batch work can
+# never fill every slot in front of a WebSocket turn
+LLM_INTERACTIVE_RESERVED_SLOTS = int(os.environ.get("LLM_INTERACTIVE_RESERVED_SLOTS", "2"))
+LLM_QUEUE_LIMITS = {
+    "interactive": int(os.environ.get("LLM_QUEUE_LIMIT_INTERACTIVE", "64")),
+    "standard": int(os.environ.get("LLM_QUEUE_LIMIT_STANDARD", "32")),
+    "background": int(os.environ.get("LLM_QUEUE_LIMIT_BACKGROUND", "32")),
+}
+# Longest a call may wait for a slot before it is shed
+LLM_MAX_WAIT_SECONDS = {
+    "interactive": float(os.environ.get("LLM_MAX_WAIT_INTERACTIVE", "30")),
+    "standard": float(os.environ.get("LLM_MAX_WAIT_STANDARD", "15")),
+    "background": float(os.environ.get("LLM_MAX_WAIT_BACKGROUND", "30")),
+}
+
+LLM_QUEUE_SECONDS = Histogram(
+    "llm_queue_seconds", "Time an LLM call waited for the scheduler", ("priority",)
+)
+LLM_SHED = Counter("llm_shed_total", "LLM calls refused by the scheduler", ("priority", "reason"))
+
+current_priority = contextvars.ContextVar("llm_priority", default="standard")
+
+
+def use_priority(priority: str):
+  """
+  Run the current task's LLM calls (and those of tasks it starts) at `priority`.
+  """
+  if priority not in PRIORITY_CLASSES:
+    raise ValueError(f"Unknown LLM priority: {priority}")
+  current_priority.set(priority)
+
+
+class LLMOverloaded(Exception):
+  def __init__(self, message: str, retry_after: float):
+    super().__init__(message)
+    self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Waiter:
+  __slots__ = ("future", "enqueued")
+
+  def __init__(self, future: asyncio.Future):
+    self.future = future
+    self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+  """
+  Admission control in front of every Gemini call.
+
+  A call needs a concurrency slot and, when a rate is set, a token from a
+  bucket refilled at `rate_per_minute`. Waiting calls are queued per
+  priority class and always served highest class first; the last
+  `reserved` slots are kept for interactive calls. Calls are shed with
+  LLMOverloaded (carrying a Retry-After estimate) when their class queue
+  is full, when the estimated wait already exceeds the class's maximum,
+  or when they have waited that long.
+  """
+
+  def __init__(
+      self,
+      max_concurrency: int,
+      rate_per_minute: float = LLM_RATE_PER_MINUTE,
+      burst: int = LLM_BURST,
+      reserved: int = LLM_INTERACTIVE_RESERVED_SLOTS,
+      queue_limits: dict = LLM_QUEUE_LIMITS,
+      max_wait: dict = LLM_MAX_WAIT_SECONDS,
+  ):
+    self.max_concurrency = max_concurrency
+    self.rate = rate_per_minute / 60.0
+    self.burst = max(burst, 1)
+    self.reserved = min(reserved, max_concurrency - 1)
+    self.queue_limits = queue_limits
+    self.max_wait = max_wait
+    self._queues = {name: deque() for name in PRIORITY_CLASSES}
+    self._running = 0
+    self._tokens = float(self.burst)
+    self._refilled = time.monotonic()
+    self._timer = None
+    # Moving average of how long a call holds its slot, for wait estimates
+    self._hold_seconds = 2.0
+    self._stats = {name: {"admitted": 0, "shed": 0, "expired": 0} for name in PRIORITY_CLASSES}
+
+  def _refill(self):
+    if not self.rate:
+      return
+    now = time.monotonic()
+    self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+    self._refilled = now
+
+  def _can_start(self, priority: str) -> bool:
+    slots = self.max_concurrency if priority == "interactive" else self.max_concurrency - self.reserved
+    return self._running < slots and (not self.rate or self._tokens >= 1)
+
+  def _start(self, priority: str):
+    self._running += 1
+    if self.rate:
+      self._tokens -= 1
+    self._stats[priority]["admitted"] += 1
+
+  def _ahead_of(self, priority: str) -> int:
+    rank = PRIORITY_CLASSES.index(priority)
+    return sum(
+        sum(not waiter.future.done() for waiter in self._queues[name])
+        for name in PRIORITY_CLASSES[:rank + 1]
+    )
+
+  def estimated_wait(self, priority: str) -> float:
+    """
+    Rough time until a call arriving now at `priority` would start.
+    """
+    self._refill()
+    ahead = self._ahead_of(priority)
+    if not ahead and self._can_start(priority):
+      return 0.0
+    slots = self.max_concurrency if priority == "interactive" else self.max_concurrency - self.reserved
+    by_slots = (ahead + 1) / slots * self._hold_seconds
+    by_tokens = max(0.0, ahead + 1 - self._tokens) / self.rate if self.rate else 0.0
+    return max(by_slots, by_tokens)
+
+  def _shed(self, priority: str, reason: str, message: str, retry_after: float):
+    self._stats[priority]["shed" if reason != "expired" else "expired"] += 1
+    LLM_SHED.inc(priority, reason)
+    raise LLMOverloaded(message, retry_after)
+
+  def check(self, priority: str):
+    """
+    Raise LLMOverloaded now if a call at `priority` would be shed, e.g.
+    before committing to a streamed response.
+    """
+    waiting = sum(not waiter.future.done() for waiter in self._queues[priority])
+    if waiting >= self.queue_limits[priority]:
+      self._shed(priority, "queue_full", "Too many requests waiting for the model", self.estimated_wait(priority))
+    wait = self.estimated_wait(priority)
+    if wait > self.max_wait[priority]:
+      self._shed(priority, "deadline", "The model is busy, try again shortly", wait)
+
+  def _dispatch(self):
+    self._refill()
+    for name in PRIORITY_CLASSES:
+      queue = self._queues[name]
+      while queue:
+        if queue[0].future.done():
+          # Cancelled or expired while waiting
+          queue.popleft()
+          continue
+        if not self._can_start(name):
+          break
+        waiter = queue.popleft()
+        self._start(name)
+        waiter.future.set_result(None)
+    self._schedule_refill()
+
+  def _schedule_refill(self):
+    if not self.rate or self._timer is not None or self._tokens >= 1:
+      return
+    if not any(self._queues.values()):
+      return
+
+    def fire():
+      self._timer = None
+      self._dispatch()
+
+    self._timer = asyncio.get_running_loop().call_later((1 - self._tokens) / self.rate, fire)
+
+  async def acquire(self, priority: str):
+    self._refill()
+    queue = self._queues[priority]
+    if self._ahead_of(priority) == 0 and self._can_start(priority):
+      self._start(priority)
+      LLM_QUEUE_SECONDS.observe(0.0, priority)
+      return
+
+    self.check(priority)
+    waiter = _Waiter(asyncio.get_running_loop().create_future())
+    queue.append(waiter)
+    self._schedule_refill()
+    try:
+      await asyncio.wait_for(waiter.future, self.max_wait[priority])
+    except asyncio.TimeoutError:
+      self._shed(priority, "expired", "Timed out waiting for the model", self.estimated_wait(priority))
+    except asyncio.CancelledError:
+      if waiter.future.done() and not waiter.future.cancelled():
+        # Granted a slot just as the caller went away
+        self.release(0.0)
+      raise
+    LLM_QUEUE_SECONDS.observe(time.monotonic() - waiter.enqueued, priority)
+
+  def release(self, held: float):
+    self._running -= 1
+    if held:
+      self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held
+    self._dispatch()
+
+  @asynccontextmanager
+  async def slot(self, priority: str):
+    await self.acquire(priority)
+    started = time.monotonic()
+    try:
+      yield
+    finally:
+      self.release(time.monotonic() - started)
+
+  def stats(self) -> dict:
+    self._refill()
+    return {
+        "running": self._running,
+        "max_concurrency": self.max_concurrency,
+        "reserved_for_interactive": self.reserved,
+        "rate_per_minute": self.rate * 60,
+        "tokens": round(self._tokens, 2) if self.rate else None,
+        "hold_seconds": round(self._hold_seconds, 3),
+        "classes": {
+            name: {
+                "waiting": sum(not waiter.future.done() for waiter in self._queues[name]),
+                **counts,
+            }
+            for name, counts in self._stats.items()
+        },
+    }
@@ -1,257 +1,660 @@
+import asyncio
 import os
-import io
 import json
 import re
+import time
+import uuid
+from contextlib import aclosing, asynccontextmanager
 
-import pypdf
 import google.generativeai as genai
-from fastapi import FastAPI, UploadFile, File, WebSocket
+from fastapi import FastAPI, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import httpx
 
+from llm_gateway import ClientDisconnected, LLMGateway, cancel_when
+from llm_scheduler import LLMOverloaded, use_priority
+from result_cache import ResultCache
+from pdf_extraction import extract_pdf_text, shutdown_pool
+from section_prefetch import SectionPrefetcher, prefetch_stats
+from section_deadline import (
+    SECTION_DEADLINE_SECONDS,
+    SECTION_HEDGE_ENABLED,
+    DeadlineExceeded,
+    Reply,
+    deadline_stats,
+    hedged,
+    open_stream,
+    record_fallback,
+    section_latency,
+)
+from message_pool import MessagePool
+from session_store import create_session_store
+from tts_cache import TTSCache, tts_cache_key
+from tts_pipeline import render_in_order, split_sentences
+from bill_analysis import (
+    BILL_CHUNK_CONCURRENCY,
+    BILL_CHUNK_RETRIES,
+    chunk_pages,
+    merge_bill_analyses,
+)
+from bill_codes import (
+    add_local_findings,
+    analyze_bill_lines,
+    build_digest,
+    local_bill_analysis,
+)
+from job_queue import FINISHED, JobQueue, QueueFull
+from single_flight import SingleFlight
+from health_probe import HealthProber, TTLCache
+from json_stream import JSONObjectStream
+from schemas import BillAnalysis, BillingIssue, CallScript
+from structured_output import generate_structured, json_mode, structured_stats
+from phi_redaction import PHIRedactor, names_from, strip_patient_identifiers
+from section_parser import LiveSections, SectionParser, parse_sections
+from explanation_cache import ExplanationCache, fallback_explanation
+from gemini_rest import GeminiRESTModel
+from uploads import (
+    MULTIPART_OVERHEAD_BYTES,
+    UPLOAD_MAX_BYTES,
+    UPLOAD_MAX_REQUEST_BYTES,
+    Upload,
+    UploadLimitMiddleware,
+    UploadRejected,
+    receive_upload,
+    upload_stats,
+)
+from observability import (
+    METRICS_ENABLED,
+    RequestContextMiddleware,
+    bind,
+    log,
+    observe_phase,
+    phase,
+    render_metrics,
+)
+
 load_dotenv()
 
 GOOGLE_API_KEY = os.environ.get("GEMINI_API_KEY")
 FISH_AUDIO_KEY = os.environ.get("FISH_AUDIO_API_KEY")
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-2.5-flash")
+GEMINI_MODEL = "gemini-2.5-flash"
+# Point the backend at other upstreams, e.g. benchmarks/standin_server.py for
+# load tests that must not spend quota
+GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE")
+FISH_AUDIO_API_BASE = os.environ.get("FISH_AUDIO_API_BASE", "https://api.fish.audio").rstrip("/")
 
-app = FastAPI()
+genai.configure(api_key=GOOGLE_API_KEY)
+if GEMINI_API_BASE:
+  model = GeminiRESTModel(GEMINI_MODEL, GEMINI_API_BASE, GOOGLE_API_KEY)
+else:
+  model = genai.GenerativeModel(GEMINI_MODEL)
+llm = LLMGateway(model)
+result_cache = ResultCache()
+
+# Bump when a prompt changes so cached results from the old prompt are not reused
+REPORT_PROMPT_VERSION = "report-v2"
+SECTION_PROMPT_VERSION = "section-v1"
+BILL_PROMPT_VERSION = "bill-v4"
+
+BILL_MAX_CHARS = 15000
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  health_prober.start()
+  if GOOGLE_API_KEY:
+      message_pool.start()
+  yield
+  await health_prober.stop()
+  await job_queue.stop()
+  await message_pool.stop()
+  await close_tts_client()
+  if GEMINI_API_BASE:
+      await model.aclose()
+  shutdown_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/analyze-report": UPLOAD_MAX_BYTES,
+        "/analyze-bill": UPLOAD_MAX_BYTES,
+        "/jobs": UPLOAD_MAX_REQUEST_BYTES,
+    },
+    overhead=MULTIPART_OVERHEAD_BYTES,
+)
+app.add_middleware(RequestContextMiddleware)
+# Added last so it is outermost: every response, a 413 included, gets the
+# CORS headers the browser needs to read it
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-TTS-Key"],
 )
 
+
+# ---------------------------------------------------
+# HEALTH (served from background probes, never calls upstream inline)
+# ---------------------------------------------------
+async def check_gemini():
+  if not GOOGLE_API_KEY:
+      raise RuntimeError("API Key missing")
+  # Model metadata lookup: proves the key and network work without spending tokens
+  if GEMINI_API_BASE:
+      await asyncio.to_thread(model.get_model)
+  else:
+      await asyncio.to_thread(genai.get_model, model.model_name)
+
+
+async def check_fish_audio():
+  if not FISH_AUDIO_KEY:
+      raise RuntimeError("Missing FISH_AUDIO_API_KEY in environment")
+  response = await get_tts_client().get(
+      FISH_AUDIO_HEALTH_URL, headers={"Authorization": f"Bearer {FISH_AUDIO_KEY}"}
+  )
+  response.raise_for_status()
+
+
+upstream_checks = {"gemini": check_gemini}
+if FISH_AUDIO_KEY:
+  upstream_checks["fish_audio"] = check_fish_audio
+# Reports and bills still work without speech, so TTS never gates readiness
+health_prober = HealthProber(upstream_checks, optional=("fish_audio",))
+
+
+@app.get("/live")
+async def liveness():
+  """
+  The process is up and serving requests. No upstream is contacted.
+  """
+  return {"status": "alive"}
+
+
+@app.get("/ready")
+async def readiness():
+  """
+  Last background probe result per upstream (with its age and latency);
+  503 until Gemini has answered its most recent probe. Fish Audio is
+  probed and reported only when configured, and never makes this fail.
+  """
+  snapshot = health_prober.snapshot()
+  return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
 @app.get("/health")
 async def health_check():
-  if not GOOGLE_API_KEY:
-      return {"status": "error", "message": "API Key missing"}
+  gemini = health_prober.snapshot()["upstreams"]["gemini"]
+  if gemini["ok"]:
+      return {"status": "ready", "api": "connected", "age_seconds": gemini["age_seconds"]}
+  return {"status": "error", "message": f"API error: {gemini['error']}"}
+
+
+def load_models() -> list:
+  models = []
+  for m in model.list_models() if GEMINI_API_BASE else genai.list_models():
+      if "generateContent" in m.supported_generation_methods:
+          models.append(
+              {
+                  "name": m.name,
+                  "display_name": m.display_name,
+                  "supported_methods": m.supported_generation_methods,
+              }
+          )
+  return models
 
-  try:
-      model.generate_content(
-          "Say 'Hello'",
-          generation_config=genai.GenerationConfig(max_output_tokens=10),
-      )
-      return {"status": "ready", "api": "connected"}
-  except Exception as e:
-      return {"status": "error", "message": f"API error: {str(e)}"}
+
+models_cache = TTLCache(load_models)
 
 
 @app.get("/list-models")
 async def list_models():
   try:
-      models = []
-      for m in genai.list_models():
-          if "generateContent" in m.supported_generation_methods:
-              models.append(
-                  {
-                      "name": m.name,
-                      "display_name": m.display_name,
-                      "supported_methods": m.supported_generation_methods,
-                  }
-              )
-      return {"models": models}
+      return {"models": await models_cache.get()}
   except Exception as e:
       return {"error": str(e)}
 
 
+@app.get("/cache-stats")
+async def cache_stats():
+  return {
+      "results": result_cache.stats(),
+      "prefetch": prefetch_stats(),
+      "tts": tts_cache.stats(),
+      "coalesced": {"llm": llm.flights.stats(), "tts": tts_flights.stats()},
+      "structured": structured_stats(),
+      "explanations": explanation_cache.stats(),
+      "uploads": upload_stats(),
+      "llm_scheduler": llm.scheduler.stats(),
+      "section_deadlines": deadline_stats(),
+  }
+
+
+@app.get("/metrics")
+async def metrics():
+  """
+  Request, phase and Gemini timings, prompt/response sizes and open
+  WebSocket sessions in Prometheus text format, for this worker only.
+  """
+  if not METRICS_ENABLED:
+      return Response("# metrics disabled (METRICS_ENABLED=0)\n", status_code=404, media_type="text/plain")
+  return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def ignore_stage(stage: str):
+  pass
+
+
+def overloaded_response(e: LLMOverloaded) -> JSONResponse:
+  return JSONResponse(
+      status_code=503,
+      content={"error": str(e)},
+      headers={"Retry-After": str(e.retry_after)},
+  )
+
+
+async def stream_summary(prompt: str, redactor: PHIRedactor, on_sections) -> str:
+  """
+  Stream a report summary from Gemini, handing each section to
+  `on_sections` as soon as the delimiter after it arrives.
+  """
+  parser = SectionParser()
+  parts = []
+  parse_seconds = 0.0
+  async with aclosing(llm.stream(prompt)) as chunks:
+      async for text in chunks:
+          parts.append(text)
+          started = time.perf_counter()
+          sections = parser.feed(text)
+          parse_seconds += time.perf_counter() - started
+          on_sections(redactor.restore(sections))
+  on_sections(redactor.restore(parser.close()))
+  observe_phase("parse_sections", parse_seconds)
+  return "".join(parts)
+
+
+async def run_report_analysis(
+    upload: Upload,
+    filename: str,
+    request: Request | None = None,
+    on_stage=ignore_stage,
+    on_sections=None,
+) -> dict:
+  """
+  Extract and summarise a medical report PDF. Shared by /analyze-report and
+  the job queue; `on_stage` is told when each phase starts. With
+  `on_sections`, the summary is streamed and its sections are passed on as
+  they are parsed.
+  """
+  key = upload.cache_key(REPORT_PROMPT_VERSION, model.model_name)
+  cached = result_cache.get(key)
+  if cached is not None:
+      log("Result cache hit", filename=filename)
+      if on_sections is not None:
+          on_sections(parse_sections(cached["summary"]))
+      return cached
+
+  on_stage("extracting")
+  with phase("extraction"):
+      extraction = await extract_pdf_text(upload.source)
+  upload.sample_rss(extraction.worker_rss)
+
+  log(
+      "Extracted text",
+      chars=len(extraction.text),
+      pages=extraction.page_count,
+      seconds=round(extraction.seconds, 3),
+  )
+
+  on_stage("redacting")
+  redactor = PHIRedactor()
+  with phase("redaction"):
+      extracted_text = redactor.redact(extraction.text)
+
+  prompt = (
+      f"You are an expert medical assistant. Below is the raw text from a medical report. "
+      f"Provide a comprehensive explanation in simple language.\n\n"
+      f"CRITICAL FORMAT:\n"
+      f"###SECTION### for EACH test result.\n"
+      f"One test per section.\n"
+      f"Format:\n"
+      f"Test Name: Description\n"
+      f"Patient's Result: X\n"
+      f"Reference Range: Y\n"
+      f"Explanation: ...\n\n"
+      f"REPORT TEXT:\n{extracted_text}"
+  )
+
+  on_stage("analyzing")
+  if on_sections is None:
+      summary = await llm.generate(prompt, request=request)
+  else:
+      summary = await stream_summary(prompt, redactor, on_sections)
+  result = {"summary": redactor.restore(summary)}
+  result_cache.set(key, result)
+  return result
+
+
 @app.post("/analyze-report")
-async def analyze_report(file: UploadFile = File(...)):
-  print(f"Receiving file: {file.filename}")
+async def analyze_report(request: Request, file: UploadFile = File(...)):
+  log("Receiving file", filename=file.filename)
 
   try:
-      file_bytes = await file.read()
-      pdf_reader = pypdf.PdfReader(io.BytesIO(file_bytes))
-      extracted_text = ""
-
-      for page in pdf_reader.pages:
-          text = page.extract_text()
-          if text:
-              extracted_text += text + "\n"
-
-      print(f"Extracted {len(extracted_text)} characters.")
-
-      prompt = (
-          f"You are an expert medical assistant. Below is the raw text from a medical report. "
-          f"Provide a comprehensive explanation in simple language.\n\n"
-          f"CRITICAL FORMAT:\n"
-          f"###SECTION### for EACH test result.\n"
-          f"One test per section.\n"
-          f"Format:\n"
-          f"Test Name: Description\n"
-          f"Patient's Result: X\n"
-          f"Reference Range: Y\n"
-          f"Explanation: ...\n\n"
-          f"REPORT TEXT:\n{extracted_text}"
-      )
+      upload = await receive_upload(file)
+  except UploadRejected as e:
+      return JSONResponse(status_code=413, content={"error": str(e)})
 
-      response = model.generate_content(prompt)
-      return {"summary": response.text}
+  try:
+      return await run_report_analysis(upload, file.filename, request=request)
 
+  except LLMOverloaded as e:
+      return overloaded_response(e)
   except Exception as e:
-      print(f"Error: {e}")
+      log("Report analysis failed", error=str(e))
       return {"error": str(e)}
+  finally:
+      upload.close()
+
+
+session_store = create_session_store()
+
+
+async def receive_messages(websocket: WebSocket, incoming: asyncio.Queue):
+  """
+  Read client messages into `incoming` so the session loop notices a closed
+  socket even while it is busy generating.
+  """
+  try:
+      while True:
+          await incoming.put(await websocket.receive_json())
+  except WebSocketDisconnect:
+      return
+
+
+async def stream_message(websocket: WebSocket, prompt: str) -> str:
+  """
+  Forward Gemini chunks to the client as incremental `message` frames.
+  """
+  parts = []
+  async with aclosing(llm.stream(prompt)) as chunks:
+      async for text in chunks:
+          parts.append(text)
+          await websocket.send_json({"type": "message", "text": text})
+  return "".join(parts)
+
+
+INTRO_PROMPT = (
+    "You are a compassionate AI named LucidCare Assistant. "
+    "Gently introduce yourself in 2–3 sentences and explain "
+    "that you will help the patient understand their report."
+)
+
+CONCLUSION_PROMPT = (
+    "You have finished explaining all sections. Provide a warm, caring, "
+    "2–3 sentence closing message encouraging the patient."
+)
+
+# Intro and closing prompts never change, so serve them from a warm pool
+# (with COMFORT audio pre-rendered) instead of a Gemini call per session.
+message_pool = MessagePool(
+    {"intro": INTRO_PROMPT, "conclusion": CONCLUSION_PROMPT},
+    # Pool entries should differ, so identical prompts are not coalesced
+    generate=lambda prompt: llm.generate(prompt, coalesce=False, priority="background"),
+    synthesize=(lambda text: synthesize_speech(text, "COMFORT")) if FISH_AUDIO_KEY else None,
+)
+
+
+async def send_pooled_or_stream(websocket: WebSocket, receiver, kind: str, prompt: str):
+  pooled = message_pool.pick(kind)
+  if pooled:
+      await websocket.send_json({"type": "message", "text": pooled})
+  else:
+      await cancel_when(receiver, stream_message(websocket, prompt))
+
+
+EMOTION_CONTEXT = {
+    "sad": "I can see you might be feeling a bit sad.",
+    "fearful": "I sense this might be making you anxious.",
+    "angry": "I understand you might be feeling frustrated.",
+    "surprised": "I see this caught you off guard.",
+    "happy": "I'm glad to see you're feeling positive!",
+    "neutral": "",
+    "disgusted": "I know this information can feel uncomfortable.",
+}
 
 
-session_state = {}
+# Explanations of common tests are reused across patients as templates
+explanation_cache = ExplanationCache(f"{SECTION_PROMPT_VERSION}:{model.model_name}")
 
 
-def strip_patient_identifiers(text: str) -> str:
-  import re
+def build_section_prompt(section: dict, emotion: str) -> str:
+  with phase("strip_patient_identifiers"):
+      clean_content = strip_patient_identifiers(section["content"][:3000])
+  emotion_prefix = EMOTION_CONTEXT.get(emotion.lower(), "")
 
-  text = re.sub(
-      r"\b(Mr\.|Mrs\.|Ms\.|Dr\.)\s+[A-Z][a-z]+(?:\s+[A-Z]\.)?(?:\s+[A-Z][a-z]+)+",
-      "the patient",
-      text,
-      flags=re.IGNORECASE,
+  return (
+      f"You are a caring nurse explaining ONE specific test result.\n"
+      f"Patient emotion: {emotion}. {emotion_prefix}\n\n"
+      f"=== TEST ===\n{section['title']}\n"
+      f"=== DATA ===\n{clean_content}\n\n"
+      f"=== RULES ===\n"
+      f"- NEVER use patient names\n"
+      f"- Use only 'you', 'your', 'I', 'we'\n"
+      f"- Exactly 3–5 sentences\n"
+      f"- Include specific result values\n"
+      f"- Compare to reference range\n"
+      f"- Stay warm, supportive, and human\n"
   )
-  text = re.sub(r"\b[A-Z][a-z]+\s+[A-Z]\.\s+[A-Z][a-z]+", "the patient", text)
-  text = re.sub(r"\b[A-Z][a-z]+'s\b", "your", text)
-  return text
 
 
-def parse_sections(summary_text: str):
-  print(f"=== PARSING SUMMARY (length: {len(summary_text)}) ===")
+def learn_explanation(section: dict, emotion: str, text: str):
+  # The explanation has been generated (and maybe sent) already; a template
+  # that cannot be stored must not cost the patient their section
+  try:
+      explanation_cache.learn(section, emotion, text)
+  except Exception as e:
+      log("Explanation template not stored", section=section.get("title"), error=str(e))
 
-  if "###SECTION###" in summary_text:
-      raw_sections = summary_text.split("###SECTION###")
-      sections = []
 
-      for idx, raw in enumerate(raw_sections):
-          content = raw.strip()
-          if not content:
-              continue
+async def prefetched_reply(prefetched: asyncio.Task) -> Reply:
+  text = await prefetched
+  if not text:
+      raise ValueError("Prefetched explanation is empty")
+  return Reply(text)
+
 
-          lines = content.split("\n")
-          title = "Medical Finding"
+async def send_fallback(websocket: WebSocket, section: dict, emotion: str, reason: str, prefix: str = ""):
+  record_fallback(reason)
+  emotion_prefix = EMOTION_CONTEXT.get(emotion.lower(), "")
+  text = " ".join(filter(None, [emotion_prefix, fallback_explanation(section)]))
+  await websocket.send_json({"type": "message", "text": prefix + text})
 
-          if lines:
-              first_line = lines[0].strip()
-              if ":" in first_line:
-                  title = first_line.split(":")[0]
-              elif len(first_line) < 100:
-                  title = first_line
 
-          sections.append({"title": title, "content": content})
+async def explain_section(websocket: WebSocket, section: dict, emotion: str, prefetched) -> str:
+  """
+  Send one section's explanation and return where it came from.
 
-      print(f"Parsed {len(sections)} sections")
-      return sections
+  Gemini gets SECTION_DEADLINE_SECONDS to start answering (a prefetch still
+  in flight counts as the first attempt). A duplicate request is sent once
+  the first is slower than usual, and the first to produce output wins. If
+  neither does in time, or both fail, the patient gets an explanation
+  rendered from the section's result and reference range instead.
+  """
+  if prefetched is None:
+      prepared = explanation_cache.render(section, emotion)
+      if prepared:
+          await websocket.send_json({"type": "message", "text": prepared})
+          return "template"
 
-  lines = summary_text.split("\n")
-  sections = []
-  current = {"title": "Introduction", "content": ""}
+  prompt = build_section_prompt(section, emotion)
 
-  for line in lines:
-      line = line.strip()
-      if not line:
-          continue
+  def start_stream():
+      # The budget also bounds stalls between chunks
+      return open_stream(llm.stream(prompt, timeout=SECTION_DEADLINE_SECONDS))
 
-      is_header = (
-          (len(line) < 100)
-          and (
-              line.endswith(":")
-              or line.isupper()
-              or any(
-                  key in line.lower()
-                  for key in ["panel", "test", "function", "results", "summary"]
-              )
-          )
-          and not line.startswith("•")
-          and not line.startswith("-")
+  hedge_after = section_latency.hedge_after() if SECTION_HEDGE_ENABLED else float("inf")
+  first = prefetched_reply(prefetched) if prefetched is not None else start_stream()
+  try:
+      reply, hedge_won = await hedged(
+          first, start_stream, hedge_after, SECTION_DEADLINE_SECONDS, discard=Reply.aclose
       )
+  except DeadlineExceeded:
+      log("Section past its deadline", section=section["title"], deadline=SECTION_DEADLINE_SECONDS)
+      await send_fallback(websocket, section, emotion, "deadline")
+      return "fallback"
+  except Exception as e:
+      log("Section explanation failed", section=section["title"], error=str(e))
+      await send_fallback(websocket, section, emotion, "error")
+      return "fallback"
 
-      if is_header and current["content"]:
-          sections.append(current)
-          current = {"title": line.rstrip(":"), "content": ""}
-      else:
-          current["content"] += line + "\n"
-
-  if current["content"]:
-      sections.append(current)
+  parts = [reply.first]
+  await websocket.send_json({"type": "message", "text": reply.first})
+  try:
+      async with aclosing(reply.rest()) as chunks:
+          async for text in chunks:
+              parts.append(text)
+              await websocket.send_json({"type": "message", "text": text})
+  except Exception as e:
+      # Part of it is on screen already, so finish with the local version
+      log("Section stream broke off", section=section["title"], error=str(e))
+      await send_fallback(websocket, section, emotion, "error", prefix="\n\n")
+      return "fallback"
 
-  print(f"Fallback parser created {len(sections)} sections")
-  return sections
+  if reply.stream is None:
+      # Prefetched, and learned from when it was generated
+      return "prefetched"
+  learn_explanation(section, emotion, "".join(parts))
+  return "hedged" if hedge_won else "streamed"
 
 
 @app.websocket("/comfort-stream")
 async def comfort_stream(websocket: WebSocket):
   await websocket.accept()
-  connection_id = id(websocket)
+  # A patient is waiting on every turn, prefetches included
+  use_priority("interactive")
 
   if not GOOGLE_API_KEY:
       await websocket.send_json({"error": "Missing GEMINI_API_KEY"})
       await websocket.close()
       return
 
-  session_state[connection_id] = {
-      "current_section": 0,
-      "sections": [],
-      "introduced": False,
-  }
-
-  print(f"WebSocket {connection_id} connected")
+  # A client-supplied ?session_id= lets a reconnect (possibly to another
+  # worker) resume where it left off; anonymous sessions die with the socket.
+  client_session_id = websocket.query_params.get("session_id")
+  session_id = client_session_id or uuid.uuid4().hex
+
+  session = session_store.get(session_id)
+  if session is None:
+      session = {
+          "current_section": 0,
+          "sections": [],
+          "introduced": False,
+      }
+      log("WebSocket connected", session_id=session_id)
+  else:
+      log("WebSocket resumed", session_id=session_id, section=session["current_section"])
+
+  incoming = asyncio.Queue()
+  receiver = asyncio.create_task(receive_messages(websocket, incoming))
+
+  async def generate_section(index: int, emotion: str) -> str:
+      section = session["sections"][index]
+      cached = explanation_cache.render(section, emotion)
+      if cached is not None:
+          return cached
+      text = await llm.generate(build_section_prompt(section, emotion))
+      learn_explanation(section, emotion, text)
+      return text
+
+  prefetcher = SectionPrefetcher(generate_section)
+  # Set when the report comes from a job whose summary may still be streaming
+  live = None
+
+  async def sync_sections(index: int, emotion: str):
+      """
+      Wait until section `index` of a live report is parsed (or the report
+      is finished) and pick up any sections that arrived meanwhile.
+      """
+      await cancel_when(receiver, live.wait_for(index))
+      if len(live.sections) != len(session["sections"]):
+          session["sections"] = list(live.sections)
+          session_store.save(session_id, session)
+          prefetcher.schedule(index, len(session["sections"]), emotion)
 
   try:
       while True:
-          data = await websocket.receive_json()
+          data = await cancel_when(receiver, incoming.get())
           emotion = data.get("emotion", "neutral")
           summary = data.get("summary", "")
+          job_id = data.get("job_id")
           action = data.get("action", "next")
 
-          session = session_state[connection_id]
-
-          if action == "init" and summary and not session["sections"]:
-              session["sections"] = parse_sections(summary)
-              session["current_section"] = 0
-              session["introduced"] = False
+          if action == "init":
+              if (summary or job_id) and not session["sections"] and not session.get("job_id"):
+                  # A finished summary, or the id of a report job so
+                  # explaining can start while it is still being summarised
+                  if summary:
+                      session["sections"] = parse_sections(summary)
+                  else:
+                      session["job_id"] = job_id
+                  session["current_section"] = 0
+                  session["introduced"] = False
+                  session_store.save(session_id, session)
+              if session.get("job_id") and live is None:
+                  live = report_sections_for(session["job_id"])
+              prefetcher.schedule(
+                  session["current_section"], len(session["sections"]), emotion
+              )
 
-          if not session["sections"]:
+          if not session["sections"] and live is None:
               await websocket.send_json({"error": "No report loaded"})
               continue
-          
-          if not session["introduced"]:
-              intro_prompt = (
-                  "You are a compassionate AI named LucidCare Assistant. "
-                  "Gently introduce yourself in 2–3 sentences and explain "
-                  "that you will help the patient understand their report."
-              )
 
+          if not session["introduced"]:
               try:
-                  response = model.generate_content(intro_prompt)
-                  await websocket.send_json(
-                      {"type": "message", "text": response.text}
+                  await send_pooled_or_stream(
+                      websocket, receiver, "intro", INTRO_PROMPT
                   )
 
                   session["introduced"] = True
+                  session_store.save(session_id, session)
                   await websocket.send_json(
                       {"type": "end", "section": "introduction"}
                   )
+              except ClientDisconnected:
+                  raise
               except Exception as e:
                   await websocket.send_json(
                       {"error": f"Introduction error: {str(e)}"}
                   )
               continue
 
+          if live is not None:
+              await sync_sections(session["current_section"], emotion)
+              if live.error and session["current_section"] >= len(session["sections"]):
+                  await websocket.send_json(
+                      {"error": f"Report analysis failed: {live.error}"}
+                  )
+                  continue
+
           # COMPLETION
           if session["current_section"] >= len(session["sections"]):
-              conclusion_prompt = (
-                  "You have finished explaining all sections. Provide a warm, caring, "
-                  "2–3 sentence closing message encouraging the patient."
-              )
-
               try:
-                  response = model.generate_content(conclusion_prompt)
-                  await websocket.send_json(
-                      {"type": "message", "text": response.text}
+                  await send_pooled_or_stream(
+                      websocket, receiver, "conclusion", CONCLUSION_PROMPT
                   )
                   await websocket.send_json({"type": "complete"})
+                  # Nothing left to resume, so do not keep the report around
+                  session_store.delete(session_id)
+              except ClientDisconnected:
+                  raise
               except Exception as e:
                   await websocket.send_json(
                       {"error": f"Conclusion error: {str(e)}"}
@@ -259,46 +662,24 @@ async def comfort_stream(websocket: WebSocket):
               continue
 
           # SECTION PROCESSING
-          section = session["sections"][session["current_section"]]
-          clean_content = strip_patient_identifiers(
-              section["content"][:3000]
-          )
-
-          emotion_context = {
-              "sad": "I can see you might be feeling a bit sad.",
-              "fearful": "I sense this might be making you anxious.",
-              "angry": "I understand you might be feeling frustrated.",
-              "surprised": "I see this caught you off guard.",
-              "happy": "I'm glad to see you're feeling positive!",
-              "neutral": "",
-              "disgusted": "I know this information can feel uncomfortable.",
-          }
-
-          emotion_prefix = emotion_context.get(emotion.lower(), "")
-          section_prompt = (
-              f"You are a caring nurse explaining ONE specific test result.\n"
-              f"Patient emotion: {emotion}. {emotion_prefix}\n\n"
-              f"=== TEST ===\n{section['title']}\n"
-              f"=== DATA ===\n{clean_content}\n\n"
-              f"=== RULES ===\n"
-              f"- NEVER use patient names\n"
-              f"- Use only 'you', 'your', 'I', 'we'\n"
-              f"- Exactly 3–5 sentences\n"
-              f"- Include specific result values\n"
-              f"- Compare to reference range\n"
-              f"- Stay warm, supportive, and human\n"
-          )
+          section_index = session["current_section"]
+          section = session["sections"][section_index]
+          started = time.perf_counter()
 
           try:
-              response = model.generate_content(section_prompt, stream=False)
-              full_response = response.text
-
-              await websocket.send_json({
-                  "type": "message",
-                  "text": full_response
-              })
+              source = await cancel_when(
+                  receiver,
+                  explain_section(
+                      websocket, section, emotion, prefetcher.take(section_index, emotion)
+                  ),
+              )
+              observe_phase(f"comfort_section_{source}", time.perf_counter() - started)
 
               session["current_section"] += 1
+              session_store.save(session_id, session)
+              prefetcher.schedule(
+                  session["current_section"], len(session["sections"]), emotion
+              )
 
               await websocket.send_json({
                   "type": "end",
@@ -306,20 +687,27 @@ async def comfort_stream(websocket: WebSocket):
                   "progress": f"{session['current_section']}/{len(session['sections'])}"
               })
 
+          except ClientDisconnected:
+              raise
           except Exception as e:
               await websocket.send_json({
                   "error": f"Section error: {str(e)}"
               })
               session["current_section"] += 1
+              session_store.save(session_id, session)
+
+  except ClientDisconnected:
+      log("WebSocket disconnected", session_id=session_id)
 
   except Exception as e:
       import traceback
-      print(f"WebSocket Error: {e}")
-      print(traceback.format_exc())
+      log("WebSocket error", session_id=session_id, error=str(e), traceback=traceback.format_exc())
 
   finally:
-      if connection_id in session_state:
-          del session_state[connection_id]
+      receiver.cancel()
+      prefetcher.cancel_all()
+      if not client_session_id:
+          session_store.delete(session_id)
 
 
 # ---------------------------------------------------
@@ -328,6 +716,8 @@ async def comfort_stream(websocket: WebSocket):
 class TTSRequest(BaseModel):
   text: str
   mode: str = "COMFORT"
+  # Synthesize sentence by sentence and stream each clip as soon as it is ready
+  pipelined: bool = False
 
 
 VOICE_PRESETS = {
@@ -337,17 +727,51 @@ VOICE_PRESETS = {
 }
 
 
-@app.post("/tts")
-async def tts_endpoint(body: TTSRequest):
+FISH_AUDIO_TTS_URL = f"{FISH_AUDIO_API_BASE}/v1/tts"
+# Cheap authenticated GET used by the readiness probe
+FISH_AUDIO_HEALTH_URL = f"{FISH_AUDIO_API_BASE}/wallet/self/api-credit"
+TTS_MODEL = "speech-1.5"
+TTS_MAX_CONNECTIONS = int(os.environ.get("TTS_MAX_CONNECTIONS", "20"))
+# How long a duplicate request waits on an in-flight clip before going upstream itself
+TTS_FLIGHT_WAIT_SECONDS = float(os.environ.get("TTS_FLIGHT_WAIT_SECONDS", "60"))
+# Content hash of a rendered clip, for replaying it with GET /tts/{key}
+TTS_KEY_HEADER = "X-TTS-Key"
+_TTS_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+_tts_client: httpx.AsyncClient | None = None
+tts_cache = TTSCache()
+# Concurrent requests for the same clip share one FishAudio call
+tts_flights = SingleFlight()
+
+
+def get_tts_client() -> httpx.AsyncClient:
   """
-  Convert text to speech using FishAudio's speech-1.5 model.
-  This endpoint returns an MP3 audio stream.
+  App-lifetime FishAudio client so requests reuse warm HTTP/2 connections
+  instead of paying a TCP+TLS handshake each time.
   """
+  global _tts_client
+  if _tts_client is None:
+      _tts_client = httpx.AsyncClient(
+          http2=True,
+          timeout=httpx.Timeout(30.0, connect=5.0),
+          limits=httpx.Limits(
+              max_connections=TTS_MAX_CONNECTIONS,
+              max_keepalive_connections=TTS_MAX_CONNECTIONS,
+              keepalive_expiry=60.0,
+          ),
+      )
+  return _tts_client
 
-  if not FISH_AUDIO_KEY:
-      return {"error": "Missing FISH_AUDIO_API_KEY in environment"}
 
-  preset = VOICE_PRESETS.get(body.mode, VOICE_PRESETS["COMFORT"])
+async def close_tts_client():
+  global _tts_client
+  if _tts_client is not None:
+      await _tts_client.aclose()
+      _tts_client = None
+
+
+def build_tts_request(text: str, mode: str):
+  preset = VOICE_PRESETS.get(mode, VOICE_PRESETS["COMFORT"])
   speed = preset["speed"]
   voice_id = preset["voice_id"]
 
@@ -359,8 +783,8 @@ async def tts_endpoint(body: TTSRequest):
   # NOTE: If FishAudio uses a different field name than "voice_id"
   # (e.g. "voice" or "speaker"), change it here according to their docs.
   payload = {
-      "text": body.text,
-      "model": "speech-1.5",
+      "text": text,
+      "model": TTS_MODEL,
       "format": "mp3",
       "reference_id": voice_id,
       "prosody": {
@@ -368,82 +792,335 @@ async def tts_endpoint(body: TTSRequest):
           "volume": 0
       }
   }
+  return headers, payload
 
-  try:
-      async with httpx.AsyncClient(timeout=30.0) as client:
-          response = await client.post(
-              "https://api.fish.audio/v1/tts",
-              headers=headers,
-              json=payload
+
+async def synthesize_speech(text: str, mode: str = "COMFORT") -> bytes:
+  """
+  Render `text` to MP3 bytes in one call (used to pre-render pooled audio).
+  """
+  headers, payload = build_tts_request(text, mode)
+  with phase("tts_upstream"):
+      response = await get_tts_client().post(
+          FISH_AUDIO_TTS_URL,
+          headers=headers,
+          json=payload
+      )
+  response.raise_for_status()
+  return response.content
+
+
+class ClosingStreamingResponse(StreamingResponse):
+  """
+  A StreamingResponse that always awaits `cleanup()` once it is done with,
+  even when the client left before the body iterator was ever started (and
+  so never reached its own `finally`).
+  """
+
+  def __init__(self, content, cleanup, **kwargs):
+    super().__init__(content, **kwargs)
+    self.cleanup = cleanup
+
+  async def __call__(self, scope, receive, send):
+    try:
+      await super().__call__(scope, receive, send)
+    finally:
+      await self.cleanup()
+
+
+def audio_bytes_response(audio: bytes, request: Request, headers: dict) -> Response:
+  """
+  Serve cached MP3 bytes, honouring a single `Range: bytes=a-b` request.
+  """
+  headers = {**headers, "Accept-Ranges": "bytes"}
+  match = re.fullmatch(r"bytes=(\d*)-(\d*)", request.headers.get("range", ""))
+
+  if match and (match.group(1) or match.group(2)):
+      size = len(audio)
+      if match.group(1):
+          first = int(match.group(1))
+          last = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+      else:
+          first = max(size - int(match.group(2)), 0)
+          last = size - 1
+      if first > last or first >= size:
+          return Response(
+              status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}
           )
+      return Response(
+          audio[first:last + 1],
+          status_code=206,
+          media_type="audio/mpeg",
+          headers={**headers, "Content-Range": f"bytes {first}-{last}/{size}"},
+      )
+
+  return Response(audio, media_type="audio/mpeg", headers=headers)
+
+
+def tts_cache_headers(key: str) -> dict:
+  # private: the clip speaks a patient's results, so shared proxies and
+  # CDNs must not store it
+  return {"ETag": f'"{key}"', "Cache-Control": "private, max-age=86400", TTS_KEY_HEADER: key}
+
+
+def cached_tts_response(key: str, request: Request, headers: dict) -> Response | None:
+  cached_audio = tts_cache.get_memory(key)
+  if cached_audio is not None:
+      return audio_bytes_response(cached_audio, request, headers)
+  cached_path = tts_cache.get_path(key)
+  if cached_path is not None:
+      return FileResponse(cached_path, media_type="audio/mpeg", headers=headers)
+  return None
+
+
+@app.get("/tts/{key}")
+async def tts_get(key: str, request: Request):
+  """
+  Replay a clip rendered by POST /tts, addressed by the X-TTS-Key header it
+  returned, for <audio src=...> so browsers can cache the clip and seek
+  with Range requests. The key is a content hash, so no patient text ends
+  up in URLs, access logs or browser history.
+  """
+  if not _TTS_KEY_PATTERN.fullmatch(key):
+      return JSONResponse(status_code=404, content={"error": "Unknown clip"})
+
+  headers = tts_cache_headers(key)
+  if request.headers.get("if-none-match") == headers["ETag"]:
+      return Response(status_code=304, headers=headers)
+
+  response = cached_tts_response(key, request, headers)
+  if response is None and await tts_flights.wait(key, timeout=TTS_FLIGHT_WAIT_SECONDS):
+      response = cached_tts_response(key, request, headers)
+  if response is None:
+      return JSONResponse(
+          status_code=404, content={"error": "Unknown or expired clip, render it with POST /tts"}
+      )
+  return response
+
+
+@app.post("/tts")
+async def tts_endpoint(body: TTSRequest, request: Request):
+  """
+  Convert text to speech using FishAudio's speech-1.5 model.
+  This endpoint returns an MP3 audio stream; its X-TTS-Key header names
+  the clip for GET /tts/{key}.
+  """
+  if body.pipelined:
+      return await pipelined_tts_response(body.text, body.mode)
+  return await tts_response(body.text, body.mode, request)
+
+
+async def render_tts_segment(text: str, mode: str) -> bytes:
+  preset = VOICE_PRESETS.get(mode, VOICE_PRESETS["COMFORT"])
+  key = tts_cache_key(text, preset, TTS_MODEL)
+  audio = tts_cache.get(key)
+  if audio is None:
+      audio = await tts_flights.do(
+          f"segment:{key}", lambda: synthesize_and_cache(key, text, mode)
+      )
+  return audio
+
+
+async def synthesize_and_cache(key: str, text: str, mode: str) -> bytes:
+  audio = await synthesize_speech(text, mode)
+  if audio:
+      tts_cache.put(key, audio)
+  return audio
+
+
+async def pipelined_tts_response(text: str, mode: str):
+  """
+  Stream a long text as back-to-back MP3 clips, one per sentence group.
+
+  MP3 frames concatenate cleanly, so the browser plays the first sentence
+  while later ones are still being synthesized.
+  """
+  if not FISH_AUDIO_KEY:
+      return {"error": "Missing FISH_AUDIO_API_KEY in environment"}
+
+  segments = split_sentences(text)
+  if not segments:
+      return {"error": "Empty text"}
+
+  clips = render_in_order(segments, lambda segment: render_tts_segment(segment, mode))
+
+  try:
+      first_clip = await anext(clips)
+  except Exception as e:
+      await clips.aclose()
+      log("TTS failed", error=str(e))
+      return {"error": f"TTS failed: {str(e)}"}
+
+  if not first_clip:
+      await clips.aclose()
+      return {"error": "Empty audio response"}
+
+  async def relay():
+      sent = 1
+      try:
+          yield first_clip
+          async for clip in clips:
+              sent += 1
+              yield clip
+          log("TTS pipeline finished", segments=sent)
+      except Exception as e:
+          # Headers are already out; end the stream after the clips we have
+          log("TTS pipeline stopped", sent=sent, segments=len(segments), error=str(e))
+      finally:
+          await clips.aclose()
+
+  # Stops rendering the remaining clips even if relay() never started
+  return ClosingStreamingResponse(relay(), clips.aclose, media_type="audio/mpeg")
+
+
+async def tts_response(text: str, mode: str, request: Request):
+  """
+  Serve one clip from the pool or cache, or stream it from FishAudio while
+  teeing it into the cache.
+
+  While a clip is streaming, identical requests wait for it to finish and
+  are then served from the cache instead of making their own upstream call.
+  """
+  if not FISH_AUDIO_KEY:
+      return {"error": "Missing FISH_AUDIO_API_KEY in environment"}
+
+  preset = VOICE_PRESETS.get(mode, VOICE_PRESETS["COMFORT"])
+  key = tts_cache_key(text, preset, TTS_MODEL)
+  cache_headers = tts_cache_headers(key)
+
+  if request.headers.get("if-none-match") == cache_headers["ETag"]:
+      return Response(status_code=304, headers=cache_headers)
+
+  if mode == "COMFORT":
+      pooled_audio = message_pool.audio_for(text)
+      if pooled_audio:
+          # So GET /tts/{key} can replay it
+          tts_cache.put_memory(key, pooled_audio)
+          return audio_bytes_response(pooled_audio, request, cache_headers)
+
+  cached = cached_tts_response(key, request, cache_headers)
+  if cached is not None:
+      return cached
+
+  if await tts_flights.wait(key, timeout=TTS_FLIGHT_WAIT_SECONDS):
+      cached = cached_tts_response(key, request, cache_headers)
+      if cached is not None:
+          return cached
+
+  tts_cache.record_miss()
+  headers, payload = build_tts_request(text, mode)
+  client = get_tts_client()
+  response = None
+  # Resolved with True once the clip is committed to the cache
+  flight = tts_flights.track(key)
+
+  def land(cached: bool):
+      if not flight.done():
+          flight.set_result(cached)
+
+  started = time.perf_counter()
+  try:
+      response = await client.send(
+          client.build_request(
+              "POST", FISH_AUDIO_TTS_URL, headers=headers, json=payload
+          ),
+          stream=True,
+      )
 
       if response.status_code != 200:
-          print(f"TTS Error: {response.status_code} - {response.text}")
+          detail = (await response.aread()).decode(errors="replace")
+          await response.aclose()
+          log("TTS upstream error", status=response.status_code, detail=detail)
+          land(False)
           return {
               "error": "FishAudio TTS failed",
               "status": response.status_code,
-              "detail": response.text
+              "detail": detail
           }
 
-      audio_bytes = response.content
-      
-      if len(audio_bytes) == 0:
-          print("TTS returned empty audio")
+      # Wait for the first bytes so an empty upstream body is still reported
+      # as an error; everything after that is relayed as it arrives.
+      chunks = response.aiter_bytes()
+      first_chunk = await anext(chunks, b"")
+      observe_phase("tts_first_byte", time.perf_counter() - started)
+
+      if not first_chunk:
+          await response.aclose()
+          log("TTS returned empty audio")
+          land(False)
           return {"error": "Empty audio response"}
 
-      print(f"TTS Success: {len(audio_bytes)} bytes")
-      
-      return StreamingResponse(
-          io.BytesIO(audio_bytes),
+      writer = tts_cache.writer(key)
+      completed = False
+      finished = False
+
+      async def finish():
+          # Runs once, from relay() or, if that never started, the response
+          nonlocal finished
+          if finished:
+              return
+          finished = True
+          await response.aclose()
+          if completed:
+              writer.commit()
+          else:
+              writer.discard()
+          land(completed)
+
+      async def relay():
+          nonlocal completed
+          try:
+              writer.write(first_chunk)
+              yield first_chunk
+              async for chunk in chunks:
+                  writer.write(chunk)
+                  yield chunk
+              completed = True
+              observe_phase("tts_upstream", time.perf_counter() - started)
+              log("TTS finished", bytes=writer.size)
+          finally:
+              await finish()
+
+      relay_headers = dict(cache_headers)
+      # aiter_bytes() yields decoded audio, so the upstream length only
+      # holds when the body was not compressed
+      if "content-length" in response.headers and response.headers.get(
+          "content-encoding", "identity"
+      ) == "identity":
+          relay_headers["Content-Length"] = response.headers["content-length"]
+
+      return ClosingStreamingResponse(
+          relay(),
+          finish,
           media_type="audio/mpeg",
-          headers={
-              "Content-Length": str(len(audio_bytes)),
-              "Accept-Ranges": "bytes"
-          }
+          headers=relay_headers
       )
+  except asyncio.CancelledError:
+      land(False)
+      raise
   except Exception as e:
-      print(f"TTS Exception: {str(e)}")
+      if response is not None:
+          await response.aclose()
+      land(False)
+      log("TTS failed", error=str(e))
       return {"error": f"TTS failed: {str(e)}"}
 
 
 # ---------------------------------------------------
 # BILL ANALYZER (Gemini)
 # ---------------------------------------------------
-@app.post("/analyze-bill")
-async def analyze_bill(file: UploadFile = File(...)):
-  """
-  Upload a US medical bill (PDF).
-  We extract text and ask Gemini to:
-  - identify CPT / ICD-10 / HCPCS / Revenue codes
-  - detect duplicate charges
-  - check for upcoding or unbundling
-  - find clerical mistakes or coverage errors
-  - extract contact details
-  - generate structured JSON
-  """
-
-  if not GOOGLE_API_KEY:
-      return {"error": "GEMINI_API_KEY missing"}
-
-  if not file.filename.lower().endswith(".pdf"):
-      return {"error": "Only PDF files allowed"}
-
-  try:
-      pdf_bytes = await file.read()
-      reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
-      text = ""
-
-      for p in reader.pages:
-          part = p.extract_text()
-          if part:
-              text += part + "\n"
-
-      text = text[:15000]
+def build_bill_prompt(text: str, part: int | None = None, parts: int | None = None) -> str:
+  part_note = ""
+  if part is not None:
+      part_note = (
+          f"This is part {part} of {parts} of a longer bill. Only report issues "
+          f"found in this part and use null for details that do not appear in it.\n"
+      )
 
-      prompt = f"""
+  return f"""
 You are a US medical billing expert.
 Analyze the bill text below.
-
+{part_note}
 Your job:
 - Identify CPT, ICD-10, HCPCS, revenue codes.
 - Extract contact information for both patient and provider
@@ -494,23 +1171,334 @@ Bill text:
 {text}
 """
 
-      response = model.generate_content(prompt)
-      raw = response.text
 
-      # Try to parse JSON safely
-      try:
-          parsed = json.loads(raw)
-          return {"structured": True, "analysis": parsed}
-      except Exception:
-          match = re.search(r"{[\s\S]*}", raw)
-          if match:
-              parsed = json.loads(match.group(0))
-              return {"structured": True, "analysis": parsed}
+async def analyze_bill_chunks(chunks: list[str], request: Request) -> dict:
+  """
+  Map-reduce analysis: every chunk is analysed concurrently (at most
+  BILL_CHUNK_CONCURRENCY at once) and the parsed results are merged.
+
+  A chunk whose reply fails validation is asked again up to
+  BILL_CHUNK_RETRIES times. If some still fail, the merge is returned
+  with `partial: True` and the 1-based `missing_chunks`. If any chunk
+  raises, the chunks still running are cancelled.
+  """
+  semaphore = asyncio.Semaphore(BILL_CHUNK_CONCURRENCY)
+
+  async def analyze_chunk(index: int, chunk: str):
+      async with semaphore:
+          for attempt in range(BILL_CHUNK_RETRIES + 1):
+              analysis, raw = await generate_structured(
+                  llm,
+                  build_bill_prompt(chunk, index + 1, len(chunks)),
+                  BillAnalysis,
+                  request=request,
+              )
+              if analysis is not None:
+                  break
+              log("Bill chunk failed validation", chunk=index + 1, attempt=attempt + 1)
+          return analysis, raw
+
+  tasks = [
+      asyncio.ensure_future(analyze_chunk(index, chunk))
+      for index, chunk in enumerate(chunks)
+  ]
+  try:
+      replies = await asyncio.gather(*tasks)
+  finally:
+      for task in tasks:
+          task.cancel()
+
+  parsed = [analysis.model_dump() for analysis, _ in replies if analysis is not None]
+  missing = [index + 1 for index, (analysis, _) in enumerate(replies) if analysis is None]
+
+  log("Bill analysed in chunks", chunks=len(chunks), parsed=len(parsed), missing=missing)
+
+  if not parsed:
+      return {"structured": False, "raw": replies[0][1]}
+  result = {"structured": True, "analysis": merge_bill_analyses(parsed)}
+  if missing:
+      result["partial"] = True
+      result["missing_chunks"] = missing
+  return result
+
+
+def validate_bill_request(filename: str, mode: str) -> str | None:
+  if not GOOGLE_API_KEY and mode != "local":
+      return "GEMINI_API_KEY missing"
+  if not filename.lower().endswith(".pdf"):
+      return "Only PDF files allowed"
+  if mode not in ("auto", "single", "chunked", "local"):
+      return f"Unknown mode: {mode}"
+  return None
+
+
+async def run_bill_analysis(
+    upload: Upload,
+    filename: str,
+    mode: str = "auto",
+    request: Request | None = None,
+    on_stage=ignore_stage,
+) -> dict:
+  """
+  Analyse a bill PDF. Shared by /analyze-bill and the job queue.
+  """
+  key = upload.cache_key(BILL_PROMPT_VERSION, model.model_name, mode)
+  cached = result_cache.get(key)
+  if cached is not None:
+      log("Result cache hit", filename=filename)
+      return cached
+
+  on_stage("extracting")
+  with phase("extraction"):
+      extraction = await extract_pdf_text(
+          upload.source, max_chars=BILL_MAX_CHARS if mode == "single" else None
+      )
+  upload.sample_rss(extraction.worker_rss)
+
+  log(
+      "Extracted text",
+      chars=len(extraction.text),
+      pages=extraction.pages_read,
+      page_count=extraction.page_count,
+      seconds=round(extraction.seconds, 3),
+  )
+
+  # The pre-pass never leaves the process, so it reads the original text
+  prepass = None
+  if mode != "single":
+      with phase("bill_prepass"):
+          prepass = analyze_bill_lines("\n".join(extraction.pages))
+
+  if mode == "local":
+      on_stage("analyzing")
+      result = {"structured": True, "analysis": local_bill_analysis(prepass)}
+      result_cache.set(key, result)
+      return result
+
+  # Gemini only ever sees tokens such as [NAME_1]; the extracted contact
+  # details are put back into its answer before it is returned
+  on_stage("redacting")
+  redactor = PHIRedactor()
+  with phase("redaction"):
+      pages = [redactor.redact(page) for page in extraction.pages]
+      text = "\n".join(pages)
+      digest = redactor.redact(build_digest(prepass)) if mode == "auto" else ""
+
+  on_stage("analyzing")
+  compact = ""
+  if mode == "auto":
+      # The digest usually shrinks noisy statements; never send more than the raw text
+      compact = min(digest, text, key=len)
+  if mode == "chunked" or (mode == "auto" and len(compact) > BILL_MAX_CHARS):
+      result = redactor.restore(await analyze_bill_chunks(chunk_pages(pages), request))
+      if result["structured"]:
+          add_local_findings(result["analysis"], prepass)
+          # A partial merge is worth returning but not keeping for a day
+          if not result.get("partial"):
+              result_cache.set(key, result)
+      return result
+
+  if mode == "auto":
+      log("Local pre-pass digest", chars=len(text), digest_chars=len(compact))
+      prompt = build_bill_prompt(compact)
+  else:
+      prompt = build_bill_prompt(text[:BILL_MAX_CHARS])
+
+  analysis, raw = await generate_structured(llm, prompt, BillAnalysis, request=request)
+
+  if analysis is None:
+      return {"structured": False, "raw": redactor.restore(raw)}
+
+  parsed = redactor.restore(analysis.model_dump())
+  if prepass is not None:
+      add_local_findings(parsed, prepass)
+  result = {"structured": True, "analysis": parsed}
+  result_cache.set(key, result)
+  return result
+
+
+@app.post("/analyze-bill")
+async def analyze_bill(request: Request, file: UploadFile = File(...), mode: str = "auto"):
+  """
+  Upload a US medical bill (PDF).
+  We extract text and ask Gemini to:
+  - identify CPT / ICD-10 / HCPCS / Revenue codes
+  - detect duplicate charges
+  - check for upcoding or unbundling
+  - find clerical mistakes or coverage errors
+  - extract contact details
+  - generate structured JSON
+
+  `mode` picks how the bill is analysed:
+  - "local": deterministic code extraction and duplicate detection only, no LLM
+  - "single": the first 15000 characters of raw text in one prompt
+  - "chunked": every page, in concurrent chunks whose results are merged
+  - "auto": the local pre-pass digest (or the raw text, if shorter) in one
+    prompt, or chunked pages when that does not fit
+  """
+
+  error = validate_bill_request(file.filename, mode)
+  if error:
+      return {"error": error}
 
-      return {"structured": False, "raw": raw}
+  try:
+      upload = await receive_upload(file)
+  except UploadRejected as e:
+      return JSONResponse(status_code=413, content={"error": str(e)})
+
+  try:
+      return await run_bill_analysis(upload, file.filename, mode, request=request)
 
+  except LLMOverloaded as e:
+      return overloaded_response(e)
   except Exception as e:
       return {"error": str(e)}
+  finally:
+      upload.close()
+
+
+# ---------------------------------------------------
+# ANALYSIS JOBS (submit, then poll or stream progress)
+# ---------------------------------------------------
+async def run_report_job(upload: Upload, job, on_stage) -> dict:
+  bind(job.id, "job:report")
+  # Comfort sessions may be waiting on this report's sections
+  use_priority("standard")
+  live = live_reports.setdefault(job.id, LiveSections())
+  error = None
+  try:
+      result = await run_report_analysis(
+          upload, job.filename, on_stage=on_stage, on_sections=live.extend
+      )
+      error = result.get("error")
+      return result
+  except Exception as e:
+      error = str(e)
+      raise
+  finally:
+      upload.close()
+      live.finish(error)
+      live_reports.pop(job.id, None)
+
+
+async def run_bill_job(upload: Upload, job, on_stage) -> dict:
+  bind(job.id, "job:bill")
+  use_priority("background")
+  try:
+      return await run_bill_analysis(
+          upload, job.filename, job.options.get("mode", "auto"), on_stage=on_stage
+      )
+  finally:
+      upload.close()
+
+
+job_queue = JobQueue({"report": run_report_job, "bill": run_bill_job})
+# Sections of report jobs queued or running on this worker, so a
+# comfort_stream session can start explaining before the summary is complete
+live_reports: dict[str, LiveSections] = {}
+
+
+def report_sections_for(job_id: str) -> LiveSections | None:
+  live = live_reports.get(job_id)
+  if live is not None:
+      return live
+
+  record = job_queue.get(job_id)
+  if record is None or record["kind"] != "report" or record["status"] not in FINISHED:
+      return None
+  live = LiveSections()
+  if record["status"] == "done":
+      live.extend(parse_sections(record["result"]["summary"]))
+  live.finish(record["error"])
+  return live
+
+
+@app.post("/jobs")
+async def submit_jobs(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    kind: str = Form("report"),
+    priority: str = Form("normal"),
+    mode: str = Form("auto"),
+):
+  """
+  Queue one or more PDFs for analysis and return their job ids immediately.
+  Clients identify themselves with an X-Client-Id header so the queue can
+  take turns between them.
+  """
+  if kind not in ("report", "bill"):
+      return {"error": f"Unknown job kind: {kind}"}
+  if kind == "report" and not GOOGLE_API_KEY:
+      return {"error": "GEMINI_API_KEY missing"}
+
+  client_id = request.headers.get("x-client-id") or (
+      request.client.host if request.client else "anonymous"
+  )
+  jobs = []
+
+  for file in files:
+      if kind == "bill":
+          error = validate_bill_request(file.filename, mode)
+          if error:
+              jobs.append({"filename": file.filename, "error": error})
+              continue
+
+      try:
+          upload = await receive_upload(file)
+      except UploadRejected as e:
+          jobs.append({"filename": file.filename, "error": str(e)})
+          continue
+
+      try:
+          # Queued jobs hold the spooled upload, not its bytes
+          job = await job_queue.submit(
+              kind,
+              file.filename,
+              upload,
+              client_id,
+              priority=priority,
+              options={"mode": mode},
+          )
+      except QueueFull as e:
+          upload.close()
+          return JSONResponse(
+              status_code=503,
+              content={"error": str(e), "jobs": jobs},
+              headers={"Retry-After": "5"},
+          )
+      if kind == "report" and job.status not in FINISHED:
+          live_reports.setdefault(job.id, LiveSections())
+      jobs.append({"job_id": job.id, "filename": file.filename, "status": job.status})
+
+  return {"jobs": jobs}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+  record = job_queue.get(job_id)
+  if record is None:
+      return JSONResponse(status_code=404, content={"error": "Unknown job"})
+  return record
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+  """
+  Server-sent events: one event per status change
+  (queued -> extracting -> redacting -> analyzing -> done/error).
+  """
+  if job_queue.get(job_id) is None:
+      return JSONResponse(status_code=404, content={"error": "Unknown job"})
+
+  async def stream():
+      async for record in job_queue.events(job_id):
+          yield sse_event(record["status"], record)
+
+  return StreamingResponse(
+      stream(),
+      media_type="text/event-stream",
+      headers={"Cache-Control": "no-cache"},
+  )
 
 
 # ---------------------------------------------------
@@ -523,17 +1511,72 @@ class AppealRequest(BaseModel):
   analysis: dict | None = None
   issues_summary: str | None = None
   tone: str = "firm-but-polite"
+  # Send the letter paragraph by paragraph as server-sent events
+  stream: bool = False
+
+
+async def stream_paragraphs(prompt: str):
+  """
+  Yield each paragraph of a Gemini reply as soon as the blank line after it
+  arrives.
+  """
+  pending = ""
+  async with aclosing(llm.stream(prompt)) as chunks:
+      async for text in chunks:
+          paragraphs = (pending + text).split("\n\n")
+          pending = paragraphs.pop()
+          for paragraph in paragraphs:
+              if paragraph.strip():
+                  yield paragraph.strip("\n")
+  if pending.strip():
+      yield pending.strip("\n")
+
+
+def sse_event(event: str, data: dict) -> str:
+  return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def letter_events(prompt: str, redactor: PHIRedactor) -> StreamingResponse:
+  async def stream():
+      count = 0
+      try:
+          async for paragraph in stream_paragraphs(prompt):
+              count += 1
+              yield sse_event(
+                  "paragraph", {"index": count - 1, "text": redactor.restore(paragraph)}
+              )
+          yield sse_event("done", {"paragraphs": count})
+      except Exception as e:
+          yield sse_event("error", {"error": str(e)})
+
+  return StreamingResponse(
+      stream(),
+      media_type="text/event-stream",
+      headers={"Cache-Control": "no-cache"},
+  )
 
 
 @app.post("/draft-appeal-letter")
-async def draft_appeal_letter(body: AppealRequest):
+async def draft_appeal_letter(body: AppealRequest, request: Request):
   """
   Generates a professional medical bill dispute letter.
   Uses the structured output from /analyze-bill.
+
+  With `stream: true` the letter is sent as server-sent `paragraph` events
+  (joined with blank lines they form the letter), then `done` or `error`.
   """
 
   if not GOOGLE_API_KEY:
       return {"error": "Gemini key missing"}
+  use_priority("background")
+
+  # The letter is drafted around tokens such as [NAME_1] and the patient's
+  # details are put back into it afterwards
+  redactor = PHIRedactor(names_from(body.patient_info))
+  patient_info = redactor.redact_fields(body.patient_info)
+  bill_info = redactor.redact_fields(body.bill_info)
+  analysis = redactor.redact_fields(body.analysis)
+  issues_summary = redactor.redact(body.issues_summary) if body.issues_summary else None
 
   prompt = f"""
 Write a formal, professional medical bill dispute letter with proper business letter formatting.
@@ -541,19 +1584,19 @@ Write a formal, professional medical bill dispute letter with proper business le
 Use the following information to create a complete, professional dispute letter:
 
 PATIENT INFORMATION (use this for the letter header and signature):
-{json.dumps(body.patient_info, indent=2) if body.patient_info else "No patient info extracted - use placeholders"}
+{json.dumps(patient_info, indent=2) if patient_info else "No patient info extracted - use placeholders"}
 
 PROVIDER INFORMATION (use this for the recipient address):
 {json.dumps(body.provider_info, indent=2) if body.provider_info else "No provider info extracted - use placeholders"}
 
 BILL INFORMATION (reference these details in the letter):
-{json.dumps(body.bill_info, indent=2) if body.bill_info else "No bill info extracted - use placeholders"}
+{json.dumps(bill_info, indent=2) if bill_info else "No bill info extracted - use placeholders"}
 
 BILLING ISSUES TO DISPUTE:
-{json.dumps(body.analysis, indent=2)}
+{json.dumps(analysis, indent=2)}
 
 ADDITIONAL CONTEXT:
-{body.issues_summary}
+{issues_summary}
 
 INSTRUCTIONS:
 1. Create a proper business letter format with:
@@ -577,8 +1620,15 @@ Generate the complete letter ready to send.
 """
 
   try:
-      response = model.generate_content(prompt)
-      return {"letter": response.text}
+      if body.stream:
+          # Shed before the event stream starts rather than inside it
+          llm.scheduler.check("background")
+          return letter_events(prompt, redactor)
+
+      letter = await llm.generate(prompt, request=request)
+      return {"letter": redactor.restore(letter)}
+  except LLMOverloaded as e:
+      return overloaded_response(e)
   except Exception as e:
       return {"error": str(e)}
 
@@ -586,25 +1636,57 @@ Generate the complete letter ready to send.
 # ---------------------------------------------------
 # BILLING CALL SIMULATOR – GEMINI SCRIPT
 # ---------------------------------------------------
-class BillingIssue(BaseModel):
-  line_snippet: str | None = None
-  codes: list[str] | None = None
-  issue_type: str | None = None
-  patient_impact: str | None = None
-  can_patient_dispute: bool | None = None
-  dispute_rationale: str | None = None
-
-
 class BillingCallRequest(BaseModel):
   patient_info: dict | None = None
   provider_info: dict | None = None
   bill_info: dict | None = None
   issues: list[BillingIssue] = []
   max_turns: int = 10
+  # Send each turn as an NDJSON line as soon as the model finishes it
+  stream: bool = False
+
+
+def clean_turn(turn) -> dict | None:
+  """
+  Normalise one script turn; only non-empty rep/user turns are kept.
+  """
+  if not isinstance(turn, dict):
+      return None
+  speaker = str(turn.get("speaker", "")).strip().lower()
+  if speaker not in ["rep", "user"]:
+      return None
+  text = str(turn.get("text", "")).strip()
+  if not text:
+      return None
+  return {"speaker": speaker, "text": text}
+
+
+def call_turn_lines(prompt: str, redactor: PHIRedactor) -> StreamingResponse:
+  async def stream():
+      parser = JSONObjectStream()
+      count = 0
+      try:
+          async with aclosing(
+              llm.stream(prompt, generation_config=json_mode(CallScript))
+          ) as chunks:
+              async for text in chunks:
+                  for value in parser.feed(text):
+                      turn = clean_turn(redactor.restore(value))
+                      if turn is not None:
+                          count += 1
+                          yield json.dumps(turn) + "\n"
+          if count:
+              yield json.dumps({"done": True, "turns": count}) + "\n"
+          else:
+              yield json.dumps({"error": "No valid turns in script"}) + "\n"
+      except Exception as e:
+          yield json.dumps({"error": str(e)}) + "\n"
+
+  return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 @app.post("/simulate-billing-call")
-async def simulate_billing_call(body: BillingCallRequest):
+async def simulate_billing_call(body: BillingCallRequest, request: Request):
   """
   Generate a *full scripted call* between:
   - 'rep'  (billing representative)
@@ -618,10 +1700,20 @@ async def simulate_billing_call(body: BillingCallRequest):
       ...
     ]
   }
+
+  With `stream: true` the response is NDJSON instead: one
+  {"speaker", "text"} line per turn as soon as it is complete, then a final
+  {"done": true, "turns": n} or {"error": ...} line.
   """
 
   if not GOOGLE_API_KEY:
       return {"error": "Gemini key missing"}
+  use_priority("background")
+
+  redactor = PHIRedactor(names_from(body.patient_info))
+  patient_info = redactor.redact_fields(body.patient_info)
+  bill_info = redactor.redact_fields(body.bill_info)
+  issues = redactor.redact_fields([issue.dict() for issue in body.issues])
 
   prompt = f"""
 You are roleplaying a phone call between a US hospital billing department and a patient who is disputing potential billing errors.
@@ -645,16 +1737,16 @@ Rules:
 - Patient is disputing specific line items and codes.
 
 PATIENT INFO (for context only, do NOT say DOB or sensitive data out loud):
-{json.dumps(body.patient_info, indent=2) if body.patient_info else "None"}
+{json.dumps(patient_info, indent=2) if patient_info else "None"}
 
 PROVIDER INFO (use only the provider/facility name in dialogue):
 {json.dumps(body.provider_info, indent=2) if body.provider_info else "None"}
 
 BILL INFO (for context):
-{json.dumps(body.bill_info, indent=2) if body.bill_info else "None"}
+{json.dumps(bill_info, indent=2) if bill_info else "None"}
 
 KEY ISSUES THE PATIENT IS DISPUTING:
-{json.dumps([issue.dict() for issue in body.issues], indent=2)}
+{json.dumps(issues, indent=2)}
 
 The patient is polite but firm and wants:
 - clarification on why certain codes/charges appear (upcoding, unbundling, unnecessary tests, etc.)
@@ -665,33 +1757,27 @@ Remember: OUTPUT ONLY JSON.
 """
 
   try:
-      response = model.generate_content(prompt)
-      raw = response.text
+      if body.stream:
+          llm.scheduler.check("background")
+          return call_turn_lines(prompt, redactor)
 
-      try:
-          data = json.loads(raw)
-      except Exception:
-          m = re.search(r"{[\s\S]*}", raw)
-          if not m:
-              return {"error": "Could not parse JSON from model", "raw": raw}
-          data = json.loads(m.group(0))
-
-      turns = data.get("turns", [])
-      # Light clean-up: ensure only rep/user
-      clean_turns = []
-      for t in turns:
-          speaker = t.get("speaker", "").strip().lower()
-          if speaker not in ["rep", "user"]:
-              continue
-          text = str(t.get("text", "")).strip()
-          if not text:
-              continue
-          clean_turns.append({"speaker": speaker, "text": text})
+      script, raw = await generate_structured(llm, prompt, CallScript, request=request)
+      if script is None:
+          return {"error": "Could not parse JSON from model", "raw": redactor.restore(raw)}
+
+      # Light clean-up: drop blank turns
+      clean_turns = [
+          turn
+          for turn in map(clean_turn, redactor.restore(script.model_dump()["turns"]))
+          if turn is not None
+      ]
 
       if not clean_turns:
-          return {"error": "No valid turns in script", "raw": data}
+          return {"error": "No valid turns in script", "raw": redactor.restore(raw)}
 
       return {"turns": clean_turns}
 
+  except LLMOverloaded as e:
+      return overloaded_response(e)
   except Exception as e:
       return {"error": str(e)}
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import random
+
+from observability import log
+
+
+MESSAGE_POOL_SIZE = int(os.environ.get("MESSAGE_POOL_SIZE", "3"))
+MESSAGE_POOL_REFRESH_SECONDS = float(os.environ.get("MESSAGE_POOL_REFRESH_SECONDS", "3600"))
+MESSAGE_POOL_RETRY_SECONDS = 30.0
+
+
+class MessagePool:
+  """
+  Warm pool of pre-generated messages for constant prompts.
+
+  `prompts` maps a kind (e.g. "intro") to the prompt that produces it.
+  `generate(prompt)` returns the text; the optional `synthesize(text)`
+  returns pre-rendered audio so the first spoken words need no TTS call.
+  The pool is filled in the background and regenerated every `refresh`
+  seconds; until then `pick` returns None and callers generate live.
+  """
+
+  def __init__(
+      self,
+      prompts: dict,
+      generate,
+      synthesize=None,
+      size: int = MESSAGE_POOL_SIZE,
+      refresh: float = MESSAGE_POOL_REFRESH_SECONDS,
+  ):
+    self.prompts = prompts
+    self._generate = generate
+    self._synthesize = synthesize
+    self.size = size
+    self.refresh = refresh
+    self._messages = {kind: [] for kind in prompts}
+    self._audio = {}
+    self._task = None
+
+  def start(self):
+    if self._task is None and self.size > 0:
+      self._task = asyncio.create_task(self._run())
+
+  async def stop(self):
+    if self._task is not None:
+      self._task.cancel()
+      try:
+        await self._task
+      except asyncio.CancelledError:
+        pass
+      self._task = None
+
+  def pick(self, kind: str) -> str | None:
+    messages = self._messages.get(kind)
+    return random.choice(messages) if messages else None
+
+  def audio_for(self, text: str) -> bytes | None:
+    return self._audio.get(text.strip())
+
+  async def _run(self):
+    while True:
+      try:
+        await self.fill()
+        delay = self.refresh
+      except Exception as e:
+        log("Message pool refresh failed", error=str(e))
+        delay = MESSAGE_POOL_RETRY_SECONDS
+      await asyncio.sleep(delay)
+
+  async def fill(self):
+    fresh = {}
+    for kind, prompt in self.prompts.items():
+      texts = await asyncio.gather(
+          *(self._generate(prompt) for _ in range(self.size))
+      )
+      fresh[kind] = [text.strip() for text in texts if text.strip()]
+
+    audio = {}
+    if self._synthesize is not None:
+      for texts in fresh.values():
+        for text in texts:
+          try:
+            audio[text] = await self._synthesize(text)
+          except Exception as e:
+            log("Message pool TTS failed", error=str(e))
+
+    self._messages = fresh
+    self._audio = audio
+    log(
+        "Message pool ready",
+        **{kind: len(texts) for kind, texts in fresh.items()},
+        pre_rendered=len(audio),
+    )
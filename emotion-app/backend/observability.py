@@ -0,0 +1,239 @@
+import contextlib
+import contextvars
+import json
+import os
+import time
+import uuid
+from bisect import bisect_left
+
+from starlette.routing import Match
+
+
+# Set to 0 to skip every timing and counter; request IDs and logs stay on
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+REQUEST_ID_HEADER = "x-request-id"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+request_id = contextvars.ContextVar("request_id", default=None)
+endpoint = contextvars.ContextVar("endpoint", default="background")
+
+_metrics = []
+
+
+def _escape(value) -> str:
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+  pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+  if extra:
+    pairs.append(extra)
+  return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+  kind = "counter"
+
+  def __init__(self, name: str, help: str, labels: tuple = ()):
+    self.name = name
+    self.help = help
+    self.labels = labels
+    self._values = {}
+    _metrics.append(self)
+
+  def inc(self, *label_values, amount: float = 1):
+    if METRICS_ENABLED:
+      self._values[label_values] = self._values.get(label_values, 0) + amount
+
+  def render(self) -> list[str]:
+    return [
+        f"{self.name}{_labels(self.labels, values)} {value:g}"
+        for values, value in self._values.items()
+    ]
+
+
+class Gauge(Counter):
+  kind = "gauge"
+
+  def dec(self, *label_values, amount: float = 1):
+    self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+  kind = "histogram"
+
+  def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+    self.name = name
+    self.help = help
+    self.labels = labels
+    self.buckets = buckets
+    # label values -> [per-bucket counts (last one is +Inf), sum]
+    self._series = {}
+    _metrics.append(self)
+
+  def observe(self, value: float, *label_values):
+    if not METRICS_ENABLED:
+      return
+    series = self._series.get(label_values)
+    if series is None:
+      series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+    series[0][bisect_left(self.buckets, value)] += 1
+    series[1] += value
+
+  def render(self) -> list[str]:
+    lines = []
+    for values, (counts, total) in self._series.items():
+      cumulative = 0
+      for bound, count in zip((*self.buckets, "+Inf"), counts):
+        cumulative += count
+        le = f'le="{bound:g}"' if bound != "+Inf" else 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}")
+      lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total:g}")
+      lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+    return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Time to serve an HTTP request, streamed body included",
+    ("endpoint", "method", "status"),
+)
+PHASE_SECONDS = Histogram(
+    "phase_seconds", "Time spent in one phase of a request", ("endpoint", "phase")
+)
+LLM_SECONDS = Histogram(
+    "llm_seconds", "Upstream Gemini call time, from request to last chunk", ("endpoint", "mode")
+)
+LLM_FIRST_CHUNK_SECONDS = Histogram(
+    "llm_first_chunk_seconds", "Time to the first streamed Gemini chunk", ("endpoint",)
+)
+LLM_PROMPT_CHARS = Histogram(
+    "llm_prompt_chars", "Prompt size in characters", ("endpoint",), SIZE_BUCKETS
+)
+LLM_RESPONSE_CHARS = Histogram(
+    "llm_response_chars", "Response size in characters", ("endpoint",), SIZE_BUCKETS
+)
+LLM_ERRORS = Counter("llm_errors_total", "Failed Gemini calls", ("endpoint", "error"))
+WEBSOCKET_SESSIONS = Gauge("websocket_sessions_active", "Open WebSocket sessions", ("endpoint",))
+
+
+class _Phase:
+  __slots__ = ("name", "started")
+
+  def __init__(self, name: str):
+    self.name = name
+
+  def __enter__(self):
+    self.started = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    PHASE_SECONDS.observe(time.perf_counter() - self.started, endpoint.get(), self.name)
+
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+def phase(name: str):
+  """
+  `with phase("extraction"): ...` records the block's duration under the
+  current endpoint. Works around awaits; a shared no-op when disabled.
+  """
+  return _Phase(name) if METRICS_ENABLED else _NO_PHASE
+
+
+def observe_phase(name: str, seconds: float):
+  PHASE_SECONDS.observe(seconds, endpoint.get(), name)
+
+
+def bind(id: str | None = None, name: str | None = None):
+  """
+  Tag logs and metrics from the current task (and tasks it starts) with a
+  request ID and endpoint, e.g. for background jobs.
+  """
+  request_id.set(id or uuid.uuid4().hex)
+  if name is not None:
+    endpoint.set(name)
+
+
+def log(message: str, **fields):
+  """
+  One JSON log line carrying the current request ID and endpoint.
+  """
+  record = {
+      "time": round(time.time(), 3),
+      "request_id": request_id.get(),
+      "endpoint": endpoint.get(),
+      "message": message,
+      **fields,
+  }
+  print(json.dumps(record, default=str), flush=True)
+
+
+def render_metrics() -> str:
+  lines = []
+  for metric in _metrics:
+    lines.append(f"# HELP {metric.name} {metric.help}")
+    lines.append(f"# TYPE {metric.name} {metric.kind}")
+    lines.extend(metric.render())
+  return "\n".join(lines) + "\n"
+
+
+def _route_path(scope) -> str:
+  # The route template, so /jobs/{job_id} is one label value, not one per job
+  for route in getattr(scope.get("app"), "routes", ()):
+    match, _ = route.matches(scope)
+    if match is Match.FULL:
+      return route.path
+  return "unmatched"
+
+
+class RequestContextMiddleware:
+  """
+  Give every HTTP request and WebSocket session a request ID (the client's
+  X-Request-ID if sent, echoed back on HTTP responses), and time requests
+  and count open sessions per endpoint.
+  """
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] not in ("http", "websocket"):
+      return await self.app(scope, receive, send)
+
+    sent_id = next(
+        (value for key, value in scope["headers"] if key == REQUEST_ID_HEADER.encode()), b""
+    )
+    current_id = sent_id.decode("latin-1")[:64] or uuid.uuid4().hex
+    name = _route_path(scope) if METRICS_ENABLED else scope["path"]
+    request_id.set(current_id)
+    endpoint.set(name)
+
+    if scope["type"] == "websocket":
+      WEBSOCKET_SESSIONS.inc(name)
+      try:
+        return await self.app(scope, receive, send)
+      finally:
+        WEBSOCKET_SESSIONS.dec(name)
+
+    status = 500
+    started = time.perf_counter()
+
+    async def send_with_id(message):
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+        message["headers"] = [
+            *message.get("headers", []),
+            (REQUEST_ID_HEADER.encode(), current_id.encode("latin-1")),
+        ]
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_with_id)
+    finally:
+      HTTP_REQUEST_SECONDS.observe(
+          time.perf_counter() - started, name, scope["method"], status
+      )
@@ -0,0 +1,186 @@
+import asyncio
+import io
+import mmap
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import pypdf
+
+
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+# Checked before any page is extracted
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "500"))
+
+_pool: ProcessPoolExecutor | None = None
+
+
+class PageLimitExceeded(Exception):
+  pass
+
+
+@dataclass
+class ExtractionResult:
+  text: str
+  pages: list[str]
+  page_count: int
+  pages_read: int
+  seconds: float
+  # Highest resident set size reported by the workers that parsed the PDF
+  worker_rss: int = 0
+
+
+def current_rss() -> int:
+  """
+  Resident set size of this process in bytes (0 where /proc is missing).
+  """
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError):
+    return 0
+
+
+@contextmanager
+def _open_pdf(source: bytes | str):
+  """
+  A reader over in-memory bytes, or over a memory map of the file at
+  `source` so large uploads are paged in from disk rather than copied
+  onto the heap of every worker.
+  """
+  if isinstance(source, bytes):
+    yield pypdf.PdfReader(io.BytesIO(source))
+    return
+  with open(source, "rb") as f:
+    view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      yield pypdf.PdfReader(view)
+    finally:
+      try:
+        view.close()
+      except BufferError:
+        # Still referenced by parsed objects; unmapped once they are collected
+        pass
+
+
+def _page_count(source: bytes | str) -> int:
+  with _open_pdf(source) as reader:
+    return len(reader.pages)
+
+
+def _extract_pages(source: bytes | str, start: int, stop: int, max_chars: int | None):
+  """
+  Runs in a worker process: extract text from pages [start, stop).
+  Returns (parts, pages_read, rss); stops early once `max_chars` is covered.
+  """
+  parts = []
+  chars = 0
+  pages_read = 0
+
+  with _open_pdf(source) as reader:
+    for index in range(start, min(stop, len(reader.pages))):
+      text = reader.pages[index].extract_text()
+      pages_read += 1
+      if text:
+        parts.append(text)
+        chars += len(text) + 1
+      if max_chars is not None and chars >= max_chars:
+        break
+    rss = current_rss()
+
+  return parts, pages_read, rss
+
+
+def get_pool() -> ProcessPoolExecutor:
+  global _pool
+  if _pool is None:
+    # spawn keeps the grpc threads of the parent out of the workers
+    _pool = ProcessPoolExecutor(
+        max_workers=PDF_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+  return _pool
+
+
+def shutdown_pool():
+  global _pool
+  if _pool is not None:
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+async def extract_pdf_text(
+    source: bytes | str,
+    max_chars: int | None = None,
+    max_pages: int | None = PDF_MAX_PAGES,
+) -> ExtractionResult:
+  """
+  Extract the text of a PDF, given as bytes or a file path, off the event loop.
+
+  Pages are split into batches of PDF_PAGES_PER_TASK and parsed in parallel
+  in a process pool. Batches are consumed in page order and no further
+  batches are scheduled once `max_chars` characters have been collected.
+  Raises PageLimitExceeded before extracting anything if the PDF has more
+  than `max_pages` pages.
+  """
+  loop = asyncio.get_running_loop()
+  pool = get_pool()
+  started = time.perf_counter()
+
+  page_count = await loop.run_in_executor(pool, _page_count, source)
+  if max_pages is not None and page_count > max_pages:
+    raise PageLimitExceeded(f"PDF has {page_count} pages; at most {max_pages} are allowed")
+  batches = [
+      (start, min(start + PDF_PAGES_PER_TASK, page_count))
+      for start in range(0, page_count, PDF_PAGES_PER_TASK)
+  ]
+
+  parts = []
+  chars = 0
+  pages_read = 0
+  worker_rss = 0
+  pending = []
+  next_batch = 0
+
+  def schedule():
+    nonlocal next_batch
+    while next_batch < len(batches) and len(pending) < PDF_WORKERS:
+      start, stop = batches[next_batch]
+      pending.append(
+          loop.run_in_executor(pool, _extract_pages, source, start, stop, max_chars)
+      )
+      next_batch += 1
+
+  try:
+    schedule()
+    while pending:
+      batch_parts, batch_pages, batch_rss = await pending.pop(0)
+      parts.extend(batch_parts)
+      chars += sum(len(part) + 1 for part in batch_parts)
+      pages_read += batch_pages
+      worker_rss = max(worker_rss, batch_rss)
+      if max_chars is not None and chars >= max_chars:
+        break
+      schedule()
+  finally:
+    for future in pending:
+      future.cancel()
+
+  text = "\n".join(parts)
+  if parts:
+    text += "\n"
+  if max_chars is not None:
+    text = text[:max_chars]
+
+  return ExtractionResult(
+      text=text,
+      pages=parts,
+      page_count=page_count,
+      pages_read=pages_read,
+      seconds=time.perf_counter() - started,
+      worker_rss=worker_rss,
+  )
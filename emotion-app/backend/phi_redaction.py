@@ -0,0 +1,220 @@
+import re
+from functools import lru_cache
+
+
+_SEP = r"[ \t]*[:#]?[ \t]*"
+_ID = r"(?=[A-Za-z-]*\d)[A-Za-z0-9][A-Za-z0-9-]{3,}"
+# Smith, O'Neil, McDonald or Smith-Jones, stopping before a possessive 's
+_SURNAME = r"[A-Z](?:'[A-Z])?[a-z]+(?:[A-Z][a-z]+)?(?:-[A-Z][a-z]+)?"
+_NAME_WORD = r"[A-Z][A-Za-z'-]*\b\.?(?![ \t]*[:#])"
+# Lab tests named "<word> <letter>." (Hepatitis B., Protein C., Factor V.)
+# and the words that follow them in reports, neither of which start or end
+# a "First I. Last" name
+_NOT_TEST_NAME = (
+    r"(?!(?:Hepatitis|Vitamin|Protein|Factor|Group|Type|Complement|Coenzyme|"
+    r"Apolipoprotein|Influenza|Strep|Streptococcus|Antigen|Stage|Grade|Class|"
+    r"Phase|Section|Part|Appendix|Table|Figure|Schedule)\b)"
+)
+_NOT_RESULT_WORD = (
+    r"(?!(?:Normal|Abnormal|High|Low|Result|Results|Range|Level|Levels|Activity|"
+    r"Antigen|Antibody|Antibodies|Surface|Core|Total|Free|Positive|Negative|"
+    r"Reactive|Nonreactive|Detected|Undetected|Deficiency|Leiden)\b)"
+)
+
+# One alternation over every identifier kind so a document is scanned once.
+# Group names map to a kind in _GROUP_KINDS; where a pattern includes a
+# label ("MRN: ..."), only the `<group>_v` value is replaced.
+_PHI_PATTERNS = (
+    ("MRN", rf"(?i:\b(?:MRN|Medical[ \t]+Record(?:[ \t]+(?:Number|No\.?|\#))?|Patient[ \t]+ID)){_SEP}(?P<MRN_v>{_ID})"),
+    ("ACCOUNT", rf"(?i:\b(?:Account|Acct\.?|Member[ \t]+ID|Subscriber[ \t]+ID|Policy)(?:[ \t]+(?:Number|No\.?|\#|ID))?){_SEP}(?P<ACCOUNT_v>{_ID})"),
+    ("DOB", r"(?i:\b(?:DOB|D\.O\.B\.?|Date[ \t]+of[ \t]+Birth|Birth[ \t]*Date))" + _SEP
+     + r"(?P<DOB_v>\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2}|[A-Z][a-z]{2,8}\.?[ \t]+\d{1,2},?[ \t]+\d{4})"),
+    ("NAME_LABEL", r"(?i:\b(?:Patient(?:[ \t]+Name)?|Guarantor(?:[ \t]+Name)?|Insured(?:[ \t]+Name)?|Subscriber(?:[ \t]+Name)?|Responsible[ \t]+Party))[ \t]*:[ \t]*"
+     + rf"(?P<NAME_LABEL_v>{_NAME_WORD}(?:,?[ ]{_NAME_WORD}){{0,3}})"),
+    # Case-sensitive and with the period, so "98 ms Normal" is left alone
+    ("NAME_TITLE", rf"\b(?:(?:Mr|Mrs|Ms|Dr)\.|Miss)[ \t]+{_SURNAME}(?:[ \t]+[A-Z]\.)?(?:[ \t]+{_SURNAME})?"),
+    # Jane Q. Public, but not "Hepatitis B. Surface Antigen" or "Vitamin D. Normal"
+    ("NAME_INITIAL", rf"\b{_NOT_TEST_NAME}[A-Z][a-z]+[ \t]+[A-Z]\.[ \t]+{_NOT_RESULT_WORD}[A-Z][a-z]+"),
+    ("SSN", r"\b\d{3}-\d{2}-\d{4}\b"),
+    # (217) 555-0100, 217-555-0100 or 217.555.0100; digits separated by
+    # spaces only are table columns far more often than phone numbers
+    ("PHONE", r"(?<![\d.-])(?:\+?1[ \t.-]?)?(?:\(\d{3}\)[ \t]?\d{3}[.-]\d{4}|\d{3}(?P<PHONE_sep>[.-])\d{3}(?P=PHONE_sep)\d{4})(?![\d-]|\.\d)"),
+    ("EMAIL", r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b"),
+    # At least one street name word, so "5 Dr Jones" is not an address
+    ("ADDRESS", r"\b\d{1,6}[ \t]+(?:[A-Z0-9][A-Za-z0-9.]*[ \t]+){1,4}"
+     r"(?i:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Way|Court|Ct|Place|Pl|Parkway|Pkwy|Circle|Cir|Highway|Hwy)\b\.?"
+     r"(?:,?[ \t]+(?i:Apt|Suite|Ste|Unit)\.?[ \t]*\#?\w+)?"),
+    ("CITY_ZIP", r"\b[A-Z][A-Za-z.]+(?:[ ][A-Z][A-Za-z.]+){0,2},?[ \t]+[A-Z]{2}[ \t]+\d{5}(?:-\d{4})?\b"),
+)
+_GROUP_KINDS = {
+    "MRN": "MRN",
+    "ACCOUNT": "ACCOUNT",
+    "DOB": "DOB",
+    "NAME_LABEL": "NAME",
+    "NAME_TITLE": "NAME",
+    "NAME_INITIAL": "NAME",
+    "KNOWN": "NAME",
+    "SSN": "SSN",
+    "PHONE": "PHONE",
+    "EMAIL": "EMAIL",
+    "ADDRESS": "ADDRESS",
+    "CITY_ZIP": "ADDRESS",
+}
+_BASE_PATTERN = "|".join(f"(?P<{group}>{pattern})" for group, pattern in _PHI_PATTERNS)
+# Every alternative starts at a word boundary or at "(" / "+" (phone
+# numbers); checking that once up front spares trying each alternative
+# mid-word, which roughly halves the scan time.
+_GUARD = r"(?:\b|(?=[(+]))"
+_POSSESSIVE_PATTERN = re.compile(r"\b[A-Z][a-z]+'s\b")
+_TOKEN_PATTERN = re.compile(r"\[(NAME|MRN|ACCOUNT|DOB|SSN|PHONE|EMAIL|ADDRESS)_(\d+)\]")
+
+# patient_info keys whose whole value identifies the patient, by kind
+_FIELD_KINDS = (
+    ("name", "NAME"),
+    ("birth", "DOB"),
+    ("dob", "DOB"),
+    ("ssn", "SSN"),
+    ("phone", "PHONE"),
+    ("email", "EMAIL"),
+    ("address", "ADDRESS"),
+    ("street", "ADDRESS"),
+    ("city", "ADDRESS"),
+    ("zip", "ADDRESS"),
+    ("mrn", "MRN"),
+    ("account", "ACCOUNT"),
+    ("member", "ACCOUNT"),
+    ("policy", "ACCOUNT"),
+    ("patient_id", "ACCOUNT"),
+)
+
+# Spoken-style replacements for text that ends up read aloud
+PLAIN_REPLACEMENTS = {"NAME": "the patient", "DOB": "their date of birth"}
+
+
+@lru_cache(maxsize=64)
+def _compile(known_names: tuple) -> re.Pattern:
+  if not known_names:
+    return re.compile(rf"{_GUARD}(?:{_BASE_PATTERN})")
+  # Longest first so "Jane Doe" wins over "Jane"; known names go last so a
+  # labelled value or an email address containing one is taken whole
+  names = "|".join(re.escape(name) for name in sorted(known_names, key=len, reverse=True))
+  return re.compile(rf"{_GUARD}(?:{_BASE_PATTERN}|(?P<KNOWN>(?i:\b(?:{names})\b)))")
+
+
+def names_from(*infos: dict | None) -> tuple:
+  """
+  Names worth redacting verbatim: every `*name*` value in the given dicts
+  (e.g. patient_info), plus each word of it with three or more letters.
+  """
+  names = set()
+  for info in infos:
+    for key, value in (info or {}).items():
+      if "name" not in str(key).lower() or not isinstance(value, str):
+        continue
+      value = " ".join(value.split())
+      if len(value) < 3 or value.lower() in ("null", "none", "unknown"):
+        continue
+      names.add(value)
+      names.update(
+          word.strip(",.") for word in value.split() if len(word.strip(",.")) >= 3
+      )
+  return tuple(sorted(names))
+
+
+class PHIRedactor:
+  """
+  Single-pass redaction of patient identifiers (names, MRNs, dates of birth,
+  SSNs, phone numbers, emails, addresses and account numbers) before text
+  leaves the backend.
+
+  By default each distinct value becomes a numbered token such as
+  `[NAME_1]`, and `restore()` swaps the tokens in the model's reply back to
+  the original values so extracted contact details still reach the user.
+  Pass `replacements` to substitute fixed text per kind instead (see
+  PLAIN_REPLACEMENTS); other kinds then become `[redacted]`.
+  """
+
+  def __init__(self, known_names: tuple = (), replacements: dict | None = None):
+    self._pattern = _compile(tuple(known_names))
+    self._replacements = replacements
+    self._tokens = {}
+    self._values = {}
+    self._issued = {}
+    self.counts = {}
+
+  def _token(self, kind: str, value: str) -> str:
+    self.counts[kind] = self.counts.get(kind, 0) + 1
+    if self._replacements is not None:
+      return self._replacements.get(kind, "[redacted]")
+    token = self._tokens.get((kind, value))
+    if token is None:
+      self._issued[kind] = self._issued.get(kind, 0) + 1
+      token = f"[{kind}_{self._issued[kind]}]"
+      self._tokens[(kind, value)] = token
+      self._values[token] = value
+    return token
+
+  def _replace(self, match: re.Match) -> str:
+    group = match.lastgroup
+    kind = _GROUP_KINDS[group]
+    value_group = f"{group}_v"
+    if value_group in match.re.groupindex:
+      start, end = match.span(value_group)
+      text = match.group(0)
+      offset = match.start()
+      return (
+          text[:start - offset]
+          + self._token(kind, match.group(value_group))
+          + text[end - offset:]
+      )
+    return self._token(kind, match.group(0))
+
+  def redact(self, text: str) -> str:
+    return self._pattern.sub(self._replace, text)
+
+  def redact_fields(self, value):
+    """
+    Redact a structure of patient details such as patient_info: strings
+    under identifying keys ("name", "dob", "address", "account_number", ...)
+    become one token each, and every other string goes through `redact()`.
+    """
+    if isinstance(value, dict):
+      redacted = {}
+      for key, item in value.items():
+        kind = next((kind for part, kind in _FIELD_KINDS if part in str(key).lower()), None)
+        if kind is not None and isinstance(item, str) and item.strip():
+          redacted[key] = self._token(kind, item)
+        else:
+          redacted[key] = self.redact_fields(item)
+      return redacted
+    if isinstance(value, list):
+      return [self.redact_fields(item) for item in value]
+    if isinstance(value, str):
+      return self.redact(value)
+    return value
+
+  def restore(self, value):
+    """
+    Put the original values back into a model reply (a string, or the dicts
+    and lists parsed from one).
+    """
+    if isinstance(value, str):
+      if not self._values:
+        return value
+      return _TOKEN_PATTERN.sub(
+          lambda match: self._values.get(match.group(0), match.group(0)), value
+      )
+    if isinstance(value, dict):
+      return {key: self.restore(item) for key, item in value.items()}
+    if isinstance(value, list):
+      return [self.restore(item) for item in value]
+    return value
+
+
+def strip_patient_identifiers(text: str) -> str:
+  """
+  Redact identifiers from text that will be read aloud: names become "the
+  patient" rather than tokens, and possessives ("Jane's") become "your".
+  """
+  text = PHIRedactor(replacements=PLAIN_REPLACEMENTS).redact(text)
+  return _POSSESSIVE_PATTERN.sub("your", text)
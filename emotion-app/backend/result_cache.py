@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "86400"))
+# Set to a file path (e.g. /app/cache/results.sqlite) to keep results across restarts
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH")
+
+
+def cache_key(data: bytes, *parts: str) -> str:
+  """
+  Content address for an upload: sha256 of the bytes plus whatever else
+  changes the answer (prompt version, model name, ...).
+  """
+  return digest_key(hashlib.sha256(data), *parts)
+
+
+def digest_key(digest, *parts: str) -> str:
+  """
+  `cache_key` for a sha256 that has already seen the bytes, e.g. one
+  updated chunk by chunk while an upload streams in. `digest` is not changed.
+  """
+  digest = digest.copy()
+  for part in parts:
+    digest.update(b"\0" + part.encode())
+  return digest.hexdigest()
+
+
+class ResultCache:
+  """
+  Two-tier cache for JSON-serialisable endpoint results.
+
+  The memory tier is an LRU bounded by `max_entries`; the optional SQLite
+  tier survives restarts and is shared by every worker pointing at the same
+  file. Both tiers expire entries after `ttl` seconds.
+  """
+
+  def __init__(
+      self,
+      max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+      ttl: float = RESULT_CACHE_TTL_SECONDS,
+      path: str | None = RESULT_CACHE_PATH,
+  ):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._memory = OrderedDict()
+    self._lock = threading.Lock()
+    self._db = None
+    self.hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+
+    if path:
+      os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+      self._db = sqlite3.connect(path, check_same_thread=False)
+      self._db.execute("PRAGMA journal_mode=WAL")
+      self._db.execute(
+          "CREATE TABLE IF NOT EXISTS results "
+          "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+      )
+      self._db.commit()
+
+  def get(self, key: str):
+    now = time.time()
+    with self._lock:
+      entry = self._memory.get(key)
+      if entry is not None:
+        created, value = entry
+        if now - created < self.ttl:
+          self._memory.move_to_end(key)
+          self.hits += 1
+          return value
+        del self._memory[key]
+
+      if self._db is not None:
+        row = self._db.execute(
+            "SELECT value, created FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row and now - row[1] < self.ttl:
+          value = json.loads(row[0])
+          self._remember(key, value, row[1])
+          self.hits += 1
+          self.disk_hits += 1
+          return value
+
+      self.misses += 1
+      return None
+
+  def set(self, key: str, value):
+    now = time.time()
+    with self._lock:
+      self._remember(key, value, now)
+      if self._db is not None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+            (key, json.dumps(value), now),
+        )
+        self._db.execute(
+            "DELETE FROM results WHERE created < ?", (now - self.ttl,)
+        )
+        self._db.commit()
+
+  def _remember(self, key: str, value, created: float):
+    self._memory[key] = (created, value)
+    self._memory.move_to_end(key)
+    while len(self._memory) > self.max_entries:
+      self._memory.popitem(last=False)
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+        "hits": self.hits,
+        "disk_hits": self.disk_hits,
+        "misses": self.misses,
+        "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        "memory_entries": len(self._memory),
+        "disk_enabled": self._db is not None,
+    }
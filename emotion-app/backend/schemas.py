@@ -0,0 +1,60 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+ISSUE_TYPES = "duplicate | upcoding | unbundling | clerical | unnecessary | other"
+
+
+class BillingIssue(BaseModel):
+  line_snippet: str | None = Field(None, description="string from bill")
+  codes: list[str] | None = Field(None, description="CPT/ICD/HCPCS codes on the line")
+  issue_type: str | None = Field(None, description=ISSUE_TYPES)
+  patient_impact: str | None = Field(None, description="why this matters financially")
+  can_patient_dispute: bool | None = None
+  dispute_rationale: str | None = Field(None, description="why disputable")
+
+
+class PatientInfo(BaseModel):
+  name: str | None = None
+  address: str | None = None
+  city_state_zip: str | None = None
+  phone: str | None = None
+  email: str | None = None
+  account_number: str | None = Field(None, description="account/patient ID")
+  dob: str | None = Field(None, description="date of birth")
+
+
+class ProviderInfo(BaseModel):
+  name: str | None = Field(None, description="provider/facility name")
+  billing_dept: str | None = Field(None, description="billing department name or 'Billing Department'")
+  address: str | None = None
+  city_state_zip: str | None = None
+  phone: str | None = None
+
+
+class BillInfo(BaseModel):
+  bill_date: str | None = Field(None, description="bill/service date")
+  due_date: str | None = None
+  total_amount: str | None = None
+
+
+class BillAnalysis(BaseModel):
+  """
+  The /analyze-bill `analysis` shape Gemini is asked to produce.
+  """
+
+  high_level_summary: str = ""
+  patient_info: PatientInfo = Field(default_factory=PatientInfo)
+  provider_info: ProviderInfo = Field(default_factory=ProviderInfo)
+  bill_info: BillInfo = Field(default_factory=BillInfo)
+  potential_issues: list[BillingIssue] = []
+
+
+class CallTurn(BaseModel):
+  speaker: Literal["rep", "user"]
+  text: str
+
+
+class CallScript(BaseModel):
+  turns: list[CallTurn] = []
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import aclosing
+
+from observability import Counter
+
+
+# Longest a patient waits for a section's explanation to start before a
+# locally rendered one is sent instead
+SECTION_DEADLINE_SECONDS = float(os.environ.get("SECTION_DEADLINE_SECONDS", "8"))
+# Set to 0 to only retry a section whose request failed, never to send a
+# duplicate alongside a slow one
+SECTION_HEDGE_ENABLED = os.environ.get("SECTION_HEDGE_ENABLED", "1") != "0"
+# A duplicate request is sent once the first has taken longer than this
+# percentile of recent time-to-first-output...
+SECTION_HEDGE_PERCENTILE = float(os.environ.get("SECTION_HEDGE_PERCENTILE", "0.95"))
+# ...or, until SECTION_HEDGE_MIN_SAMPLES have been seen, this many seconds
+SECTION_HEDGE_DELAY_SECONDS = float(os.environ.get("SECTION_HEDGE_DELAY_SECONDS", "3"))
+SECTION_HEDGE_MIN_SAMPLES = int(os.environ.get("SECTION_HEDGE_MIN_SAMPLES", "20"))
+SECTION_LATENCY_WINDOW = 200
+
+SECTION_HEDGES = Counter("section_hedges_total", "Duplicate section requests sent", ("winner",))
+SECTION_FALLBACKS = Counter(
+    "section_fallbacks_total", "Sections explained locally instead of by Gemini", ("reason",)
+)
+
+_stats = {"hedged": 0, "hedge_wins": 0, "deadline_fallbacks": 0, "error_fallbacks": 0}
+
+
+class DeadlineExceeded(Exception):
+  pass
+
+
+class LatencyTracker:
+  """
+  Recent time-to-first-output of section explanations. `hedge_after` is
+  the configured percentile of them, or a fixed delay until there are
+  enough samples.
+  """
+
+  def __init__(
+      self,
+      percentile: float = SECTION_HEDGE_PERCENTILE,
+      initial: float = SECTION_HEDGE_DELAY_SECONDS,
+      min_samples: int = SECTION_HEDGE_MIN_SAMPLES,
+      window: int = SECTION_LATENCY_WINDOW,
+  ):
+    self.percentile = percentile
+    self.initial = initial
+    self.min_samples = min_samples
+    self._samples = deque(maxlen=window)
+
+  def record(self, seconds: float):
+    self._samples.append(seconds)
+
+  def hedge_after(self) -> float:
+    if len(self._samples) < max(self.min_samples, 1):
+      return self.initial
+    ordered = sorted(self._samples)
+    return ordered[min(int(len(ordered) * self.percentile), len(ordered) - 1)]
+
+
+section_latency = LatencyTracker()
+
+
+def deadline_stats() -> dict:
+  return {
+      **_stats,
+      "deadline_seconds": SECTION_DEADLINE_SECONDS,
+      "hedge_after_seconds": round(section_latency.hedge_after(), 3) if SECTION_HEDGE_ENABLED else None,
+  }
+
+
+def record_fallback(reason: str):
+  _stats["deadline_fallbacks" if reason == "deadline" else "error_fallbacks"] += 1
+  SECTION_FALLBACKS.inc(reason)
+
+
+class Reply:
+  """
+  An explanation whose first chunk has arrived. `rest()` yields the
+  remaining chunks when it is still streaming.
+  """
+
+  def __init__(self, first: str, stream=None):
+    self.first = first
+    self.stream = stream
+
+  async def rest(self):
+    if self.stream is None:
+      return
+    async with aclosing(self.stream) as stream:
+      async for text in stream:
+        yield text
+
+  async def aclose(self):
+    if self.stream is not None:
+      await self.stream.aclose()
+
+
+async def open_stream(stream) -> Reply:
+  """
+  Wait for the first non-empty chunk of `stream`, recording how long it took.
+  """
+  started = time.perf_counter()
+  try:
+    async for text in stream:
+      if text:
+        section_latency.record(time.perf_counter() - started)
+        return Reply(text, stream)
+  except BaseException:
+    await stream.aclose()
+    raise
+  raise ValueError("Gemini returned an empty explanation")
+
+
+async def hedged(first, start_hedge, hedge_after: float, timeout: float, discard=None):
+  """
+  Await `first` (a coroutine or a task already running); if it has not
+  finished after `hedge_after` seconds, or fails before then, start a
+  duplicate with `start_hedge()`. Returns `(result, hedge_won)` for
+  whichever succeeds first and cancels the other.
+
+  Raises DeadlineExceeded if neither succeeds within `timeout` seconds,
+  or the last error once both have failed. `discard` is awaited with the
+  result of an attempt that succeeded but lost the race.
+  """
+  loop = asyncio.get_running_loop()
+  started = loop.time()
+  deadline = started + timeout
+  pending = {asyncio.ensure_future(first)}
+  hedge = None
+  error = None
+  try:
+    while pending:
+      now = loop.time()
+      if now >= deadline:
+        raise DeadlineExceeded(f"No explanation within {timeout:g}s")
+      wait = deadline - now
+      if hedge is None:
+        wait = min(wait, max(0.0, started + hedge_after - now))
+      done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+
+      winner = None
+      for task in done:
+        if task.cancelled():
+          error = DeadlineExceeded("Explanation was cancelled")
+        elif task.exception() is not None:
+          error = task.exception()
+        elif winner is None:
+          winner = task
+        elif discard is not None:
+          await discard(task.result())
+      if winner is not None:
+        if hedge is not None:
+          SECTION_HEDGES.inc("hedge" if winner is hedge else "first")
+          if winner is hedge:
+            _stats["hedge_wins"] += 1
+        return winner.result(), winner is hedge
+
+      if hedge is None and (done or loop.time() >= started + hedge_after):
+        hedge = asyncio.ensure_future(start_hedge())
+        pending.add(hedge)
+        _stats["hedged"] += 1
+    raise error
+  finally:
+    for task in pending:
+      task.cancel()
@@ -0,0 +1,171 @@
+import asyncio
+import re
+
+from observability import log, phase
+
+
+SECTION_DELIMITER = "###SECTION###"
+_HEADER_KEYWORDS = re.compile("panel|test|function|results|summary", re.IGNORECASE)
+
+
+def _delimited_section(raw: str) -> dict | None:
+  content = raw.strip()
+  if not content:
+    return None
+
+  first_line = content.split("\n", 1)[0].strip()
+  title = "Medical Finding"
+  if ":" in first_line:
+    title = first_line.split(":")[0]
+  elif len(first_line) < 100:
+    title = first_line
+  return {"title": title, "content": content}
+
+
+def _is_header(line: str) -> bool:
+  return (
+      len(line) < 100
+      and (line.endswith(":") or line.isupper() or _HEADER_KEYWORDS.search(line) is not None)
+      and not line.startswith("•")
+      and not line.startswith("-")
+  )
+
+
+class SectionParser:
+  """
+  Split an LLM summary into sections while it is still streaming.
+
+  `feed` takes the next chunk of text and returns the sections completed by
+  it: a section is finished as soon as the delimiter after it arrives, even
+  when the delimiter is split across chunks. `close` returns whatever is
+  left. If the summary never contains a delimiter, the header heuristics
+  are applied line by line as text arrives, but those sections are only
+  returned by `close` since a delimiter could still turn up.
+  """
+
+  def __init__(self):
+    self.delimited = False
+    self._parts = []
+    self._tail = ""
+    # Fallback state, dropped once a delimiter is seen
+    self._partial = []
+    self._title = "Introduction"
+    self._content = []
+    self._fallback = []
+
+  def feed(self, text: str) -> list[dict]:
+    if not text:
+      return []
+    if not self.delimited:
+      self._feed_lines(text)
+
+    text = self._tail + text
+    sections = []
+    start = 0
+    while True:
+      found = text.find(SECTION_DELIMITER, start)
+      if found < 0:
+        break
+      self._parts.append(text[start:found])
+      self._finish_section(sections)
+      start = found + len(SECTION_DELIMITER)
+      if not self.delimited:
+        self.delimited = True
+        self._partial, self._content, self._fallback = [], [], []
+
+    # Hold back just enough to recognise a delimiter split across chunks
+    keep = max(start, len(text) - len(SECTION_DELIMITER) + 1)
+    self._parts.append(text[start:keep])
+    self._tail = text[keep:]
+    return sections
+
+  def close(self) -> list[dict]:
+    self._parts.append(self._tail)
+    self._tail = ""
+
+    if self.delimited:
+      sections = []
+      self._finish_section(sections)
+      return sections
+
+    self._add_line("".join(self._partial))
+    self._partial = []
+    if self._content:
+      self._fallback.append({"title": self._title, "content": "".join(self._content)})
+      self._content = []
+    return self._fallback
+
+  def _finish_section(self, sections: list):
+    section = _delimited_section("".join(self._parts))
+    self._parts = []
+    if section is not None:
+      sections.append(section)
+
+  def _feed_lines(self, text: str):
+    pieces = text.split("\n")
+    if len(pieces) == 1:
+      self._partial.append(text)
+      return
+    self._partial.append(pieces[0])
+    pieces[0] = "".join(self._partial)
+    self._partial = [pieces.pop()]
+    for line in pieces:
+      self._add_line(line)
+
+  def _add_line(self, line: str):
+    line = line.strip()
+    if not line:
+      return
+    if _is_header(line) and self._content:
+      self._fallback.append({"title": self._title, "content": "".join(self._content)})
+      self._title = line.rstrip(":")
+      self._content = []
+    else:
+      self._content.append(line + "\n")
+
+
+def parse_sections(summary_text: str) -> list[dict]:
+  with phase("parse_sections"):
+    parser = SectionParser()
+    sections = parser.feed(summary_text) + parser.close()
+
+  log(
+      "Parsed summary",
+      chars=len(summary_text),
+      sections=len(sections),
+      parser="delimited" if parser.delimited else "fallback",
+  )
+  return sections
+
+
+class LiveSections:
+  """
+  Sections of a report that may still be being summarised. Readers wait in
+  `wait_for` until the section they want is parsed or the report finishes.
+  """
+
+  def __init__(self):
+    self.sections = []
+    self.done = False
+    self.error = None
+    self._changed = asyncio.Event()
+
+  def extend(self, sections: list[dict]):
+    if sections:
+      self.sections.extend(sections)
+      self._wake()
+
+  def finish(self, error: str | None = None):
+    self.done = True
+    self.error = error
+    self._wake()
+
+  async def wait_for(self, index: int) -> dict | None:
+    while index >= len(self.sections) and not self.done:
+      await self._changed.wait()
+    return self.sections[index] if index < len(self.sections) else None
+
+  def _wake(self):
+    # Wake every waiter, then hand new waiters a fresh event
+    self._changed.set()
+    self._changed = asyncio.Event()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+
+PREFETCH_AHEAD = int(os.environ.get("PREFETCH_AHEAD", "2"))
+PREFETCH_CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", "2"))
+
+# Emotions whose prompts differ only slightly share a bucket; a prefetched
+# explanation is reused as long as the patient stays in the same bucket.
+EMOTION_BUCKETS = {
+    "sad": "distressed",
+    "fearful": "distressed",
+    "angry": "distressed",
+    "disgusted": "distressed",
+    "surprised": "neutral",
+    "neutral": "neutral",
+    "happy": "positive",
+}
+
+_stats = {"hits": 0, "misses": 0, "invalidated": 0, "wasted": 0}
+
+
+def emotion_bucket(emotion: str) -> str:
+  return EMOTION_BUCKETS.get((emotion or "neutral").lower(), "neutral")
+
+
+def prefetch_stats() -> dict:
+  served = _stats["hits"] + _stats["misses"]
+  return {
+      **_stats,
+      "hit_rate": round(_stats["hits"] / served, 3) if served else 0.0,
+  }
+
+
+class SectionPrefetcher:
+  """
+  Generates upcoming comfort_stream sections in the background.
+
+  `generate(index, emotion)` produces the explanation for one section.
+  `schedule` keeps the next `ahead` sections in flight; `take` hands over the
+  task for a section if it was prepared for a compatible emotion.
+  """
+
+  def __init__(self, generate, ahead: int = PREFETCH_AHEAD, concurrency: int = PREFETCH_CONCURRENCY):
+    self._generate = generate
+    self.ahead = ahead
+    self._semaphore = asyncio.Semaphore(concurrency)
+    self._pending = {}
+
+  def schedule(self, start: int, total: int, emotion: str):
+    bucket = emotion_bucket(emotion)
+    for index in range(start, min(start + self.ahead, total)):
+      entry = self._pending.get(index)
+      if entry is not None:
+        if entry[0] == bucket:
+          continue
+        self._discard(index)
+        _stats["invalidated"] += 1
+      task = asyncio.create_task(self._run(index, emotion))
+      self._pending[index] = (bucket, task)
+
+  async def _run(self, index: int, emotion: str) -> str:
+    async with self._semaphore:
+      return await self._generate(index, emotion)
+
+  def take(self, index: int, emotion: str) -> asyncio.Task | None:
+    entry = self._pending.get(index)
+    if entry is None:
+      _stats["misses"] += 1
+      return None
+
+    if entry[0] != emotion_bucket(emotion):
+      self._discard(index)
+      _stats["invalidated"] += 1
+      _stats["misses"] += 1
+      return None
+
+    del self._pending[index]
+    _stats["hits"] += 1
+    return entry[1]
+
+  def _discard(self, index: int):
+    _, task = self._pending.pop(index)
+    if task.done() and not task.cancelled():
+      task.exception()
+    task.cancel()
+    _stats["wasted"] += 1
+
+  def cancel_all(self):
+    for index in list(self._pending):
+      self._discard(index)
@@ -0,0 +1,128 @@
+import json
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+
+
+# "memory" keeps sessions in this process; "sqlite" shares them between
+# uvicorn workers through SESSION_STORE_PATH.
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH", "sessions.sqlite")
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", "1800"))
+PURGE_INTERVAL_SECONDS = 60.0
+
+
+class SessionStore(ABC):
+  """
+  Interface for comfort_stream session state.
+
+  State is a JSON-serialisable dict. Sessions that have not been saved for
+  `ttl` seconds are treated as gone.
+  """
+
+  def __init__(self, ttl: float = SESSION_TTL_SECONDS):
+    self.ttl = ttl
+    self._last_purge = 0.0
+
+  @abstractmethod
+  def get(self, session_id: str) -> dict | None:
+    ...
+
+  @abstractmethod
+  def save(self, session_id: str, state: dict):
+    ...
+
+  @abstractmethod
+  def delete(self, session_id: str):
+    ...
+
+  @abstractmethod
+  def purge_expired(self):
+    ...
+
+  def _maybe_purge(self):
+    now = time.time()
+    if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+      self._last_purge = now
+      self.purge_expired()
+
+
+class MemorySessionStore(SessionStore):
+  def __init__(self, ttl: float = SESSION_TTL_SECONDS):
+    super().__init__(ttl)
+    self._sessions = {}
+
+  def get(self, session_id: str) -> dict | None:
+    entry = self._sessions.get(session_id)
+    if entry is None or time.time() - entry[0] >= self.ttl:
+      return None
+    return entry[1]
+
+  def save(self, session_id: str, state: dict):
+    self._sessions[session_id] = (time.time(), state)
+    self._maybe_purge()
+
+  def delete(self, session_id: str):
+    self._sessions.pop(session_id, None)
+
+  def purge_expired(self):
+    cutoff = time.time() - self.ttl
+    for session_id, (updated, _) in list(self._sessions.items()):
+      if updated < cutoff:
+        del self._sessions[session_id]
+
+
+class SQLiteSessionStore(SessionStore):
+  """
+  Session store shared by every worker on the host via a WAL-mode SQLite file.
+  """
+
+  def __init__(self, path: str = SESSION_STORE_PATH, ttl: float = SESSION_TTL_SECONDS):
+    super().__init__(ttl)
+    self._lock = threading.Lock()
+    self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+    self._db.execute("PRAGMA journal_mode=WAL")
+    self._db.execute(
+        "CREATE TABLE IF NOT EXISTS sessions "
+        "(id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)"
+    )
+    self._db.commit()
+
+  def get(self, session_id: str) -> dict | None:
+    with self._lock:
+      row = self._db.execute(
+          "SELECT state FROM sessions WHERE id = ? AND updated >= ?",
+          (session_id, time.time() - self.ttl),
+      ).fetchone()
+    return json.loads(row[0]) if row else None
+
+  def save(self, session_id: str, state: dict):
+    with self._lock:
+      self._db.execute(
+          "INSERT OR REPLACE INTO sessions (id, state, updated) VALUES (?, ?, ?)",
+          (session_id, json.dumps(state), time.time()),
+      )
+      self._db.commit()
+    self._maybe_purge()
+
+  def delete(self, session_id: str):
+    with self._lock:
+      self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+      self._db.commit()
+
+  def purge_expired(self):
+    with self._lock:
+      self._db.execute(
+          "DELETE FROM sessions WHERE updated < ?", (time.time() - self.ttl,)
+      )
+      self._db.commit()
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+  if kind == "sqlite":
+    return SQLiteSessionStore()
+  if kind == "memory":
+    return MemorySessionStore()
+  raise ValueError(f"Unknown SESSION_STORE: {kind}")
@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+
+
+def flight_key(*parts) -> str:
+  digest = hashlib.sha256()
+  for part in parts:
+    digest.update(repr(part).encode() + b"\0")
+  return digest.hexdigest()
+
+
+class _Call:
+  def __init__(self, future: asyncio.Future):
+    self.future = future
+    self.waiters = 0
+
+
+class SingleFlight:
+  """
+  Collapse concurrent identical upstream calls into one.
+
+  `do(key, fn)` runs `fn()` once per key at a time; callers arriving while
+  it is in flight await the same result. The shared call is only cancelled
+  once every caller waiting on it has gone away.
+
+  For leaders that stream their result themselves, `track(key)` marks the
+  key as in flight and returns a future the leader resolves with True/False
+  when done; followers use `wait(key)` and then read the cached result.
+  """
+
+  def __init__(self):
+    self._calls = {}
+    self.calls = 0
+    self.coalesced = 0
+
+  def _register(self, key: str, future: asyncio.Future) -> _Call:
+    call = _Call(future)
+    self._calls[key] = call
+    self.calls += 1
+
+    def forget(_):
+      if self._calls.get(key) is call:
+        del self._calls[key]
+
+    future.add_done_callback(forget)
+    return call
+
+  async def do(self, key: str, fn):
+    call = self._calls.get(key)
+    if call is None:
+      call = self._register(key, asyncio.ensure_future(fn()))
+    else:
+      self.coalesced += 1
+
+    call.waiters += 1
+    try:
+      return await asyncio.shield(call.future)
+    finally:
+      call.waiters -= 1
+      if call.waiters == 0 and not call.future.done():
+        call.future.cancel()
+
+  def track(self, key: str) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    self._register(key, future)
+    return future
+
+  async def wait(self, key: str, timeout: float | None = None) -> bool:
+    """
+    Wait for a tracked leader; True means its result is now cached. False
+    (nothing in flight, leader failed or `timeout` passed) means go upstream.
+    """
+    call = self._calls.get(key)
+    if call is None:
+      return False
+    self.coalesced += 1
+    try:
+      return bool(await asyncio.wait_for(asyncio.shield(call.future), timeout))
+    except Exception:
+      return False
+
+  def stats(self) -> dict:
+    return {
+        "upstream_calls": self.calls,
+        "coalesced": self.coalesced,
+        "in_flight": len(self._calls),
+    }
@@ -0,0 +1,172 @@
+import copy
+import os
+from functools import lru_cache
+
+from pydantic import BaseModel, ValidationError
+
+from bill_analysis import parse_model_json
+from observability import log, phase
+
+
+# LLM repair calls allowed per reply after the local repair fails
+STRUCTURED_REPAIR_ATTEMPTS = int(os.environ.get("STRUCTURED_REPAIR_ATTEMPTS", "1"))
+
+_SCHEMA_TYPES = {
+    "object": "OBJECT",
+    "array": "ARRAY",
+    "string": "STRING",
+    "integer": "INTEGER",
+    "number": "NUMBER",
+    "boolean": "BOOLEAN",
+}
+
+_stats = {}
+
+
+def structured_stats() -> dict:
+  report = {}
+  for name, counts in _stats.items():
+    calls = counts["calls"]
+    report[name] = {
+        **counts,
+        "parse_failure_rate": round((calls - counts["valid"]) / calls, 3) if calls else 0.0,
+        "repair_rate": round(
+            (counts["repaired_locally"] + counts["repaired_by_llm"]) / calls, 3
+        ) if calls else 0.0,
+    }
+  return report
+
+
+def _count(schema: type[BaseModel], outcome: str):
+  counts = _stats.setdefault(schema.__name__, {
+      "calls": 0, "valid": 0, "repaired_locally": 0, "repaired_by_llm": 0, "failed": 0,
+  })
+  counts[outcome] += 1
+
+
+def _convert(node: dict, defs: dict) -> dict:
+  if "$ref" in node:
+    node = defs[node["$ref"].rsplit("/", 1)[-1]]
+
+  if "anyOf" in node:
+    options = [option for option in node["anyOf"] if option.get("type") != "null"]
+    converted = _convert(options[0], defs) if len(options) == 1 else {"type": "STRING"}
+    if len(options) < len(node["anyOf"]):
+      converted["nullable"] = True
+    if "description" in node:
+      converted["description"] = node["description"]
+    return converted
+
+  converted = {}
+  if "enum" in node or "const" in node:
+    converted["type"] = "STRING"
+    converted["enum"] = [str(value) for value in node.get("enum", [node.get("const")])]
+  elif "type" in node:
+    converted["type"] = _SCHEMA_TYPES[node["type"]]
+  if "description" in node:
+    converted["description"] = node["description"]
+  if "properties" in node:
+    converted["properties"] = {
+        name: _convert(value, defs) for name, value in node["properties"].items()
+    }
+    # Ask for every field so replies always have the full shape
+    converted["required"] = list(node["properties"])
+  if "items" in node:
+    converted["items"] = _convert(node["items"], defs)
+  return converted
+
+
+@lru_cache(maxsize=None)
+def _response_schema(schema: type[BaseModel]) -> dict:
+  """
+  Gemini's response_schema is an OpenAPI subset: no $ref, anyOf, title or
+  default, so the Pydantic JSON schema is inlined and rewritten once.
+  """
+  json_schema = schema.model_json_schema()
+  return _convert(json_schema, json_schema.get("$defs", {}))
+
+
+def json_mode(schema: type[BaseModel]) -> dict:
+  """
+  `generation_config` that makes Gemini reply with JSON matching `schema`.
+  """
+  return {
+      "response_mime_type": "application/json",
+      "response_schema": copy.deepcopy(_response_schema(schema)),
+  }
+
+
+def _validate(schema: type[BaseModel], raw: str) -> tuple[BaseModel | None, str | None]:
+  try:
+    return schema.model_validate_json(raw), None
+  except ValidationError as e:
+    return None, str(e)
+
+
+def _repair_locally(schema: type[BaseModel], raw: str) -> BaseModel | None:
+  data = parse_model_json(raw)
+  if data is None:
+    return None
+  try:
+    return schema.model_validate(data)
+  except ValidationError:
+    return None
+
+
+def _repair_prompt(raw: str, error: str) -> str:
+  return (
+      "The JSON below failed validation. Return it corrected so it matches the "
+      "response schema, changing as little as possible and keeping every value "
+      "that is already valid.\n\n"
+      f"VALIDATION ERRORS:\n{error[:2000]}\n\n"
+      f"JSON:\n{raw}"
+  )
+
+
+async def generate_structured(
+    llm,
+    prompt: str,
+    schema: type[BaseModel],
+    *,
+    request=None,
+    repair_attempts: int = STRUCTURED_REPAIR_ATTEMPTS,
+) -> tuple[BaseModel | None, str]:
+  """
+  Generate a reply constrained to `schema` and validate it once.
+
+  An invalid reply is first repaired locally (code fences, prose around
+  the JSON). Failing that, up to `repair_attempts` short calls send only
+  the broken JSON and the validation errors back to the model, which is
+  far cheaper than regenerating from the original prompt.
+
+  Returns (parsed, raw); `parsed` is None if every repair failed.
+  """
+  _count(schema, "calls")
+  raw = await llm.generate(prompt, request=request, generation_config=json_mode(schema))
+  with phase("json_validation"):
+    parsed, error = _validate(schema, raw)
+    if parsed is None:
+      repaired_locally = _repair_locally(schema, raw)
+  if parsed is not None:
+    _count(schema, "valid")
+    return parsed, raw
+
+  if repaired_locally is not None:
+    _count(schema, "repaired_locally")
+    return repaired_locally, raw
+
+  with phase("json_repair_llm"):
+    for _ in range(repair_attempts):
+      repaired = await llm.generate(
+          _repair_prompt(raw, error), request=request, generation_config=json_mode(schema)
+      )
+      parsed, error = _validate(schema, repaired)
+      if parsed is None:
+        parsed = _repair_locally(schema, repaired)
+      if parsed is not None:
+        _count(schema, "repaired_by_llm")
+        return parsed, repaired
+
+  log("Reply failed validation", schema=schema.__name__, error=error)
+  _count(schema, "failed")
+  return None, raw
@@ -0,0 +1,50 @@
+from bill_analysis import chunk_pages, merge_bill_analyses, parse_model_json
+
+
+def test_pages_are_grouped_without_losing_text():
+  pages = ["a" * 40, "b" * 40, "c" * 40]
+  chunks = chunk_pages(pages, max_chars=100)
+  assert chunks == ["a" * 40 + "\n" + "b" * 40, "c" * 40]
+
+
+def test_oversized_pages_split_on_lines_and_long_lines_are_cut():
+  page = "\n".join(["x" * 30, "y" * 30, "z" * 130])
+  chunks = chunk_pages([page], max_chars=64)
+  assert all(len(chunk) <= 64 for chunk in chunks)
+  assert "".join(chunks).replace("\n", "") == page.replace("\n", "")
+
+
+def issue(snippet: str, codes: list[str], issue_type: str = "duplicate") -> dict:
+  return {"line_snippet": snippet, "codes": codes, "issue_type": issue_type}
+
+
+def test_merge_takes_the_first_value_and_dedupes_issues():
+  merged = merge_bill_analyses([
+      {
+          "high_level_summary": "Page one.",
+          "patient_info": {"name": None, "account_number": "A1"},
+          "bill_info": {"total_amount": ""},
+          "potential_issues": [issue("CBC  x2", ["85025"])],
+      },
+      {
+          "high_level_summary": "Page two.",
+          "patient_info": {"name": "Jane Doe", "account_number": "B2"},
+          "bill_info": {"total_amount": "561.00"},
+          "potential_issues": [
+              issue("cbc x2", ["85025"]),
+              issue("cbc x2", ["85025"], "upcoding"),
+              "not an issue",
+          ],
+      },
+  ])
+  assert merged["high_level_summary"] == "Page one. Page two."
+  assert merged["patient_info"] == {"name": "Jane Doe", "account_number": "A1"}
+  assert merged["provider_info"] == {}
+  assert merged["bill_info"] == {"total_amount": "561.00"}
+  assert [item["issue_type"] for item in merged["potential_issues"]] == ["duplicate", "upcoding"]
+
+
+def test_model_json_is_recovered_from_fences_and_prose():
+  assert parse_model_json('```json\n{"a": 1}\n```') == {"a": 1}
+  assert parse_model_json('Here you go: {"a": 1} Thanks!') == {"a": 1}
+  assert parse_model_json("no json here") is None
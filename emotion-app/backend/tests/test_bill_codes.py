@@ -0,0 +1,31 @@
+from bill_codes import add_local_findings, analyze_bill_lines, build_digest, local_bill_analysis
+
+
+BILL = "\n".join([
+    "03/02/2024 J3490 Unclassified drug, ondansetron 12.50",
+    "03/02/2024 J3490 Unclassified drug, ketorolac 38.00",
+    "03/02/2024 85025 Complete blood count 45.00",
+    "03/02/2024 85025 Complete blood count 45.00",
+])
+
+
+def test_only_exact_duplicates_are_disputable():
+  prepass = analyze_bill_lines(BILL)
+  assert [duplicate["code"] for duplicate in prepass.duplicates] == ["85025"]
+  assert [duplicate["code"] for duplicate in prepass.near_duplicates] == ["J3490"]
+
+  issues = local_bill_analysis(prepass)["potential_issues"]
+  by_code = {issue["codes"][0]: issue for issue in issues}
+  assert by_code["85025"]["issue_type"] == "duplicate"
+  assert by_code["85025"]["can_patient_dispute"] is True
+  assert by_code["J3490"]["issue_type"] == "other"
+  assert by_code["J3490"]["can_patient_dispute"] is False
+
+
+def test_near_duplicates_are_left_to_the_llm():
+  prepass = analyze_bill_lines(BILL)
+  analysis = add_local_findings({"potential_issues": []}, prepass)
+  assert [issue["codes"] for issue in analysis["potential_issues"]] == [["85025"]]
+
+  digest = build_digest(prepass)
+  assert "- J3490 on 03/02/2024: 12.50, 38.00" in digest
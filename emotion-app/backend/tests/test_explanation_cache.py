@@ -0,0 +1,92 @@
+import pytest
+
+import result_cache
+from explanation_cache import BAND_SENTENCES, ExplanationCache, fallback_explanation, parse_lab_result
+
+
+def section(result: str, reference: str, title: str = "Platelets") -> dict:
+  return {"title": title, "content": f"Patient's Result: {result}\nReference Range: {reference}"}
+
+
+@pytest.mark.parametrize("result, reference, value, low, high, band", [
+    ("100,000 /uL", "150,000-450,000", "100,000", "150,000", "450,000", "low"),
+    ("1,250 mg/dL", "70-99", "1,250", "70", "99", "high"),
+    ("5.4 mmol/L", "< 5.6", "5.4", None, "5.6", "normal"),
+])
+def test_comma_grouped_values_are_banded(result, reference, value, low, high, band):
+  lab = parse_lab_result(section(result, reference))
+  assert (lab.value, lab.low, lab.high, lab.band) == (value, low, high, band)
+
+
+@pytest.mark.parametrize("result, reference", [
+    ("1,2345 /uL", "150,000-450,000"),
+    ("100,000 /uL", "150,0000-450,000"),
+])
+def test_numbers_cut_mid_way_are_not_banded(result, reference):
+  assert parse_lab_result(section(result, reference)) is None
+
+
+@pytest.mark.parametrize("result, reference, band", [
+    ("100,000 /uL", "150,000-450,000 /uL", "low"),
+    ("1,250 mg/dL", "70-99 mg/dL", "high"),
+    ("250,000 /uL", "150,000-450,000 /uL", "normal"),
+])
+def test_fallback_states_the_band_of_comma_grouped_values(result, reference, band):
+  text = fallback_explanation(section(result, reference))
+  assert f"Your result is {result}" in text
+  assert [name for name, sentence in BAND_SENTENCES.items() if sentence in text] == [band]
+
+
+def test_fallback_says_nothing_about_the_band_of_an_ambiguous_range():
+  text = fallback_explanation(section("95 mg/dL", "Adults 70-99, children 60-100"))
+  assert not any(sentence in text for sentence in BAND_SENTENCES.values())
+
+
+def test_dotted_tokens_are_not_templated():
+  cache = ExplanationCache("v1", path=None)
+  platelets = section("100,000 /uL", "150,000-450,000 /uL")
+  cache.learn(platelets, "neutral", "Your count of 100,000 is measured with kit 2.3.1.")
+  assert cache.stats()["uncacheable"] == 1
+  assert cache.render(platelets, "neutral") is None
+
+
+def test_template_round_trip_fills_in_the_next_patients_values():
+  cache = ExplanationCache("v1", path=None)
+  cache.learn(
+      section("100,000 /uL", "150,000-450,000 /uL"),
+      "neutral",
+      "Your platelets are 100,000, below the 150,000 to 450,000 range.",
+  )
+  assert cache.render(section("120,000 /uL", "150,000-450,000 /uL"), "Neutral") == (
+      "Your platelets are 120,000, below the 150,000 to 450,000 range."
+  )
+  # A different band, units or range shape is a different template
+  assert cache.render(section("200,000 /uL", "150,000-450,000 /uL"), "neutral") is None
+  assert cache.render(section("120,000 /mL", "150,000-450,000 /uL"), "neutral") is None
+  assert cache.render(section("120,000 /uL", "> 150,000 /uL"), "neutral") is None
+
+
+def test_templates_are_not_shared_between_emotions():
+  cache = ExplanationCache("v1", path=None)
+  cache.learn(section("5.4 mmol/L", "< 5.6"), "fearful", "I sense this might be making you anxious. It is 5.4.")
+  assert cache.render(section("5.1 mmol/L", "< 5.6"), "fearful") == (
+      "I sense this might be making you anxious. It is 5.1."
+  )
+  assert cache.render(section("5.1 mmol/L", "< 5.6"), "angry") is None
+
+
+def test_templates_expire_and_are_evicted_least_recently_used(monkeypatch):
+  now = [1000.0]
+  monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+  cache = ExplanationCache("v1", max_entries=2, ttl=60, path=None)
+  tests = [section("5 u", "< 9", title=name) for name in ("A", "B", "C")]
+  for lab in tests[:2]:
+    cache.learn(lab, "neutral", "It is 5.")
+
+  assert cache.render(tests[0], "neutral") == "It is 5."
+  cache.learn(tests[2], "neutral", "It is 5.")
+  assert cache.render(tests[1], "neutral") is None
+  assert cache.render(tests[0], "neutral") == "It is 5."
+
+  now[0] += 61
+  assert cache.render(tests[0], "neutral") is None
@@ -0,0 +1,38 @@
+import asyncio
+
+from health_probe import HealthProber
+
+
+async def healthy():
+  pass
+
+
+async def broken():
+  raise RuntimeError("Missing FISH_AUDIO_API_KEY in environment")
+
+
+def probe_all(prober: HealthProber) -> dict:
+  async def scenario():
+    for name, check in prober.checks.items():
+      await prober.probe(name, check)
+    return prober.snapshot()
+
+  return asyncio.run(scenario())
+
+
+def test_not_ready_until_checked_and_while_a_check_fails():
+  prober = HealthProber({"gemini": healthy, "tts": broken})
+  assert prober.snapshot()["ready"] is False
+
+  snapshot = probe_all(prober)
+  assert snapshot["ready"] is False
+  assert snapshot["upstreams"]["tts"]["error"] == "Missing FISH_AUDIO_API_KEY in environment"
+  assert snapshot["upstreams"]["tts"]["failures"] == 1
+
+
+def test_optional_checks_are_reported_but_do_not_gate_readiness():
+  snapshot = probe_all(HealthProber({"gemini": healthy, "tts": broken}, optional=("tts",)))
+  assert snapshot["ready"] is True
+  assert snapshot["upstreams"]["tts"]["ok"] is False
+
+  assert probe_all(HealthProber({"tts": healthy}, optional=("tts",)))["ready"] is False
@@ -0,0 +1,82 @@
+import asyncio
+
+from job_queue import JobQueue
+
+
+async def staged(data, job, on_stage):
+  for stage in ("extracting", "redacting", "analyzing"):
+    on_stage(stage)
+    await asyncio.sleep(0)
+  return {"data": data}
+
+
+def test_slow_listener_sees_every_stage_and_the_result():
+  async def scenario():
+    queue = JobQueue({"report": staged}, workers=1, store_path=None)
+    job = await queue.submit("report", "a.pdf", "payload", client_id="c")
+    seen = []
+    async for record in queue.events(job.id):
+      seen.append(record["status"])
+      # Slower than the job, so it finishes while a frame is being written
+      await asyncio.sleep(0.01)
+    await queue.stop()
+    return seen, record
+
+  seen, record = asyncio.run(scenario())
+  assert seen == ["queued", "extracting", "redacting", "analyzing", "done"]
+  assert record["result"] == {"data": "payload"}
+
+
+def test_finished_job_yields_its_final_record_once():
+  async def scenario():
+    queue = JobQueue({"report": staged}, workers=1, store_path=None)
+    job = await queue.submit("report", "a.pdf", "payload", client_id="c")
+    while queue.get(job.id)["status"] != "done":
+      await asyncio.sleep(0.01)
+    records = [record async for record in queue.events(job.id)]
+    missing = [record async for record in queue.events("nope")]
+    await queue.stop()
+    return records, missing
+
+  records, missing = asyncio.run(scenario())
+  assert [record["status"] for record in records] == ["done"]
+  assert missing == []
+
+
+def test_failed_handler_ends_the_stream_with_an_error():
+  async def broken(data, job, on_stage):
+    on_stage("extracting")
+    raise RuntimeError("bad pdf")
+
+  async def scenario():
+    queue = JobQueue({"bill": broken}, workers=1, store_path=None)
+    job = await queue.submit("bill", "b.pdf", None, client_id="c")
+    records = [record async for record in queue.events(job.id)]
+    await queue.stop()
+    return records
+
+  records = asyncio.run(scenario())
+  assert records[-1]["status"] == "error" and records[-1]["error"] == "bad pdf"
+
+
+def test_clients_take_turns_within_a_priority():
+  async def scenario():
+    order = []
+
+    async def record_order(data, job, on_stage):
+      order.append(data)
+      return {}
+
+    queue = JobQueue({"bill": record_order}, workers=1, store_path=None)
+    for index in range(3):
+      await queue.submit("bill", "b.pdf", f"busy-{index}", client_id="busy")
+    await queue.submit("bill", "b.pdf", "other", client_id="other")
+    await queue.submit("bill", "b.pdf", "urgent", client_id="late", priority="high")
+    while len(order) < 5:
+      await asyncio.sleep(0.01)
+    await queue.stop()
+    return order
+
+  order = asyncio.run(scenario())
+  assert order.index("urgent") <= 1
+  assert order.index("other") < order.index("busy-2")
@@ -0,0 +1,19 @@
+from json_stream import JSONObjectStream
+
+
+def test_objects_are_returned_as_soon_as_they_close():
+  stream = JSONObjectStream()
+  text = '```json\n{"turns": [{"speaker": "rep", "text": "Hi {there}"}, {"speaker": "user", "text": "a \\"quote\\""}]}\n```'
+  found = []
+  for index in range(0, len(text), 7):
+    found.extend(stream.feed(text[index:index + 7]))
+  assert found == [
+      {"speaker": "rep", "text": "Hi {there}"},
+      {"speaker": "user", "text": 'a "quote"'},
+  ]
+
+
+def test_malformed_object_is_skipped():
+  stream = JSONObjectStream()
+  found = stream.feed('{"turns": [{"speaker": rep}, {"speaker": "user", "text": "ok"}]}')
+  assert found == [{"speaker": "user", "text": "ok"}]
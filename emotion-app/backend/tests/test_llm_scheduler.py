@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from llm_scheduler import LLMOverloaded, LLMScheduler
+
+LIMITS = {"interactive": 8, "standard": 8, "background": 1}
+WAITS = {"interactive": 5.0, "standard": 5.0, "background": 5.0}
+
+
+def make_scheduler(**options) -> LLMScheduler:
+  settings = {"rate_per_minute": 0, "reserved": 0, "queue_limits": LIMITS, "max_wait": WAITS}
+  settings.update(options)
+  return LLMScheduler(1, **settings)
+
+
+def test_waiting_calls_start_highest_priority_first():
+  async def scenario():
+    scheduler = make_scheduler()
+    started = []
+
+    async def call(name, priority):
+      async with scheduler.slot(priority):
+        started.append(name)
+        await asyncio.sleep(0.01)
+
+    await scheduler.acquire("standard")
+    tasks = [
+        asyncio.create_task(call("background", "background")),
+        asyncio.create_task(call("standard", "standard")),
+        asyncio.create_task(call("interactive", "interactive")),
+    ]
+    await asyncio.sleep(0)
+    scheduler.release(0.01)
+    await asyncio.gather(*tasks)
+    return started
+
+  assert asyncio.run(scenario()) == ["interactive", "standard", "background"]
+
+
+def test_reserved_slots_are_kept_for_interactive_calls():
+  async def scenario():
+    scheduler = LLMScheduler(2, rate_per_minute=0, reserved=1, queue_limits=LIMITS, max_wait=WAITS)
+    await scheduler.acquire("standard")
+    blocked = asyncio.create_task(scheduler.acquire("standard"))
+    await asyncio.sleep(0)
+    await asyncio.wait_for(scheduler.acquire("interactive"), 1)
+    still_waiting = not blocked.done()
+    blocked.cancel()
+    return still_waiting, scheduler.stats()["running"]
+
+  assert asyncio.run(scenario()) == (True, 2)
+
+
+def test_full_queue_is_shed_with_retry_after():
+  async def scenario():
+    scheduler = make_scheduler()
+    await scheduler.acquire("background")
+    waiting = asyncio.create_task(scheduler.acquire("background"))
+    await asyncio.sleep(0)
+    with pytest.raises(LLMOverloaded) as shed:
+      await scheduler.acquire("background")
+    waiting.cancel()
+    return shed.value.retry_after, scheduler.stats()["classes"]["background"]["shed"]
+
+  retry_after, shed = asyncio.run(scenario())
+  assert retry_after >= 1 and shed == 1
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+  async def scenario():
+    scheduler = make_scheduler()
+    await scheduler.acquire("standard")
+    waiter = asyncio.create_task(scheduler.acquire("standard"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    scheduler.release(0.01)
+    await asyncio.wait_for(scheduler.acquire("standard"), 1)
+    return scheduler.stats()["running"]
+
+  assert asyncio.run(scenario()) == 1
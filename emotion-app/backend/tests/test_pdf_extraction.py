@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+import pdf_extraction
+from benchmarks.samples import make_pdf
+from pdf_extraction import extract_pdf_text
+
+
+PAGES = [f"Page {number} line of report text" for number in range(1, 13)]
+
+
+@pytest.fixture(scope="module")
+def pdf():
+  yield make_pdf(PAGES, lines_per_page=1)
+  pdf_extraction.shutdown_pool()
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+  monkeypatch.setattr(pdf_extraction, "PDF_PAGES_PER_TASK", 2)
+  monkeypatch.setattr(pdf_extraction, "PDF_WORKERS", 2)
+
+
+def test_pages_come_back_in_order(pdf, small_batches):
+  result = asyncio.run(extract_pdf_text(pdf))
+  assert [page.strip() for page in result.pages] == PAGES
+  assert result.page_count == result.pages_read == len(PAGES)
+
+
+def test_extraction_stops_once_the_budget_is_covered(pdf, small_batches):
+  result = asyncio.run(extract_pdf_text(pdf, max_chars=40))
+  assert result.page_count == len(PAGES)
+  # Two pages cover 40 characters; later batches are never scheduled
+  assert result.pages_read <= 4
+  assert len(result.text) == 40 and result.text.startswith("Page 1 ")
@@ -0,0 +1,49 @@
+import pytest
+
+from phi_redaction import PHIRedactor, names_from, strip_patient_identifiers
+
+
+@pytest.mark.parametrize("text", [
+    "QRS duration: 98 ms Normal range",
+    "PR interval 160 ms Normal",
+    "Result: 5 Dr Jones",
+    "Units 100 250 1000.00",
+    "01/05/2024 85025 CBC with differential 45.00",
+    "Hepatitis B. Surface Antigen",
+    "Hepatitis B. Surface antigen",
+    "Vitamin D. Normal",
+    "Protein C. Activity 95%",
+])
+def test_clinical_and_numeric_text_is_left_alone(text):
+  assert PHIRedactor().redact(text) == text
+  assert strip_patient_identifiers(text) == text
+
+
+def test_identifiers_become_tokens_and_are_restored():
+  redactor = PHIRedactor()
+  text = (
+      "Patient: Jane Doe  MRN: A1234567  DOB: 03/14/1961\n"
+      "Seen by Dr. Smith. Call (217) 555-0100 or 217-555-0101.\n"
+      "500 Hospital Way, Springfield IL 62704"
+  )
+  redacted = redactor.redact(text)
+  for value in ("Jane Doe", "A1234567", "03/14/1961", "Smith", "555-0100", "555-0101", "Hospital Way", "62704"):
+    assert value not in redacted
+  assert redactor.restore(redacted) == text
+
+
+def test_name_with_middle_initial_is_redacted():
+  redacted = PHIRedactor().redact("Reviewed with Jane Q. Public today")
+  assert "Jane Q. Public" not in redacted and "[NAME_1]" in redacted
+
+
+def test_patient_info_fields_share_tokens_with_free_text():
+  info = {"name": "Jane Doe", "dob": "1961-03-14", "account_number": "00442211", "plan": "Gold"}
+  redactor = PHIRedactor(names_from(info))
+  fields = redactor.redact_fields(info)
+  note = redactor.redact("Jane Doe asked about account 00442211")
+
+  assert fields["name"] == "[NAME_1]" and fields["dob"] == "[DOB_1]"
+  assert fields["account_number"] == "[ACCOUNT_1]" and fields["plan"] == "Gold"
+  assert "[NAME_1]" in note
+  assert redactor.restore(fields) == info
@@ -0,0 +1,46 @@
+import hashlib
+
+import result_cache
+from result_cache import ResultCache, cache_key, digest_key
+
+
+def test_key_covers_the_bytes_and_every_part():
+  key = cache_key(b"%PDF report", "report-v1", "gemini")
+  assert key == cache_key(b"%PDF report", "report-v1", "gemini")
+  assert key != cache_key(b"%PDF other", "report-v1", "gemini")
+  assert key != cache_key(b"%PDF report", "report-v2", "gemini")
+  assert key != cache_key(b"%PDF report", "report-v1", "gemini", "chunked")
+  # Parts are delimited, so they cannot run into each other
+  assert cache_key(b"", "ab", "c") != cache_key(b"", "a", "bc")
+
+
+def test_incremental_digest_matches_and_is_left_unchanged():
+  digest = hashlib.sha256()
+  for chunk in (b"%PDF ", b"rep", b"ort"):
+    digest.update(chunk)
+  assert digest_key(digest, "v1") == cache_key(b"%PDF report", "v1")
+  assert digest_key(digest, "v1") == digest_key(digest, "v1")
+
+
+def test_memory_tier_is_lru_and_expires(monkeypatch):
+  now = [1000.0]
+  monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+  cache = ResultCache(max_entries=2, ttl=60, path=None)
+  cache.set("a", {"n": 1})
+  cache.set("b", {"n": 2})
+  assert cache.get("a") == {"n": 1}
+  cache.set("c", {"n": 3})
+  assert cache.get("b") is None and cache.get("a") == {"n": 1}
+
+  now[0] += 61
+  assert cache.get("a") is None
+  assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+  path = str(tmp_path / "results.sqlite")
+  ResultCache(path=path).set("key", {"structured": True})
+
+  other = ResultCache(path=path)
+  assert other.get("key") == {"structured": True}
+  assert other.stats()["disk_hits"] == 1
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from section_deadline import DeadlineExceeded, LatencyTracker, hedged
+
+
+async def answer(value, delay, fail=False):
+  await asyncio.sleep(delay)
+  if fail:
+    raise RuntimeError(value)
+  return value
+
+
+def test_fast_first_attempt_is_not_hedged():
+  started = []
+
+  def hedge():
+    started.append(True)
+    return answer("hedge", 0)
+
+  result = asyncio.run(hedged(answer("first", 0.01), hedge, 0.5, 1))
+  assert result == ("first", False) and not started
+
+
+def test_slow_first_attempt_loses_to_the_hedge():
+  result = asyncio.run(hedged(answer("first", 1), lambda: answer("hedge", 0.01), 0.05, 2))
+  assert result == ("hedge", True)
+
+
+def test_failed_first_attempt_is_retried_at_once():
+  result = asyncio.run(hedged(answer("first", 0, fail=True), lambda: answer("retry", 0), 10, 1))
+  assert result == ("retry", True)
+
+
+def test_deadline_and_total_failure_raise():
+  with pytest.raises(DeadlineExceeded):
+    asyncio.run(hedged(answer("first", 1), lambda: answer("hedge", 1), 0.01, 0.05))
+  with pytest.raises(RuntimeError, match="hedge"):
+    asyncio.run(hedged(answer("first", 0, fail=True), lambda: answer("hedge", 0, fail=True), 1, 1))
+
+
+def test_hedge_delay_follows_the_percentile_once_warm():
+  tracker = LatencyTracker(percentile=0.9, initial=3.0, min_samples=10, window=100)
+  assert tracker.hedge_after() == 3.0
+  for index in range(100):
+    tracker.record(index / 100)
+  assert tracker.hedge_after() == pytest.approx(0.9)
@@ -0,0 +1,39 @@
+import asyncio
+
+from section_parser import LiveSections, SectionParser
+
+
+SUMMARY = (
+    "Intro text\n###SECTION###\nHemoglobin: carries oxygen\nPatient's Result: 13.2 g/dL\n"
+    "###SECTION###\nGlucose: blood sugar\nPatient's Result: 112 mg/dL\n"
+)
+
+
+def test_sections_finish_when_the_next_delimiter_arrives_even_split():
+  parser = SectionParser()
+  finished = []
+  for index in range(0, len(SUMMARY), 5):
+    finished.append([section["title"] for section in parser.feed(SUMMARY[index:index + 5])])
+  titles = [title for batch in finished for title in batch]
+  assert titles == ["Intro text", "Hemoglobin"]
+  assert [section["title"] for section in parser.close()] == ["Glucose"]
+
+
+def test_undelimited_summary_falls_back_to_headers():
+  parser = SectionParser()
+  sections = parser.feed("Here is your summary.\nCOMPLETE BLOOD COUNT\nAll normal.\nLIPID PANEL\nLDL is high.\n") + parser.close()
+  assert not parser.delimited
+  assert [section["title"] for section in sections] == ["Introduction", "COMPLETE BLOOD COUNT", "LIPID PANEL"]
+
+
+def test_live_sections_wake_waiters():
+  async def scenario():
+    live = LiveSections()
+    first = asyncio.create_task(live.wait_for(0))
+    beyond = asyncio.create_task(live.wait_for(1))
+    await asyncio.sleep(0)
+    live.extend([{"title": "A", "content": "a"}])
+    live.finish()
+    return await first, await beyond
+
+  assert asyncio.run(scenario()) == ({"title": "A", "content": "a"}, None)
@@ -0,0 +1,36 @@
+import pytest
+
+from session_store import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+def test_incomplete_backend_fails_when_instantiated():
+  class NoDelete(SessionStore):
+    def get(self, session_id):
+      return None
+
+    def save(self, session_id, state):
+      pass
+
+    def purge_expired(self):
+      pass
+
+  with pytest.raises(TypeError):
+    NoDelete()
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: MemorySessionStore(),
+    lambda tmp_path: SQLiteSessionStore(str(tmp_path / "sessions.sqlite")),
+])
+def test_sessions_round_trip_and_delete(tmp_path, make_store):
+  store = make_store(tmp_path)
+  store.save("a", {"current_section": 2, "sections": [{"title": "T", "content": "c"}]})
+  assert store.get("a")["current_section"] == 2
+  store.delete("a")
+  assert store.get("a") is None
+
+
+def test_expired_sessions_are_gone():
+  store = MemorySessionStore(ttl=0)
+  store.save("a", {})
+  assert store.get("a") is None
@@ -0,0 +1,50 @@
+import asyncio
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call():
+  async def scenario():
+    flights = SingleFlight()
+    calls = []
+
+    async def upstream():
+      calls.append(True)
+      await asyncio.sleep(0.01)
+      return "answer"
+
+    results = await asyncio.gather(*(flights.do("key", upstream) for _ in range(5)))
+    return results, len(calls), flights.stats()
+
+  results, calls, stats = asyncio.run(scenario())
+  assert results == ["answer"] * 5 and calls == 1
+  assert stats == {"upstream_calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_shared_call_survives_until_the_last_caller_leaves():
+  async def scenario():
+    flights = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def upstream():
+      try:
+        await asyncio.sleep(0.05)
+        return "answer"
+      except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+    first = asyncio.create_task(flights.do("key", upstream))
+    second = asyncio.create_task(flights.do("key", upstream))
+    await asyncio.sleep(0)
+    first.cancel()
+    answer = await second
+    survived = not cancelled.is_set()
+
+    third = asyncio.create_task(flights.do("other", upstream))
+    await asyncio.sleep(0)
+    third.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    return answer, survived, cancelled.is_set()
+
+  assert asyncio.run(scenario()) == ("answer", True, True)
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from schemas import BillAnalysis, CallScript
+from structured_output import generate_structured, json_mode
+
+
+def keys(node, found=None) -> set:
+  found = set() if found is None else found
+  if isinstance(node, dict):
+    found.update(node)
+    for value in node.values():
+      keys(value, found)
+  elif isinstance(node, list):
+    for value in node:
+      keys(value, found)
+  return found
+
+
+def test_schema_is_inlined_into_gemini_types():
+  schema = json_mode(BillAnalysis)["response_schema"]
+  assert not keys(schema) & {"$ref", "$defs", "anyOf", "title", "default"}
+
+  issue = schema["properties"]["potential_issues"]["items"]
+  assert schema["type"] == "OBJECT" and issue["type"] == "OBJECT"
+  assert issue["properties"]["codes"] == {
+      "type": "ARRAY",
+      "items": {"type": "STRING"},
+      "nullable": True,
+      "description": "CPT/ICD/HCPCS codes on the line",
+  }
+  assert issue["properties"]["can_patient_dispute"] == {"type": "BOOLEAN", "nullable": True}
+  assert set(issue["required"]) == set(issue["properties"])
+
+
+def test_literals_become_string_enums_and_configs_are_copies():
+  config = json_mode(CallScript)
+  speaker = config["response_schema"]["properties"]["turns"]["items"]["properties"]["speaker"]
+  assert speaker == {"type": "STRING", "enum": ["rep", "user"]}
+
+  config["response_schema"]["properties"].clear()
+  assert json_mode(CallScript)["response_schema"]["properties"]
+
+
+class ScriptedLLM:
+  def __init__(self, *replies: str):
+    self.replies = list(replies)
+    self.prompts = []
+
+  async def generate(self, prompt, request=None, generation_config=None):
+    self.prompts.append(prompt)
+    return self.replies.pop(0)
+
+
+TURNS = json.dumps({"turns": [{"speaker": "rep", "text": "Billing, how can I help?"}]})
+
+
+def test_fenced_reply_is_repaired_locally():
+  llm = ScriptedLLM(f"```json\n{TURNS}\n```")
+  script, _ = asyncio.run(generate_structured(llm, "prompt", CallScript))
+  assert script.turns[0].speaker == "rep" and len(llm.prompts) == 1
+
+
+def test_invalid_reply_gets_one_repair_call():
+  llm = ScriptedLLM('{"turns": [{"speaker": "agent"}]}', TURNS)
+  script, raw = asyncio.run(generate_structured(llm, "prompt", CallScript))
+  assert script is not None and raw == TURNS
+  assert "VALIDATION ERRORS" in llm.prompts[1]
+
+  llm = ScriptedLLM("nope", "still nope")
+  assert asyncio.run(generate_structured(llm, "prompt", CallScript)) == (None, "nope")
@@ -0,0 +1,39 @@
+from tts_cache import TTSCache, tts_cache_key
+
+
+CALM = {"voice_id": "voice-a", "speed": 0.9}
+
+
+def test_key_ignores_whitespace_but_not_voice_speed_or_model():
+  key = tts_cache_key("Your results  look\nfine.", CALM, "s1")
+  assert key == tts_cache_key(" Your results look fine. ", CALM, "s1")
+  assert key != tts_cache_key("Your results look fine!", CALM, "s1")
+  assert key != tts_cache_key("Your results look fine.", {**CALM, "voice_id": "voice-b"}, "s1")
+  assert key != tts_cache_key("Your results look fine.", {**CALM, "speed": 1.0}, "s1")
+  assert key != tts_cache_key("Your results look fine.", CALM, "s2")
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+  key = tts_cache_key("Hello.", CALM, "s1")
+  TTSCache(directory=str(tmp_path)).put(key, b"mp3 bytes")
+
+  cache = TTSCache(directory=str(tmp_path))
+  assert cache.get(key) == b"mp3 bytes"
+  assert cache.get(tts_cache_key("Goodbye.", CALM, "s1")) is None
+  assert cache.stats()["disk_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_aborted_stream_is_not_stored(tmp_path):
+  cache = TTSCache(directory=str(tmp_path))
+  writer = cache.writer("key")
+  writer.write(b"half a clip")
+  writer.discard()
+  assert cache.get("key") is None
+  assert not list(tmp_path.iterdir())
+
+
+def test_memory_tier_is_bounded_in_bytes():
+  cache = TTSCache(directory=None, memory_max_bytes=10)
+  cache.put("a", b"123456")
+  cache.put("b", b"123456")
+  assert cache.get_memory("a") is None and cache.get_memory("b") == b"123456"
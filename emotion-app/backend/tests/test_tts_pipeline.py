@@ -0,0 +1,25 @@
+import asyncio
+
+from tts_pipeline import render_in_order, split_sentences
+
+
+def test_closing_quotes_and_brackets_stay_with_their_sentence():
+  text = 'She said "rest now." (Then call us.) Done? Yes!'
+  assert split_sentences(text, min_chars=1) == ['She said "rest now."', "(Then call us.)", "Done?", "Yes!"]
+
+
+def test_short_fragments_are_merged():
+  assert split_sentences("Hi. This sentence is long enough on its own.", min_chars=20) == [
+      "Hi. This sentence is long enough on its own."
+  ]
+
+
+def test_segments_render_in_order():
+  async def render(segment):
+    await asyncio.sleep(0.01 if segment == "a" else 0)
+    return segment.upper()
+
+  async def scenario():
+    return [audio async for audio in render_in_order(["a", "b", "c"], render, concurrency=2)]
+
+  assert asyncio.run(scenario()) == ["A", "B", "C"]
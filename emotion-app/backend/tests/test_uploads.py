@@ -0,0 +1,95 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import pdf_extraction
+from benchmarks.samples import make_pdf
+from pdf_extraction import PageLimitExceeded, extract_pdf_text
+from result_cache import cache_key
+from uploads import Upload, UploadLimitMiddleware, UploadRejected, receive_upload
+
+
+async def echo_length(request):
+  return PlainTextResponse(str(len(await request.body())))
+
+
+def limited_client(limit: int, overhead: int) -> TestClient:
+  app = Starlette(routes=[Route("/upload", echo_length, methods=["POST"])])
+  app.add_middleware(UploadLimitMiddleware, limits={"/upload": limit}, overhead=overhead)
+  return TestClient(app)
+
+
+def test_limit_allows_for_overhead_and_reports_the_configured_size():
+  client = limited_client(1024 * 1024, overhead=1024)
+
+  assert client.post("/upload", content=b"x" * (1024 * 1024 + 1000)).text == str(1024 * 1024 + 1000)
+
+  response = client.post("/upload", content=b"x" * (1024 * 1024 + 2048))
+  assert response.status_code == 413
+  assert response.json() == {"error": "Upload is larger than 1 MB"}
+
+
+def test_streamed_body_is_cut_off_at_the_limit():
+  client = limited_client(1024, overhead=0)
+
+  def chunks():
+    for _ in range(8):
+      yield b"x" * 512
+
+  response = client.post("/upload", content=chunks())
+  assert response.status_code == 413
+
+
+def receive(data: bytes, **limits) -> Upload:
+  upload = Upload("scan.pdf", **limits)
+  for start in range(0, len(data), 100):
+    upload.write(data[start:start + 100])
+  upload.finish()
+  return upload
+
+
+def test_small_uploads_stay_in_memory():
+  upload = receive(b"%PDF" + b"x" * 500, spool_bytes=1024)
+  assert upload.source == b"%PDF" + b"x" * 500 and upload.path is None
+  assert upload.cache_key("v1") == cache_key(upload.source, "v1")
+  upload.close()
+
+
+def test_large_uploads_are_spooled_and_removed_on_close():
+  data = b"%PDF" + b"x" * 5000
+  upload = receive(data, spool_bytes=1024)
+  with open(upload.source, "rb") as f:
+    assert f.read() == data
+  assert upload.cache_key("v1") == cache_key(data, "v1")
+  upload.close()
+  assert not os.path.exists(upload.path)
+
+
+def test_oversized_upload_is_rejected_while_streaming():
+  async def scenario():
+    file = UploadFile(io.BytesIO(b"x" * 5000), filename="scan.pdf")
+    await receive_upload(file, max_bytes=4096)
+
+  with pytest.raises(UploadRejected):
+    asyncio.run(scenario())
+
+
+def test_spooled_pdf_is_read_from_disk_within_the_page_limit():
+  pages = [f"Page {number}" for number in range(1, 6)]
+  upload = receive(make_pdf(pages, lines_per_page=1), spool_bytes=256)
+  try:
+    assert upload.path is not None
+    result = asyncio.run(extract_pdf_text(upload.source))
+    assert [page.strip() for page in result.pages] == pages
+    with pytest.raises(PageLimitExceeded):
+      asyncio.run(extract_pdf_text(upload.source, max_pages=4))
+  finally:
+    upload.close()
+    pdf_extraction.shutdown_pool()
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+TTS_CACHE_DIR = os.environ.get(
+    "TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lucidcare-tts")
+)
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+TTS_CACHE_MEMORY_MAX_BYTES = int(os.environ.get("TTS_CACHE_MEMORY_MAX_BYTES", str(32 * 1024 * 1024)))
+# Larger clips only go to disk so a few long letters cannot flush the memory tier
+TTS_CACHE_MEMORY_ITEM_MAX_BYTES = 512 * 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_tts_text(text: str) -> str:
+  return _WHITESPACE.sub(" ", text).strip()
+
+
+def tts_cache_key(text: str, preset: dict, model: str) -> str:
+  digest = hashlib.sha256()
+  for part in (normalize_tts_text(text), preset["voice_id"], str(preset["speed"]), model):
+    digest.update(part.encode() + b"\0")
+  return digest.hexdigest()
+
+
+class TTSCacheWriter:
+  """
+  Tees an audio stream into the cache; nothing is stored unless `commit`
+  is called after the stream finished cleanly.
+  """
+
+  def __init__(self, cache: "TTSCache", key: str):
+    self.cache = cache
+    self.key = key
+    self.size = 0
+    self._memory = []
+    self._file = None
+    if cache.directory:
+      self._file = tempfile.NamedTemporaryFile(
+          dir=cache.directory, suffix=".part", delete=False
+      )
+
+  def write(self, chunk: bytes):
+    self.size += len(chunk)
+    if self._file is not None:
+      self._file.write(chunk)
+    if self._memory is not None:
+      if self.size <= TTS_CACHE_MEMORY_ITEM_MAX_BYTES:
+        self._memory.append(chunk)
+      else:
+        self._memory = None
+
+  def commit(self):
+    if self.size == 0:
+      self.discard()
+      return
+    if self._memory is not None:
+      self.cache.put_memory(self.key, b"".join(self._memory))
+    if self._file is not None:
+      self._file.close()
+      self.cache.adopt_file(self.key, self._file.name, self.size)
+      self._file = None
+
+  def discard(self):
+    if self._file is not None:
+      self._file.close()
+      os.unlink(self._file.name)
+      self._file = None
+
+
+class TTSCache:
+  """
+  Content-addressed MP3 cache for /tts.
+
+  A byte-bounded LRU in memory sits in front of a directory of `<key>.mp3`
+  files that is trimmed oldest-first (by mtime, refreshed on every hit)
+  once it grows past `max_bytes`.
+  """
+
+  def __init__(
+      self,
+      directory: str | None = TTS_CACHE_DIR,
+      max_bytes: int = TTS_CACHE_MAX_BYTES,
+      memory_max_bytes: int = TTS_CACHE_MEMORY_MAX_BYTES,
+  ):
+    self.directory = directory or None
+    self.max_bytes = max_bytes
+    self.memory_max_bytes = memory_max_bytes
+    self._memory = OrderedDict()
+    self._memory_bytes = 0
+    self._disk_bytes = 0
+    self._lock = threading.Lock()
+    self.memory_hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+
+    if self.directory:
+      os.makedirs(self.directory, exist_ok=True)
+      for entry in os.scandir(self.directory):
+        if entry.name.endswith(".part"):
+          os.unlink(entry.path)
+        elif entry.name.endswith(".mp3"):
+          self._disk_bytes += entry.stat().st_size
+
+  def get_memory(self, key: str) -> bytes | None:
+    with self._lock:
+      data = self._memory.get(key)
+      if data is not None:
+        self._memory.move_to_end(key)
+        self.memory_hits += 1
+      return data
+
+  def get_path(self, key: str) -> str | None:
+    if not self.directory:
+      return None
+    path = self._path(key)
+    try:
+      os.utime(path)
+    except FileNotFoundError:
+      return None
+    self.disk_hits += 1
+    return path
+
+  def get(self, key: str) -> bytes | None:
+    """
+    Return cached audio from either tier as bytes; counts a miss if absent.
+    """
+    data = self.get_memory(key)
+    if data is not None:
+      return data
+    path = self.get_path(key)
+    if path is not None:
+      with open(path, "rb") as f:
+        return f.read()
+    self.record_miss()
+    return None
+
+  def put(self, key: str, data: bytes):
+    writer = self.writer(key)
+    writer.write(data)
+    writer.commit()
+
+  def record_miss(self):
+    self.misses += 1
+
+  def writer(self, key: str) -> TTSCacheWriter:
+    return TTSCacheWriter(self, key)
+
+  def put_memory(self, key: str, data: bytes):
+    with self._lock:
+      if key in self._memory:
+        self._memory_bytes -= len(self._memory.pop(key))
+      self._memory[key] = data
+      self._memory_bytes += len(data)
+      while self._memory_bytes > self.memory_max_bytes and self._memory:
+        _, evicted = self._memory.popitem(last=False)
+        self._memory_bytes -= len(evicted)
+
+  def adopt_file(self, key: str, temp_path: str, size: int):
+    path = self._path(key)
+    with self._lock:
+      if os.path.exists(path):
+        self._disk_bytes -= os.path.getsize(path)
+      os.replace(temp_path, path)
+      self._disk_bytes += size
+      if self._disk_bytes > self.max_bytes:
+        self._evict_disk()
+
+  def _evict_disk(self):
+    entries = sorted(
+        (entry for entry in os.scandir(self.directory) if entry.name.endswith(".mp3")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in entries:
+      if self._disk_bytes <= self.max_bytes:
+        break
+      size = entry.stat().st_size
+      try:
+        os.unlink(entry.path)
+      except FileNotFoundError:
+        continue
+      self._disk_bytes -= size
+
+  def _path(self, key: str) -> str:
+    return os.path.join(self.directory, f"{key}.mp3")
+
+  def stats(self) -> dict:
+    lookups = self.memory_hits + self.disk_hits + self.misses
+    hits = self.memory_hits + self.disk_hits
+    return {
+        "memory_hits": self.memory_hits,
+        "disk_hits": self.disk_hits,
+        "misses": self.misses,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        "memory_bytes": self._memory_bytes,
+        "disk_bytes": self._disk_bytes,
+    }
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import re
+
+
+TTS_PIPELINE_CONCURRENCY = int(os.environ.get("TTS_PIPELINE_CONCURRENCY", "3"))
+# Fragments shorter than this are merged into the next sentence; tiny clips
+# cost a full round trip each and sound choppy when stitched together.
+TTS_PIPELINE_MIN_CHARS = 40
+
+# Closing quotes and brackets after the punctuation stay with their sentence
+_SENTENCE_END = re.compile(r"[.!?][\"'”’)\]]*(\s+)")
+
+
+def _sentences(text: str):
+  start = 0
+  for match in _SENTENCE_END.finditer(text):
+    yield text[start:match.start(1)]
+    start = match.end(1)
+  yield text[start:]
+
+
+def split_sentences(text: str, min_chars: int = TTS_PIPELINE_MIN_CHARS) -> list[str]:
+  segments = []
+  pending = ""
+
+  for sentence in _sentences(text.strip()):
+    sentence = sentence.strip()
+    if not sentence:
+      continue
+    pending = f"{pending} {sentence}" if pending else sentence
+    if len(pending) >= min_chars:
+      segments.append(pending)
+      pending = ""
+
+  if pending:
+    if segments and len(pending) < min_chars:
+      segments[-1] = f"{segments[-1]} {pending}"
+    else:
+      segments.append(pending)
+  return segments
+
+
+async def render_in_order(segments: list[str], render, concurrency: int = TTS_PIPELINE_CONCURRENCY):
+  """
+  Yield `await render(segment)` for each segment, in order.
+
+  Up to `concurrency` segments render at once, so later sentences are being
+  synthesized while earlier ones are already streaming to the client.
+  """
+  pending = []
+  next_index = 0
+
+  def schedule():
+    nonlocal next_index
+    while next_index < len(segments) and len(pending) < concurrency:
+      pending.append(asyncio.ensure_future(render(segments[next_index])))
+      next_index += 1
+
+  try:
+    schedule()
+    while pending:
+      audio = await pending.pop(0)
+      schedule()
+      yield audio
+  finally:
+    for task in pending:
+      task.cancel()
@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+
+from observability import Histogram, endpoint, log
+from pdf_extraction import current_rss
+from result_cache import digest_key
+
+
+# Uploads up to this size stay in memory; larger ones are spooled to disk
+UPLOAD_SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+# Whole multipart body, for endpoints that take several files
+UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+# Defaults to the system temp directory
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR")
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Room for multipart boundaries and form fields around a single file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+RSS_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(5, 14))
+
+UPLOAD_PEAK_RSS = Histogram(
+    "upload_peak_rss_bytes",
+    "Highest backend RSS seen while an upload was in flight",
+    ("endpoint",),
+    RSS_BUCKETS,
+)
+UPLOAD_WORKER_RSS = Histogram(
+    "upload_worker_rss_bytes",
+    "Highest PDF worker RSS seen while parsing an upload",
+    ("endpoint",),
+    RSS_BUCKETS,
+)
+
+_stats = {
+    "uploads": 0,
+    "spooled": 0,
+    "bytes": 0,
+    "rejected": 0,
+    "in_flight": 0,
+    "max_peak_rss": 0,
+    "max_worker_rss": 0,
+}
+
+
+def _megabytes(size: int) -> str:
+  return f"{size / (1024 * 1024):.3g} MB"
+
+
+def upload_stats() -> dict:
+  return dict(_stats)
+
+
+class UploadRejected(Exception):
+  pass
+
+
+class Upload:
+  """
+  An uploaded PDF, hashed as it streams in and kept in memory up to
+  UPLOAD_SPOOL_BYTES, beyond which it lives in a temporary file.
+
+  `source` is what `extract_pdf_text` takes: the bytes, or the spool file
+  path so workers can memory-map it. Call `close()` when done with it; it
+  removes the spool file and reports the peak RSS seen meanwhile.
+  """
+
+  def __init__(self, filename: str, max_bytes: int = UPLOAD_MAX_BYTES, spool_bytes: int = UPLOAD_SPOOL_BYTES):
+    self.filename = filename
+    self.max_bytes = max_bytes
+    self.spool_bytes = spool_bytes
+    self.size = 0
+    self.path = None
+    self.peak_rss = current_rss()
+    self.worker_rss = 0
+    self._hash = hashlib.sha256()
+    self._buffer = bytearray()
+    self._file = None
+    self._data = None
+    self._closed = False
+    _stats["in_flight"] += 1
+
+  def write(self, chunk: bytes):
+    self.size += len(chunk)
+    if self.size > self.max_bytes:
+      _stats["rejected"] += 1
+      raise UploadRejected(f"Upload is larger than {_megabytes(self.max_bytes)}")
+    self._hash.update(chunk)
+
+    if self._file is None and len(self._buffer) + len(chunk) > self.spool_bytes:
+      self._file = tempfile.NamedTemporaryFile(
+          prefix="upload-", suffix=".pdf", dir=UPLOAD_SPOOL_DIR, delete=False
+      )
+      self.path = self._file.name
+      self._file.write(self._buffer)
+      self._buffer = bytearray()
+    if self._file is not None:
+      self._file.write(chunk)
+    else:
+      self._buffer += chunk
+
+  def finish(self):
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+    else:
+      self._data = bytes(self._buffer)
+      self._buffer = bytearray()
+    _stats["uploads"] += 1
+    _stats["bytes"] += self.size
+    if self.path is not None:
+      _stats["spooled"] += 1
+    self.sample_rss()
+
+  @property
+  def source(self) -> bytes | str:
+    return self.path if self.path is not None else self._data
+
+  def cache_key(self, *parts: str) -> str:
+    """
+    Same as `cache_key(data, *parts)` for the uploaded bytes.
+    """
+    return digest_key(self._hash, *parts)
+
+  def sample_rss(self, worker_rss: int = 0):
+    self.peak_rss = max(self.peak_rss, current_rss())
+    self.worker_rss = max(self.worker_rss, worker_rss)
+
+  def close(self):
+    if self._closed:
+      return
+    self._closed = True
+    self.sample_rss()
+    if self._file is not None:
+      self._file.close()
+    if self.path is not None:
+      try:
+        os.unlink(self.path)
+      except FileNotFoundError:
+        pass
+    self._data = None
+    self._buffer = bytearray()
+
+    _stats["in_flight"] -= 1
+    _stats["max_peak_rss"] = max(_stats["max_peak_rss"], self.peak_rss)
+    _stats["max_worker_rss"] = max(_stats["max_worker_rss"], self.worker_rss)
+    UPLOAD_PEAK_RSS.observe(self.peak_rss, endpoint.get())
+    if self.worker_rss:
+      UPLOAD_WORKER_RSS.observe(self.worker_rss, endpoint.get())
+    log(
+        "Upload finished",
+        filename=self.filename,
+        bytes=self.size,
+        spooled=self.path is not None,
+        peak_rss_mb=round(self.peak_rss / 1024 / 1024, 1),
+        worker_rss_mb=round(self.worker_rss / 1024 / 1024, 1),
+    )
+
+
+def _copy(file, upload: Upload):
+  while chunk := file.read(UPLOAD_CHUNK_BYTES):
+    upload.write(chunk)
+  upload.finish()
+
+
+async def receive_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> Upload:
+  """
+  Copy a multipart upload chunk by chunk (off the event loop, since large
+  ones are already on disk) into an Upload, hashing it on the way.
+  Raises UploadRejected as soon as it passes `max_bytes`.
+  """
+  upload = Upload(file.filename, max_bytes=max_bytes)
+  try:
+    await file.seek(0)
+    await asyncio.to_thread(_copy, file.file, upload)
+  except BaseException:
+    upload.close()
+    raise
+  return upload
+
+
+class UploadLimitMiddleware:
+  """
+  Answer 413 for request bodies over the limit for their path, without
+  reading them when Content-Length gives the size away and as soon as
+  the limit is crossed otherwise, so an oversized upload is never
+  buffered by the multipart parser.
+
+  `overhead` bytes on top of each limit leave room for the multipart
+  framing; the 413 names the configured limit itself.
+  """
+
+  def __init__(self, app, limits: dict[str, int], overhead: int = 0):
+    self.app = app
+    self.limits = limits
+    self.overhead = overhead
+
+  async def __call__(self, scope, receive, send):
+    configured = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+    if configured is None:
+      return await self.app(scope, receive, send)
+    limit = configured + self.overhead
+
+    length = next((value for key, value in scope["headers"] if key == b"content-length"), None)
+    if length is not None and length.isdigit() and int(length) > limit:
+      return await self._reject(scope, receive, send, configured)
+
+    received = 0
+    rejected = False
+
+    async def limited_receive():
+      nonlocal received, rejected
+      message = await receive()
+      if message["type"] == "http.request":
+        received += len(message.get("body", b""))
+        if received > limit:
+          rejected = True
+          raise UploadRejected("Request body too large")
+      return message
+
+    async def guarded_send(message):
+      # Whatever the app makes of the aborted body is replaced by the 413
+      if not rejected:
+        await send(message)
+
+    try:
+      await self.app(scope, limited_receive, guarded_send)
+    except UploadRejected:
+      if not rejected:
+        raise
+    if rejected:
+      await self._reject(scope, receive, send, configured)
+
+  async def _reject(self, scope, receive, send, limit: int):
+    _stats["rejected"] += 1
+    response = JSONResponse(
+        {"error": f"Upload is larger than {_megabytes(limit)}"}, status_code=413
+    )
+    await response(scope, receive, send)
@@ -11,6 +11,30 @@ import {
 } from "lucide-react";
 import BillingCallSimulator from "../components/BillingCallSimulator";
 
+// Call onLine for each complete line of a streamed response body
+async function readLines(response, onLine) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let pending = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    const lines = (pending + decoder.decode(value, { stream: true })).split("\n");
+    pending = lines.pop();
+    lines.forEach(onLine);
+  }
+  if (pending) onLine(pending);
+}
+
+// Throw the server's error unless the response is a stream of `contentType`;
+// failures (overload, missing key) come back as a JSON body instead
+async function expectStream(response, contentType) {
+  const type = response.headers.get("content-type") || "";
+  if (response.ok && type.startsWith(contentType)) return;
+  const data = await response.json().catch(() => ({}));
+  throw new Error(data.error || `Request failed with status ${response.status}`);
+}
+
 function BillAnalyzer() {
   const [step, setStep] = useState("upload");
   const [file, setFile] = useState(null);
@@ -24,6 +48,7 @@ function BillAnalyzer() {
 
   const [showCallSim, setShowCallSim] = useState(false);
   const [callScript, setCallScript] = useState([]);
+  const [callScriptDone, setCallScriptDone] = useState(false);
   const [callLoading, setCallLoading] = useState(false);
 
   const uploadAndAnalyze = async (selectedFile) => {
@@ -88,6 +113,7 @@ function BillAnalyzer() {
     setSelectedIssues(new Set());
     setGeneratedEmail(null);
     setCallScript([]);
+    setCallScriptDone(false);
     setShowCallSim(false);
   };
 
@@ -130,16 +156,36 @@ function BillAnalyzer() {
             },
             issues_summary: `Selected ${selectedIssues.size} issues for dispute`,
             tone: "firm-but-polite",
+            stream: true,
           }),
         }
       );
 
-      const data = await response.json();
-      setGeneratedEmail(data.letter);
-      setStep("draft");
+      await expectStream(response, "text/event-stream");
+
+      // Server-sent events: show the draft as soon as the first paragraph arrives
+      const paragraphs = [];
+      let event = null;
+      let failure = null;
+      await readLines(response, (line) => {
+        if (line.startsWith("event: ")) {
+          event = line.slice(7);
+        } else if (line.startsWith("data: ")) {
+          const data = JSON.parse(line.slice(6));
+          if (event === "paragraph") {
+            paragraphs.push(data.text);
+            setGeneratedEmail(paragraphs.join("\n\n"));
+            setStep("draft");
+          } else if (event === "error") {
+            failure = data.error;
+          }
+        }
+      });
+      if (failure) throw new Error(failure);
+      if (paragraphs.length === 0) throw new Error("The letter came back empty");
     } catch (error) {
       console.error("Email generation failed:", error);
-      alert("Failed to generate email. Please try again.");
+      alert(`Failed to generate email: ${error.message}. Please try again.`);
     } finally {
       setEmailLoading(false);
     }
@@ -186,6 +232,8 @@ function BillAnalyzer() {
 
     setShowCallSim(true);
     setCallLoading(true);
+    setCallScript([]);
+    setCallScriptDone(false);
 
     try {
       const selectedIssueDetails =
@@ -204,17 +252,25 @@ function BillAnalyzer() {
           bill_info: analysis.bill_info,
           issues: selectedIssueDetails,
           max_turns: 10,
+          stream: true,
         }),
       });
 
-      const data = await res.json();
-      if (data.turns) {
-        setCallScript(data.turns);
-      } else {
-        console.error("Call script error:", data);
-        alert("Could not generate call script. Try again.");
-        setShowCallSim(false);
-      }
+      // NDJSON: one turn per line, so the call starts with the first turn
+      let turns = 0;
+      await readLines(res, (line) => {
+        if (!line.trim()) return;
+        const data = JSON.parse(line);
+        if (data.speaker) {
+          turns += 1;
+          setCallScript((prev) => [...prev, data]);
+        } else if (data.error && turns === 0) {
+          console.error("Call script error:", data);
+          alert("Could not generate call script. Try again.");
+          setShowCallSim(false);
+        }
+      });
+      setCallScriptDone(true);
     } catch (err) {
       console.error("Call simulation failed:", err);
       alert("Call simulation failed. Try again.");
@@ -593,6 +649,7 @@ function BillAnalyzer() {
           onClose={() => setShowCallSim(false)}
           analysis={analysis}
           script={callScript}
+          scriptDone={callScriptDone}
         />
       </div>
     );
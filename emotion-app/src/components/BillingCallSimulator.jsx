@@ -14,15 +14,24 @@ function formatSeconds(secs) {
  * - open: boolean
  * - onClose: () => void
  * - analysis: full bill analysis (for header only)
- * - script: [{ speaker: "rep" | "user", text: string }]
+ * - script: [{ speaker: "rep" | "user", text: string }], may still be growing
+ * - scriptDone: true once no more turns will be appended to script
  */
-export default function BillingCallSimulator({ open, onClose, analysis, script = [] }) {
+export default function BillingCallSimulator({ open, onClose, analysis, script = [], scriptDone = true }) {
   const [seconds, setSeconds] = useState(0);
   const [transcript, setTranscript] = useState([]);
   const timerRef = useRef(null);
   const bottomRef = useRef(null);
+  const scriptRef = useRef(script);
+  const scriptDoneRef = useRef(scriptDone);
   const { speak } = useTTS();
 
+  // The playback loop reads the latest turns as they stream in
+  useEffect(() => {
+    scriptRef.current = script;
+    scriptDoneRef.current = scriptDone;
+  }, [script, scriptDone]);
+
   // Scroll transcript to bottom
   useEffect(() => {
     if (bottomRef.current) {
@@ -56,10 +65,10 @@ export default function BillingCallSimulator({ open, onClose, analysis, script =
     setTranscript((prev) => [...prev, { speaker, text }]);
   };
 
-  // Auto-play the script using queued TTS
+  // Auto-play the script using queued TTS, starting with the first turn
+  // while later ones are still being generated
   useEffect(() => {
     if (!open) return;
-    if (!script || script.length === 0) return;
 
     let cancelled = false;
 
@@ -72,9 +81,12 @@ export default function BillingCallSimulator({ open, onClose, analysis, script =
         "BILLING_REP"
       );
 
-      for (let i = 0; i < script.length; i++) {
-        if (cancelled) break;
-        const turn = script[i];
+      for (let i = 0; !cancelled; i++) {
+        while (!cancelled && i >= scriptRef.current.length && !scriptDoneRef.current) {
+          await new Promise((resolve) => setTimeout(resolve, 100));
+        }
+        if (cancelled || i >= scriptRef.current.length) break;
+        const turn = scriptRef.current[i];
         const speaker = turn.speaker === "user" ? "you" : "rep";
         const text = turn.text || "";
 
@@ -106,7 +118,7 @@ export default function BillingCallSimulator({ open, onClose, analysis, script =
       cancelled = true;
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [open, script]);
+  }, [open]);
 
   if (!open) return null;
 
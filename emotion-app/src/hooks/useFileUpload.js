@@ -1,5 +1,34 @@
 import { useState } from 'react';
 
+const STAGE_MESSAGES = {
+  queued: "Waiting for a free analysis slot...",
+  extracting: "Extracting text from your report...",
+  redacting: "Removing personal details before analysis...",
+  analyzing: "Analyzing report... explanations start as soon as the first result is ready.",
+};
+
+// Resolve with the job's final record, reporting each status on the way
+const followJob = (jobId, onStatus) => new Promise((resolve, reject) => {
+  const events = new EventSource(`http://localhost:8080/jobs/${jobId}/events`);
+  const handle = (event) => {
+    // A connection failure is an "error" event without data
+    if (!event.data) {
+      events.close();
+      reject(new Error("Lost contact with the analysis job"));
+      return;
+    }
+    const record = JSON.parse(event.data);
+    onStatus(record.status);
+    if (record.status === "done" || record.status === "error") {
+      events.close();
+      resolve(record);
+    }
+  };
+  [...Object.keys(STAGE_MESSAGES), "done", "error"].forEach(
+    (status) => events.addEventListener(status, handle)
+  );
+});
+
 export const useFileUpload = (startComfortStream) => {
   const [file, setFile] = useState(null);
   const [summary, setSummary] = useState("");
@@ -11,24 +40,32 @@ export const useFileUpload = (startComfortStream) => {
 
     setFile(uploadedFile);
     setIsAnalyzing(true);
-    setSummary("Extracting text and analyzing report... please wait...");
+    setSummary("Uploading report... please wait...");
 
     const formData = new FormData();
-    formData.append("file", uploadedFile);
+    formData.append("files", uploadedFile);
+    formData.append("kind", "report");
 
     try {
-      const res = await fetch('http://localhost:8080/analyze-report', {
+      // Queued as a job so explanations can start on the first parsed section
+      const res = await fetch('http://localhost:8080/jobs', {
         method: 'POST',
         body: formData
       });
       const data = await res.json();
-      const reportSummary = data.summary;
-      setSummary(reportSummary);
-      
-      startComfortStream(reportSummary);
+      const job = data.jobs?.[0];
+      if (!job?.job_id) throw new Error(job?.error || data.error || "Upload failed");
+
+      startComfortStream(null, job.job_id);
+
+      const record = await followJob(job.job_id, (status) => {
+        if (STAGE_MESSAGES[status]) setSummary(STAGE_MESSAGES[status]);
+      });
+      if (record.status === "error") throw new Error(record.error);
+      setSummary(record.result.summary);
     } catch (err) {
       console.error(err);
-      setSummary("Error analyzing report. Ensure backend is running.");
+      setSummary(`Error analyzing report: ${err.message}`);
     } finally {
       setIsAnalyzing(false);
     }
@@ -1,5 +1,7 @@
 import { useEffect, useRef, useState, useCallback } from 'react';
 
+const MAX_RECONNECTS = 5;
+
 export const useWebSocket = (summary, stableEmotion) => {
   const [messages, setMessages] = useState([]);
   const [currentMessage, setCurrentMessage] = useState("");
@@ -8,7 +10,13 @@ export const useWebSocket = (summary, stableEmotion) => {
   const [isComplete, setIsComplete] = useState(false);
   const websocket = useRef(null);
   const summaryRef = useRef(summary);
+  // Report job whose sections the backend hands over as they are parsed
+  const jobIdRef = useRef(null);
   const currentMessageRef = useRef("");
+  const sessionIdRef = useRef(null);
+  const reconnectsRef = useRef(0);
+  const reconnectTimerRef = useRef(null);
+  const finishedRef = useRef(false);
 
   useEffect(() => {
     summaryRef.current = summary;
@@ -18,28 +26,40 @@ export const useWebSocket = (summary, stableEmotion) => {
     currentMessageRef.current = currentMessage;
   }, [currentMessage]);
 
-  const startComfortStream = useCallback((reportSummary) => {
-    if (websocket.current) websocket.current.close();
-    
-    if (reportSummary) {
-      summaryRef.current = reportSummary;
+  const closeSocket = useCallback(() => {
+    clearTimeout(reconnectTimerRef.current);
+    if (websocket.current) {
+      // Closed on purpose, so onclose must not reconnect
+      websocket.current.onclose = null;
+      websocket.current.close();
+      websocket.current = null;
     }
-    
-    websocket.current = new WebSocket("ws://localhost:8080/comfort-stream");
+  }, []);
+
+  const connect = useCallback((resuming) => {
+    // The same id on every reconnect lets the backend resume the session
+    websocket.current = new WebSocket(
+      `ws://localhost:8080/comfort-stream?session_id=${sessionIdRef.current}`
+    );
     
     websocket.current.onopen = () => {
-      console.log("WebSocket connected");
+      console.log(resuming ? "WebSocket reconnected" : "WebSocket connected");
+      reconnectsRef.current = 0;
       setIsActive(true);
-      setMessages([]);
+      // The unfinished section is sent again from the start
       setCurrentMessage("");
       currentMessageRef.current = "";
-      setIsComplete(false);
+      if (!resuming) {
+        setMessages([]);
+        setIsComplete(false);
+      }
       
       setTimeout(() => {
         if (websocket.current && websocket.current.readyState === WebSocket.OPEN) {
           const initMessage = {
             action: "init",
             summary: summaryRef.current,
+            job_id: jobIdRef.current,
             emotion: stableEmotion
           };
           console.log("Sending init message:", { action: "init", emotion: stableEmotion, summaryLength: summaryRef.current?.length });
@@ -68,6 +88,7 @@ export const useWebSocket = (summary, stableEmotion) => {
           currentMessageRef.current = "";
           setProgress(data.progress || "");
         } else if (data.type === "complete") {
+          finishedRef.current = true;
           const finalMessage = currentMessageRef.current.trim();
           if (finalMessage) {
             setMessages(msgs => [...msgs, finalMessage]);
@@ -112,9 +133,34 @@ export const useWebSocket = (summary, stableEmotion) => {
     websocket.current.onclose = (event) => {
       console.log("WebSocket closed:", event.code, event.reason);
       setIsActive(false);
+      if (!finishedRef.current && reconnectsRef.current < MAX_RECONNECTS) {
+        const delay = 1000 * 2 ** reconnectsRef.current;
+        reconnectsRef.current += 1;
+        reconnectTimerRef.current = setTimeout(() => connect(true), delay);
+      }
     };
   }, [stableEmotion]);
 
+  // Pass the finished summary, or the id of a report job to start
+  // explaining while the summary is still being written
+  const startComfortStream = useCallback((reportSummary, jobId = null) => {
+    closeSocket();
+    
+    if (reportSummary || jobId) {
+      summaryRef.current = reportSummary;
+      jobIdRef.current = jobId;
+    }
+    
+    // One session per loaded report; starting again without a new report
+    // resumes it
+    if (reportSummary || jobId || !sessionIdRef.current) {
+      sessionIdRef.current = crypto.randomUUID();
+    }
+    finishedRef.current = false;
+    reconnectsRef.current = 0;
+    connect(false);
+  }, [connect, closeSocket]);
+
   const requestNextSection = useCallback(() => {
     if (websocket.current && websocket.current.readyState === WebSocket.OPEN) {
       console.log("Requesting next section with emotion:", stableEmotion);
@@ -128,12 +174,8 @@ export const useWebSocket = (summary, stableEmotion) => {
   }, [stableEmotion]);
 
   useEffect(() => {
-    return () => {
-      if (websocket.current) {
-        websocket.current.close();
-      }
-    };
-  }, []);
+    return closeSocket;
+  }, [closeSocket]);
 
   const allMessages = currentMessage 
     ? [...messages, currentMessage]